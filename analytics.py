@@ -0,0 +1,284 @@
+import numpy as np
+import pandas as pd
+
+# =====================
+# ANALYSE (pure pandas)
+# =====================
+#
+# Zelfde berekeningen als de server-side RPC's in sql/, als fallback
+# en als referentie voor benchmarks.
+
+COMPARE_COLUMNS = ["current_shrink", "current_sales", "previous_shrink", "previous_sales"]
+
+
+# =====================
+# DASHBOARD
+# =====================
+
+def dashboard_afdelingen(df_weeks):
+    if "afdeling" not in df_weeks.columns:
+        return []
+    return sorted(df_weeks["afdeling"].dropna().unique())
+
+
+def dashboard_aggregates(df_weeks, afdelingen):
+    df = df_weeks[df_weeks["afdeling"].isin(afdelingen)]
+
+    if df.empty:
+        return None
+
+    df = df.assign(
+        shrink=pd.to_numeric(df["shrink"], errors="coerce").fillna(0),
+        sales=pd.to_numeric(df["sales"], errors="coerce").fillna(0)
+    )
+
+    latest_week = df["week"].max()
+
+    trend = (
+        df.groupby(["jaar", "week"])[["shrink", "sales"]]
+        .sum()
+        .reset_index()
+    )
+
+    current_dept = df[df["week"] == latest_week].groupby("afdeling")[["shrink", "sales"]].sum()
+    previous_dept = df[df["week"] == latest_week - 1].groupby("afdeling")[["shrink", "sales"]].sum()
+
+    compare = current_dept.rename(
+        columns={"shrink": "current_shrink", "sales": "current_sales"}
+    ).join(
+        previous_dept.rename(columns={"shrink": "previous_shrink", "sales": "previous_sales"}),
+        how="outer"
+    ).fillna(0)
+
+    return {
+        "total_shrink": df["shrink"].sum(),
+        "total_sales": df["sales"].sum(),
+        "latest_week": latest_week,
+        "trend": trend,
+        "compare": compare,
+    }
+
+
+def week_comparison(compare):
+    # shrink laatste week vs vorige week, over alle gekozen afdelingen
+    current = compare["current_shrink"].sum()
+    previous = compare["previous_shrink"].sum()
+    return {"current": current, "previous": previous, "delta": current - previous}
+
+
+def finish_compare(compare):
+    compare = compare.reindex(columns=COMPARE_COLUMNS).fillna(0)
+
+    # verschil in €
+    compare["verschil"] = compare["current_shrink"] - compare["previous_shrink"]
+
+    # percentage shrink huidig
+    compare["shrink_%"] = (
+        compare["current_shrink"] / compare["current_sales"] * 100
+    ).replace([np.inf, -np.inf], 0).fillna(0)
+
+    # afronden
+    return compare.round(2).sort_values("verschil", ascending=False)
+
+
+# =====================
+# AFSLAG EFFICIËNTIE
+# =====================
+
+PAKKET_REDEN = "38 VERLIES - ANDERE"
+AFSLAG_COLUMNS = ["euro_afslag", "euro_verval", "euro_tgtg", "n_afslag"]
+
+
+def afslag_table(df):
+    # per (hope, datum): euro afslag / verval / TGTG + aantal afslaglijnen
+    reden = df["reden"]
+
+    # str.contains enkel op de unieke redenen
+    codes, uniques = pd.factorize(reden)
+    uniques = pd.Series(uniques, dtype="object")
+    is_afslag = uniques.str.contains("AFSLAG", case=False, na=False).to_numpy()
+    is_verval = uniques.str.contains("VERVAL", case=False, na=False).to_numpy()
+    is_tgtg = (uniques == PAKKET_REDEN).to_numpy()
+
+    valid = codes >= 0
+    afslag = np.zeros(len(df), dtype=bool)
+    verval = np.zeros(len(df), dtype=bool)
+    tgtg = np.zeros(len(df), dtype=bool)
+    afslag[valid] = is_afslag[codes[valid]]
+    verval[valid] = is_verval[codes[valid]]
+    tgtg[valid] = is_tgtg[codes[valid]]
+
+    keep = afslag | verval | tgtg
+    # float32 opslag, sommen in float64
+    euro = pd.to_numeric(df["euro"], errors="coerce").fillna(0).to_numpy(dtype="float64")[keep]
+
+    parts = pd.DataFrame({
+        "hope": df["hope"].to_numpy()[keep],
+        "datum": df["datum"].to_numpy()[keep],
+        "euro_afslag": np.where(afslag[keep], euro, 0.0),
+        "euro_verval": np.where(verval[keep], euro, 0.0),
+        "euro_tgtg": np.where(tgtg[keep], euro, 0.0),
+        "n_afslag": afslag[keep].astype("int64"),
+    })
+
+    return parts.groupby(["hope", "datum"], as_index=False)[AFSLAG_COLUMNS].sum()
+
+
+def afslag_kpis(df_afslag):
+    # verval en TGTG tellen enkel mee op dagen met afslag voor die HOPE
+    heeft_afslag = df_afslag["n_afslag"] > 0
+
+    return afslag_totals(
+        df_afslag["euro_afslag"].sum(),
+        df_afslag.loc[heeft_afslag, "euro_verval"].sum(),
+        df_afslag.loc[heeft_afslag, "euro_tgtg"].sum()
+    )
+
+
+def afslag_totals(afslag_euro, verval_euro, tgtg_euro):
+    # ook gebruikt door duck.py (zelfde afronding en types)
+    effectief_verkocht = afslag_euro - verval_euro - tgtg_euro
+
+    if afslag_euro > 0:
+        afslag_eff = (effectief_verkocht / afslag_euro) * 100
+    else:
+        afslag_eff = 0
+
+    return {
+        "afslag_euro": afslag_euro,
+        "verval_euro": verval_euro,
+        "tgtg_euro": tgtg_euro,
+        "effectief_verkocht": effectief_verkocht,
+        "afslag_eff": afslag_eff,
+    }
+
+
+# =====================
+# WINKELVERGELIJKING
+# =====================
+
+def store_summary(df_weeks, df_afslag, jaar):
+    # totalen van één winkel voor één jaar (fallback voor store_comparison)
+    w = df_weeks[df_weeks["jaar"] == jaar] if "jaar" in df_weeks.columns else df_weeks.iloc[0:0]
+    shrink = pd.to_numeric(w.get("shrink"), errors="coerce").sum() if len(w) else 0.0
+    sales = pd.to_numeric(w.get("sales"), errors="coerce").sum() if len(w) else 0.0
+
+    kpis = afslag_kpis(df_afslag[df_afslag["datum"].dt.year == jaar])
+
+    return {
+        "shrink": shrink,
+        "sales": sales,
+        "shrink_pct": round(shrink / sales * 100, 2) if sales > 0 else 0,
+        "afslag_euro": kpis["afslag_euro"],
+        "verval_euro": kpis["verval_euro"],
+        "tgtg_euro": kpis["tgtg_euro"],
+    }
+
+
+# =====================
+# NIET-GEMAPTE HOPE'S
+# =====================
+
+def unmapped_hopes(df_shrink, mapping):
+    # anti-join op het genormaliseerde frame (fallback voor unmapped_hopes)
+    df = df_shrink[["hope", "product"]].assign(euro=df_shrink["euro"].astype("float64"))
+
+    if not mapping.empty:
+        df = df[~mapping.contains(df["hope"])]
+
+    totals = (
+        df
+        .groupby(["hope", "product"], observed=True, as_index=False)["euro"]
+        .sum()
+        .sort_values("euro", ascending=False, kind="stable")
+        .reset_index(drop=True)
+    )
+
+    return totals.assign(
+        hope=totals["hope"].astype(str),
+        product=totals["product"].astype(str)
+    )
+
+
+# =====================
+# PRODUCT ANALYSE
+# =====================
+
+WAARDE_PAKKET = 20
+WINST_PER_PAKKET = 3.29
+
+
+def recovery(df, winst_per_pakket=WINST_PER_PAKKET):
+    # ♻️ Recuperatie pakketten (38 VERLIES - ANDERE) via Too Good To Go
+    euro = df["euro"].to_numpy(dtype="float64")
+
+    return recovery_totals(
+        euro[(df["reden"] == PAKKET_REDEN).to_numpy()].sum(),
+        euro.sum(),
+        winst_per_pakket
+    )
+
+
+def recovery_totals(verlies_andere, bruto, winst_per_pakket=WINST_PER_PAKKET):
+    pakketten = verlies_andere / WAARDE_PAKKET
+    recup = pakketten * winst_per_pakket
+
+    return {
+        "pakketten": pakketten,
+        "recup": recup,
+        "bruto": bruto,
+        "netto": bruto - recup,
+        "recup_pct": (recup / bruto) * 100 if bruto > 0 else 0,
+    }
+
+
+def top_products(df):
+    # verlies per product, per afdeling gesorteerd (grootste eerst)
+    return sort_products(
+        df.assign(euro=df["euro"].astype("float64"))
+        .groupby(["afdeling", "product", "hope"], observed=True)
+        .agg({
+            "stuks": "sum",
+            "euro": "sum"
+        })
+        .reset_index()
+    )
+
+
+def sort_products(totals):
+    # totalen in groupby-volgorde (afdeling, product, hope)
+    return totals.sort_values(["afdeling", "euro"], ascending=[True, False])
+
+
+def filter_afslag(df_afslag, mapping, filters):
+    # zelfde filters als de shrink rijen, behalve reden (afslag_dag is per dag)
+    if filters.get("afdeling") is not None:
+        df_afslag = df_afslag[mapping.lookup(df_afslag["hope"]) == filters["afdeling"]]
+
+    if filters.get("start") is not None:
+        df_afslag = df_afslag[
+            (df_afslag["datum"] >= filters["start"]) &
+            (df_afslag["datum"] <= filters["end"])
+        ]
+
+    if "hope" in filters:
+        df_afslag = df_afslag[df_afslag["hope"] == filters["hope"]]
+
+    return df_afslag
+
+
+def product_aggregates(df, df_afslag):
+    # alle afgeleide cijfers van de Product analyse voor één filterstand
+    euro = df["euro"].astype("float64")
+    return {
+        **recovery(df),
+        "afslag": afslag_kpis(df_afslag),
+        "per_reden": euro.groupby(df["reden"], observed=True).sum(),
+        "per_week": euro.groupby(df["datum"].dt.isocalendar().week).sum(),
+        "producten_per_afdeling": (
+            df.groupby("afdeling", observed=True)["product"]
+            .nunique()
+            .sort_values(ascending=False)
+        ),
+        "top_products": top_products(df),
+    }
@@ -1,28 +1,154 @@
 import streamlit as st
 import pandas as pd
-from supabase import create_client
 import datetime
-import numpy as np
-from openai import OpenAI
+import functools
+import time
+
+import analytics
+import clients
+import datasets
+import duck
+import ingest
+import insights
+import rpc
+import suggest
+import tracing
+import upload
+import warmup
+from cache import DatasetRegistry, DatasetVersions, result_bytes
+from filters import FilterIndex
+from search import SearchIndex
 
 # =====================
 # CONFIG
 # =====================
 
 DEBUG = False
+
+# CPU-tijd van deze run (thread_time: enkel deze sessie, niet het hele proces)
+RUN_START = time.thread_time()
+
+# spans per stap van deze run (tracing.py); de naam wordt de pagina
+trace = tracing.start("app")
 st.set_page_config(layout="wide")
 
+# gedeelde frames nooit in-place wijzigen (standaard vanaf pandas 3)
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
 SUPABASE_URL = st.secrets["SUPABASE_URL"]
 SUPABASE_KEY = st.secrets["SUPABASE_KEY"]
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-client = OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+# connectiepool per client (keep-alive), gedeeld door alle sessies
+HTTP_POOL_SIZE = int(st.secrets.get("HTTP_POOL_SIZE", clients.POOL_SIZE))
+HTTP_TIMEOUT = float(st.secrets.get("HTTP_TIMEOUT", clients.TIMEOUT))
+
+# één keer per proces i.p.v. bij elke rerun
+@st.cache_resource
+def supabase_base():
+    return clients.supabase_client(
+        SUPABASE_URL, SUPABASE_KEY, clients.http_pool(HTTP_POOL_SIZE, HTTP_TIMEOUT)
+    )
+
+# OPENAI_BASE_URL: bv. een lokale stub server om de AI inzichten te testen
+@st.cache_resource
+def openai_client():
+    return clients.openai_client(
+        st.secrets["OPENAI_API_KEY"],
+        st.secrets.get("OPENAI_BASE_URL"),
+        HTTP_POOL_SIZE,
+        HTTP_TIMEOUT
+    )
+
+base = supabase_base()
+client = openai_client()
+AI_MODEL = st.secrets.get("OPENAI_MODEL", insights.MODEL)
+
+# "rpc" = aggregaties in Postgres (sql/dashboard.sql), "pandas" = lokaal,
+# "duckdb" = Product analyse als SQL in een in-process DuckDB (duck.py)
+QUERY_MODE = st.secrets.get("QUERY_MODE", "pandas")
+DUCKDB_THREADS = int(st.secrets.get("DUCKDB_THREADS", 0)) or None
 
-store_id = "delhaize_halle"
+# winkel voor gebruikers zonder koppeling in user_stores (sql/stores.sql)
+DEFAULT_STORE = st.secrets.get("STORE_ID", "delhaize_halle")
 WINST_PER_PAKKET = 3.29
 PAKKET_REDEN = "38 VERLIES - ANDERE"
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+AFDELINGEN = [
+    "DIEPVRIES",
+    "VOEDING",
+    "PARFUMERIE",
+    "DROGISTERIJ",
+    "FRUIT EN GROENTEN",
+    "ZUIVEL",
+    "VERS VLEES",
+    "GEVOGELTE",
+    "CHARCUTERIE",
+    "VIS EN SAURISSERIE",
+    "SELF-TRAITEUR",
+    "BAKKERIJ",
+    "TRAITEUR",
+    "DRANKEN"
+]
+
+# upsert van mappings in blokken
+MAPPING_BATCH = 1000
+
+# één versie per dataset: een write bumpt enkel wat hij wijzigt
+@st.cache_resource
+def dataset_versions():
+    return DatasetVersions()
+
+versions = dataset_versions()
+
+# gedeelde, read-only datasets voor alle sessies (LRU binnen geheugenbudget)
+@st.cache_resource
+def dataset_registry():
+    return DatasetRegistry(int(st.secrets.get("DATASET_CACHE_MB", 1024)) * 2**20)
+
+registry = dataset_registry()
+
+# laatste runs per pagina voor het performance paneel (enkel admins)
+ADMIN_EMAILS = [e.lower() for e in st.secrets.get("ADMIN_EMAILS", [])]
+
+# geen spinner: ook aangeroepen vlak voor st.stop() / st.rerun() en in de
+# finally van een fragment, waar een bericht naar de browser een gevraagde
+# stop meteen opgooit
+@st.cache_resource(show_spinner=False)
+def trace_log():
+    return tracing.TraceLog(int(st.secrets.get("TRACE_RUNS", tracing.MAX_PER_PAGE)))
+
+# =====================
+# ACHTERGROND WARM-UP
+# =====================
+
+# WARMUP_STORES: lijst store_id's die bij de start al geladen worden
+WARMUP_STORES = list(st.secrets.get("WARMUP_STORES", []))
+WARMUP_INTERVAL = int(st.secrets.get("WARMUP_INTERVAL", warmup.INTERVAL))
+WARMUP_PROBE = int(st.secrets.get("WARMUP_PROBE", warmup.PROBE_EVERY))
+# enkel met de service key: de anon key ziet onder RLS (sql/stores.sql) nul
+# rijen, en die lege frames zou de warm-up in de gedeelde registry zetten
+SUPABASE_SERVICE_KEY = st.secrets.get("SUPABASE_SERVICE_KEY")
+
+# één thread per proces, gestart vóór de login: de eerste gebruiker
+# vindt de datasets al in de registry
+@st.cache_resource
+def warmer():
+    if not WARMUP_STORES or not SUPABASE_SERVICE_KEY:
+        return None
+    # eigen client (geen gebruikerstoken)
+    worker_client = clients.supabase_client(
+        SUPABASE_URL,
+        SUPABASE_SERVICE_KEY,
+        clients.http_pool(HTTP_POOL_SIZE, HTTP_TIMEOUT)
+    )
+    return warmup.Warmer(
+        worker_client, registry, versions, WARMUP_STORES,
+        interval=WARMUP_INTERVAL,
+        probe_every=WARMUP_PROBE
+    ).start()
+
+background = warmer()
 
 
 # =====================
@@ -32,23 +158,71 @@ supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
 def format_date_series(series):
     return pd.to_datetime(series, errors="coerce").dt.strftime("%d/%m/%Y")
 
+def _finish(trace, name, start):
+    # trace afsluiten en loggen, dan de laatste CPU-tijd per run/fragment (ms).
+    # In die volgorde: na st.stop() gooit elke Streamlit-call (ook
+    # session_state) de StopException opnieuw op
+    ms = (time.thread_time() - start) * 1000
+    if trace is not None:
+        trace_log().add(tracing.finish(trace, cpu_ms=round(ms, 1)))
+    st.session_state.setdefault("rerun_cpu", {})[name] = ms
+    return ms
+
+def _end_run():
+    # st.stop() / st.rerun() eindigen vóór het einde van het script: de trace
+    # eerst afsluiten, anders blijft ze actief en hangt een latere fragment-run
+    # er zijn spans aan (in een fragment-run is ze al afgesloten)
+    if not trace.done:
+        _finish(trace, "app", RUN_START)
+
+def stop():
+    _end_run()
+    st.stop()
+
+def rerun():
+    _end_run()
+    st.rerun()
+
+def fragment(fn):
+    # st.fragment: een widget binnen het blok herloopt enkel dit blok
+    @functools.wraps(fn)
+    def run(*args, **kwargs):
+        start = time.thread_time()
+        # binnen een volledige run: span; alleen het fragment: eigen trace
+        run_trace = tracing.start(f"{menu} · {fn.__name__}") if tracing.current() is None else None
+
+        try:
+            with tracing.span(f"fragment:{fn.__name__}"):
+                result = fn(*args, **kwargs)
+        finally:
+            ms = _finish(run_trace, fn.__name__, start)
+        if DEBUG:
+            st.caption(f"⏱️ {fn.__name__}: {ms:.1f} ms CPU")
+        return result
+    return st.fragment(run)
+
+def show_dataframe(data, **kwargs):
+    # render = payload naar de browser: rijen en bytes in de trace
+    with tracing.span("render:dataframe") as span:
+        return st.dataframe(span.size(data), **kwargs)
+
+def show_chart(chart, data, **kwargs):
+    with tracing.span(f"render:{chart.__name__}") as span:
+        return chart(span.size(data), **kwargs)
+
 # =====================
 # LOGIN
 # =====================
 
 def login(email, password):
+    # losse auth client: de gedeelde client krijgt nooit een gebruikerssessie
     try:
-        res = supabase.auth.sign_in_with_password({
-            "email": email,
-            "password": password
-        })
-        if res.session:
-            return res.session.user
+        return clients.sign_in(base, email, password)
     except:
         return None
 
 # session state
-if "user" not in st.session_state:
+if "user" not in st.session_state or "session" not in st.session_state:
     st.session_state["user"] = None
 
 # 👉 NIET ingelogd → toon login
@@ -60,15 +234,17 @@ if not st.session_state["user"]:
     password = st.sidebar.text_input("Wachtwoord", type="password")
 
     if st.sidebar.button("Login"):
-        user = login(email, password)
-        if user:
-            st.session_state["user"] = user
+        session = login(email, password)
+        if session:
+            st.session_state["user"] = session.user
+            st.session_state["session"] = session
+            st.session_state.pop("stores", None)
             st.success("✅ Ingelogd")
-            st.rerun()
+            rerun()
         else:
             st.error("❌ Login mislukt")
 
-    st.stop()
+    stop()
 
 # 👉 WEL ingelogd → toon user + logout
 st.sidebar.success("✅ Ingelogd")
@@ -76,698 +252,790 @@ st.sidebar.markdown(f"👤 {st.session_state['user'].email}")
 
 if st.sidebar.button("🚪 Logout"):
     st.session_state["user"] = None
-    st.rerun()
+    st.session_state.pop("stores", None)
+    st.session_state.pop("db", None)
+    rerun()
 
 # =====================
-# DATA LOAD
+# CLIENT PER GEBRUIKER
 # =====================
 
-@st.cache_data
-def load_data():
-
-    def fetch_all(table):
-        all_data = []
-        start = 0
-        batch = 1000
-
-        while True:
-            res = (
-                supabase.table(table)
-                .select("*")
-                .eq("store_id", store_id)
-                .range(start, start + batch - 1)
-                .execute()
-            )
-
-            data = res.data
-
-            if not data:
-                break
-
-            all_data.extend(data)
-
-            if len(data) < batch:
-                break
-
-            start += batch
-
-        return pd.DataFrame(all_data)
+# token van deze gebruiker over de gedeelde pool (geen nieuwe connecties)
+try:
+    session = clients.refresh(base, st.session_state["session"])
+except Exception:
+    # refresh token ongeldig → opnieuw inloggen
+    st.session_state["user"] = None
+    rerun()
 
-    return fetch_all("weeks"), fetch_all("shrink_data")
+st.session_state["session"] = session
 
-df_weeks, df_products = load_data()
+db = st.session_state.get("db")
+if db is None or db.access_token != session.access_token:
+    db = st.session_state["db"] = clients.UserClient(base, session.access_token)
 
-@st.cache_data
-def load_mapping():
+supabase = db
 
-    all_data = []
-    start = 0
-    batch = 1000
+# =====================
+# WINKEL
+# =====================
 
-    while True:
-        res = (
-            supabase.table("product_afdelingen")
-            .select("*")
-            .eq("store_id", store_id)
-            .range(start, start + batch - 1)
+def user_stores(user):
+    try:
+        rows = (
+            supabase.table("user_stores")
+            .select("store_id")
+            .eq("user_id", user.id)
             .execute()
+            .data
         )
+    except Exception as e:
+        # koppeltabel nog niet uitgerold (PGRST205 / 42P01) → enkel de
+        # standaardwinkel; elke andere fout (netwerk, auth) stopt de run,
+        # anders krijgt de gebruiker de data van een andere winkel
+        if getattr(e, "code", None) in ("PGRST205", "42P01"):
+            return [DEFAULT_STORE]
+        st.error(f"❌ Winkels konden niet geladen worden: {e}")
+        stop()
 
-        data = res.data
-
-        if not data:
-            break
-
-        all_data.extend(data)
+    return sorted(row["store_id"] for row in rows)
 
-        if len(data) < batch:
-            break
+if "stores" not in st.session_state:
+    st.session_state["stores"] = user_stores(st.session_state["user"])
 
-        start += batch
+stores = st.session_state["stores"]
 
-    df_mapping = pd.DataFrame(all_data)
+if not stores:
+    st.error("❌ Geen winkel gekoppeld aan deze gebruiker")
+    stop()
 
-    if "hope" in df_mapping.columns:
-        df_mapping["hope"] = df_mapping["hope"].astype(str).str.strip()
+if len(stores) == 1:
+    store_id = stores[0]
+else:
+    store_id = st.sidebar.selectbox("🏬 Winkel", stores, key="store_id")
 
-    return df_mapping
+st.sidebar.markdown(f"🏬 {store_id}")
 
 # =====================
-# MENU
+# DATA LOAD
 # =====================
 
-menu = st.sidebar.radio("Menu", [
-    "📊 Dashboard",
-    "📦 Product analyse (PRO)",
-    "➕ Data invoeren",
-    "📤 Upload",
-    "⚙️ Afdeling beheer"
-])
+# afgeleide resultaten per filterstand (Product analyse), apart budget
+@st.cache_resource
+def aggregate_cache():
+    return DatasetRegistry(
+        int(st.secrets.get("AGGREGATE_CACHE_MB", 128)) * 2**20,
+        sizeof=result_bytes,
+        max_entries=256
+    )
+
+# AI antwoorden per hash van de samenvatting, gedeeld over sessies (TTL)
+@st.cache_resource
+def insight_cache():
+    return insights.InsightCache()
+
+# alles per store_id gepartitioneerd: sleutel, versie en lokale cache;
+# `version` = een vaste versie die de aanroeper al las (zie product_analyse)
+def _dataset(name, loader, version_of=None, store=None, version=None):
+    store = store or store_id
+    if version is None and isinstance(version_of, tuple):
+        # afgeleid resultaat: verandert mee met elk van de bronnen
+        version = lambda: versions.etag(store, *version_of)
+    elif version is None:
+        # als functie: de registry leest de versie onder haar lock, zodat
+        # een swap van de warm-up (nieuwe waarde + bump) atomisch is
+        version = lambda: versions.get(store, version_of or name)
+    def build():
+        # enkel bij een miss: laden/opbouwen met de fetch/clean spans erin
+        with tracing.span(f"build:{name}", store=store) as span:
+            return span.size(loader(store))
+
+    return registry.get((store, name), version, build)
+
+# loaders in datasets.py (ook gebruikt door de achtergrond warm-up)
+def _load_weeks(store):
+    return datasets.load_weeks(supabase, store)
+
+def _load_shrink(store):
+    return datasets.load_shrink(supabase, store)
+
+def _load_mapping(store):
+    return datasets.load_mapping(supabase, store, versions.get(store, "product_afdelingen"))
+
+# lazy: een pagina laadt pas bij het eerste gebruik wat ze zelf nodig heeft
+def load_weeks(store=None):
+    return _dataset("weeks", _load_weeks, store=store)
+
+def load_shrink(store=None):
+    return _dataset("shrink_data", _load_shrink, store=store)
+
+def load_mapping(store=None):
+    return _dataset("product_afdelingen", _load_mapping, store=store)
+
+with st.sidebar.expander("🗄️ Cache"):
+    stats = registry.stats()
+    st.caption(
+        f"{stats['entries']} datasets · "
+        f"{stats['bytes'] / 2**20:.0f} / {stats['budget_bytes'] / 2**20:.0f} MB"
+    )
+    st.caption(
+        f"hits {stats['hits']} · misses {stats['misses']} · "
+        f"evictions {stats['evictions']} · hit rate {stats['hit_rate']:.0%}"
+    )
+    if background is not None:
+        refreshed = background.refreshed.get(store_id)
+        st.caption(
+            f"warm-up {'actief' if background.alive else 'gestopt'} · "
+            f"laatste refresh {time.strftime('%H:%M:%S', time.localtime(refreshed)) if refreshed else '-'}"
+        )
+        for (s, name), error in background.errors.items():
+            if s == store_id:
+                st.caption(f"⚠️ {name}: {error}")
+    elif WARMUP_STORES:
+        st.warning("Warm-up staat uit: SUPABASE_SERVICE_KEY ontbreekt in de secrets")
+
+def _load_afslag(store):
+    return datasets.load_afslag(supabase, store)
+
+def load_afslag(store=None):
+    try:
+        return _dataset("afslag_dag", _load_afslag, store=store)
+    except Exception:
+        # fallback zolang sql/afslag.sql niet uitgerold is
+        return _dataset(
+            "afslag_dag_lokaal",
+            lambda s: analytics.afslag_table(load_shrink(s)),
+            version_of="shrink_data",
+            store=store
+        )
 
 # =====================
-# DASHBOARD
+# WINKELVERGELIJKING
 # =====================
 
-if menu == "📊 Dashboard":
-
-    st.title("📊 Weekly Shrink Dashboard")
+@st.cache_data(ttl=600, max_entries=16)
+def _store_comparison_rpc(stores, jaar, etags):
+    return rpc.store_comparison(supabase, list(stores), jaar)
 
-    df = df_weeks.copy()
+def load_store_comparison(stores, jaar):
+    etags = tuple(versions.etag(s, "weeks", "afslag_dag") for s in stores)
+    try:
+        with tracing.span("rpc:store_comparison", stores=len(stores)):
+            return _store_comparison_rpc(stores, jaar, etags)
+    except Exception:
+        # per winkel aggregeren en enkel de totalen samenvoegen
+        return pd.DataFrame([
+            {
+                "store_id": s,
+                **analytics.store_summary(load_weeks(s), load_afslag(s), jaar)
+            }
+            for s in stores
+        ])
 
-    # =====================
-    # FILTER AFDELING
-    # =====================
+# =====================
+# DASHBOARD QUERIES
+# =====================
 
-    st.subheader("🎯 Afdeling")
+@st.cache_data(max_entries=8)
+def _dashboard_afdelingen_rpc(store_id, version):
+    return rpc.dashboard_afdelingen(supabase, store_id)
 
-    afdeling_opties = sorted(df["afdeling"].dropna().unique())
+@st.cache_data(max_entries=64)
+def _dashboard_rpc(store_id, version, afdelingen):
+    return rpc.dashboard_aggregates(supabase, store_id, afdelingen)
 
-    col1, col2 = st.columns([1, 3])
+def _use_rpc(fn, *args):
+    # valt terug op pandas als de SQL functies (nog) niet bestaan
+    if QUERY_MODE != "rpc":
+        return None, False
+    try:
+        return fn(store_id, versions.get(store_id, "weeks"), *args), True
+    except Exception as e:
+        st.toast(f"RPC niet beschikbaar, pandas fallback: {e}")
+        return None, False
+
+def load_dashboard_afdelingen():
+    with tracing.span("agg:dashboard_afdelingen"):
+        result, ok = _use_rpc(_dashboard_afdelingen_rpc)
+        return result if ok else analytics.dashboard_afdelingen(load_weeks())
+
+def load_dashboard(afdelingen):
+    with tracing.span("agg:dashboard", afdelingen=len(afdelingen)) as span:
+        result, ok = _use_rpc(_dashboard_rpc, afdelingen)
+        span.set(mode="rpc" if ok else "pandas")
+        return result if ok else analytics.dashboard_aggregates(load_weeks(), list(afdelingen))
 
-    with col1:
-        select_all_afdeling = st.checkbox("Alles", value=True, key="afd_all")
+# =====================
+# ONBEKENDE HOPE'S
+# =====================
 
-    with col2:
-        if select_all_afdeling:
-            selected_afdelingen = afdeling_opties
-        else:
-            selected_afdelingen = st.multiselect(
-                "Kies afdeling(en)",
-                afdeling_opties
-            )
+def _load_unmapped(store):
+    if QUERY_MODE == "rpc":
+        try:
+            return rpc.unmapped_hopes(supabase, store)
+        except Exception as e:
+            st.toast(f"RPC niet beschikbaar, pandas fallback: {e}")
 
-    # safety (zelfde als reden)
-    if not selected_afdelingen:
-        selected_afdelingen = afdeling_opties
+    return analytics.unmapped_hopes(
+        load_shrink(store),
+        load_mapping(store)
+    )
 
-    # filter toepassen
-    df = df[df["afdeling"].isin(selected_afdelingen)]
-    
-    if df.empty:
-        st.warning("Geen data")
-        st.stop()
+def load_unmapped(store=None):
+    return _dataset(
+        "unmapped_hopes",
+        _load_unmapped,
+        version_of=("shrink_data", "product_afdelingen"),
+        store=store
+    )
 
-    df["shrink"] = pd.to_numeric(df["shrink"], errors="coerce").fillna(0)
-    df["sales"] = pd.to_numeric(df["sales"], errors="coerce").fillna(0)
+def load_suggestions():
+    # afdeling suggesties voor alle onbekende HOPE's (suggest.py)
+    return _dataset(
+        "afdeling_suggestions",
+        lambda store: suggest.suggest(
+            suggest.training_set(
+                load_shrink(store),
+                load_mapping(store)
+            ),
+            load_unmapped(store)
+        ),
+        version_of=("shrink_data", "product_afdelingen")
+    )
 
-    total_shrink = df["shrink"].sum()
-    total_sales = df["sales"].sum()
-    shrink_pct = (total_shrink / total_sales * 100) if total_sales > 0 else 0
+# versie van alles wat de Product analyse leest (shrink_data + mapping + afslag_dag)
+PRODUCT_TABLES = ("shrink_data", "product_afdelingen", "afslag_dag")
 
-    latest_week = df["week"].max()
+def product_version(store=None):
+    return versions.etag(store or store_id, *PRODUCT_TABLES)
 
-    current = df[df["week"] == latest_week]["shrink"].sum()
-    previous = df[df["week"] == latest_week - 1]["shrink"].sum()
+def load_filter_index(store=None, version=None):
+    # version: etag van product_version(); de index hangt af van de eerste twee
+    return _dataset(
+        "filter_index",
+        lambda store: FilterIndex(load_shrink(store), load_mapping(store)),
+        version_of=PRODUCT_TABLES[:2],
+        store=store,
+        version=version[:2] if version is not None else None
+    )
 
-    delta = current - previous
+def load_product_engine(store=None, version=None):
+    # Arrow views op de gecachete frames, één DuckDB connectie per versie
+    return _dataset(
+        "product_engine",
+        lambda store: duck.ProductEngine(
+            load_shrink(store), load_mapping(store), load_afslag(store), DUCKDB_THREADS
+        ),
+        version_of=PRODUCT_TABLES,
+        store=store,
+        version=version
+    )
 
-    col1, col2, col3, col4 = st.columns([1.2, 1.2, 0.8, 1])
+def _use_duckdb(store, version=None):
+    # valt terug op pandas als duckdb niet geïnstalleerd is
+    if QUERY_MODE != "duckdb":
+        return None
+    if not duck.available():
+        st.toast("duckdb niet geïnstalleerd, pandas fallback")
+        return None
+    return load_product_engine(store, version)
+
+def _product_aggregates(store, index, rows, filters, version):
+    engine = _use_duckdb(store, version)
+    if engine is not None:
+        with tracing.span("agg:product_aggregates", mode="duckdb"):
+            return engine.product_aggregates(filters)
+
+    df_afslag = load_afslag(store)
+
+    with tracing.span("filter:afslag") as span:
+        df_afslag = span.size(analytics.filter_afslag(df_afslag, load_mapping(store), filters))
+
+    with tracing.span("merge:afdeling") as span:
+        df = span.size(index.take(rows))
+
+    with tracing.span("agg:product_aggregates"):
+        return analytics.product_aggregates(df, df_afslag)
+
+def load_product_aggregates(index, rows, filters, version, store=None):
+    # alle afgeleide cijfers per (versie, filterstand), LRU binnen een geheugenbudget.
+    # version = dezelfde product_version() als waarmee `index` opgehaald werd:
+    # een swap van de warm-up ertussen mag geen cijfers van de oude index
+    # onder de nieuwe versie cachen
+    store = store or store_id
+    state = tuple(sorted((k, str(v)) for k, v in filters.items() if v is not None))
+    return aggregate_cache().get(
+        (store, "product_aggregates", state),
+        version,
+        lambda: _product_aggregates(store, index, rows, filters, version)
+    )
 
-    col1.metric("💸 Totale shrink", f"€{total_shrink:.2f}")
-    col2.metric("🛒 Totale sales", f"€{total_sales:.2f}")
-    col3.metric("📊 Shrink %", f"{shrink_pct:.2f}%")
-    col4.metric("📉 vs vorige week", f"€{current:.2f}", f"{delta:.2f}", delta_color="inverse")
+def load_unmapped_index():
+    # zoekindex + HOPE → label, één keer per versie opgebouwd
+    return _dataset(
+        "unmapped_index",
+        lambda store: SearchIndex(load_unmapped(store)),
+        version_of=("shrink_data", "product_afdelingen")
+    )
 
-    # 📈 Trend
-    st.subheader("📈 Trend per week")
+# =====================
+# MENU
+# =====================
 
-    weekly = df.groupby(["jaar", "week"]).agg({
-        "shrink": "sum",
-        "sales": "sum"
-    }).reset_index()
+menu = st.sidebar.radio("Menu", [
+    "📊 Dashboard",
+    "📦 Product analyse (PRO)",
+    "➕ Data invoeren",
+    "📤 Upload",
+    "⚙️ Afdeling beheer"
+] + (["🏬 Winkelvergelijking"] if len(stores) > 1 else []))
 
-    weekly["label"] = weekly["jaar"].astype(str) + "-W" + weekly["week"].astype(str)
-    weekly = weekly.set_index("label")
+trace.name = menu
+trace.attrs["store"] = store_id
 
-    st.line_chart(weekly[["shrink", "sales"]])
+# =====================
+# DASHBOARD
+# =====================
 
-    # ⚖️ vergelijking
-    st.subheader("⚖️ Verschil vs vorige week per afdeling")
+if menu == "📊 Dashboard":
 
-    current_week = df[df["week"] == latest_week]
-    previous_week = df[df["week"] == latest_week - 1]
+    st.title("📊 Weekly Shrink Dashboard")
 
-    current_dept = current_week.groupby("afdeling").agg({
-        "shrink": "sum",
-        "sales": "sum"
-    }).rename(columns={"shrink": "current_shrink", "sales": "current_sales"})
+    # afdeling filter + KPI's + grafieken als één fragment
+    @fragment
+    def dashboard():
 
-    previous_dept = previous_week.groupby("afdeling").agg({
-        "shrink": "sum",
-        "sales": "sum"
-    }).rename(columns={"shrink": "previous_shrink", "sales": "previous_sales"})
+        # =====================
+        # FILTER AFDELING
+        # =====================
 
-    compare = current_dept.join(previous_dept, how="outer").fillna(0)
+        st.subheader("🎯 Afdeling")
 
-    # verschil in €
-    compare["verschil"] = compare["current_shrink"] - compare["previous_shrink"]
+        afdeling_opties = load_dashboard_afdelingen()
 
-    # percentage shrink huidig
-    compare["shrink_%"] = (
-        compare["current_shrink"] / compare["current_sales"] * 100
-    ).replace([np.inf, -np.inf], 0).fillna(0)
+        col1, col2 = st.columns([1, 3])
 
-    # afronden
-    compare = compare.round(2)
+        with col1:
+            select_all_afdeling = st.checkbox("Alles", value=True, key="afd_all")
 
-    st.dataframe(compare.sort_values("verschil", ascending=False))
+        with col2:
+            if select_all_afdeling:
+                selected_afdelingen = afdeling_opties
+            else:
+                selected_afdelingen = st.multiselect(
+                    "Kies afdeling(en)",
+                    afdeling_opties
+                )
 
-elif menu == "⚙️ Afdeling beheer":
+        # safety (zelfde als reden)
+        if not selected_afdelingen:
+            selected_afdelingen = afdeling_opties
 
-    st.title("⚙️ HOPE → Afdeling beheer")
+        # totalen, trend en vergelijking: server-side of pandas (QUERY_MODE)
+        agg = load_dashboard(tuple(selected_afdelingen))
 
-    # =====================
-    # ALLE SHRINK DATA OPHALEN (in batches)
-    # =====================
+        if agg is None:
+            st.warning("Geen data")
+            return
 
-    def fetch_all_shrink():
-        all_data = []
-        start = 0
-        batch = 1000
-
-        while True:
-            res = (
-                supabase.table("shrink_data")
-                .select("hope, product, euro")
-                .eq("store_id", store_id) 
-                .range(start, start + batch - 1)
-                .execute()
-            )
+        total_shrink = agg["total_shrink"]
+        total_sales = agg["total_sales"]
+        shrink_pct = (total_shrink / total_sales * 100) if total_sales > 0 else 0
 
-            data = res.data
+        compare = agg["compare"]
 
-            if not data:
-                break
+        week = analytics.week_comparison(compare)
+        current, delta = week["current"], week["delta"]
 
-            all_data.extend(data)
+        col1, col2, col3, col4 = st.columns([1.2, 1.2, 0.8, 1])
 
-            if len(data) < batch:
-                break
+        col1.metric("💸 Totale shrink", f"€{total_shrink:.2f}")
+        col2.metric("🛒 Totale sales", f"€{total_sales:.2f}")
+        col3.metric("📊 Shrink %", f"{shrink_pct:.2f}%")
+        col4.metric("📉 vs vorige week", f"€{current:.2f}", f"{delta:.2f}", delta_color="inverse")
 
-            start += batch
+        # 📈 Trend
+        st.subheader("📈 Trend per week")
 
-        return pd.DataFrame(all_data)
+        weekly = agg["trend"]
+        weekly = weekly.set_index(weekly["jaar"].astype(str) + "-W" + weekly["week"].astype(str))
 
-    df_shrink = fetch_all_shrink()
+        show_chart(st.line_chart, weekly[["shrink", "sales"]])
 
-    if df_shrink.empty:
-        st.warning("Geen data gevonden")
-        st.stop()
-        
-    # Zorg dat hope string is
-    df_shrink["hope"] = df_shrink["hope"].astype(str).str.strip()
+        # ⚖️ vergelijking
+        st.subheader("⚖️ Verschil vs vorige week per afdeling")
 
-    # =====================
-    # TOTAAL VERLIES PER HOPE
-    # =====================
+        show_dataframe(analytics.finish_compare(compare))
 
-    df_totals = (
-        df_shrink
-        .groupby(["hope", "product"], as_index=False)["euro"]
-        .sum()
-        .sort_values("euro", ascending=False)
-    )
+    dashboard()
 
-    # =====================
-    # MAPPING OPHALEN
-    # =====================
+elif menu == "⚙️ Afdeling beheer":
 
-    df_mapping = load_mapping()
-    st.write("Aantal mapping records:", len(df_mapping))
-    st.write("Voorbeeld mapping HOPE:", df_mapping["hope"].head())
+    st.title("⚙️ HOPE → Afdeling beheer")
 
     # =====================
-    # ENKEL NIET-GEMAPTE
+    # NIET-GEMAPTE HOPE'S (anti-join, gecachet tot mapping of upload wijzigt)
     # =====================
 
-    if not df_mapping.empty:
-         df_mapping = load_mapping()
+    df_onbekend = load_unmapped()
 
-         # 🔎 DEBUG START
-         if DEBUG:
-             st.write("Aantal mapping records:", len(df_mapping))
-             st.write("Voorbeeld mapping HOPE:", df_mapping["hope"].head(10).tolist())
-             st.write("Voorbeeld totals HOPE:", df_totals["hope"].head(10).tolist())
-         # 🔎 DEBUG EINDE
-
-         if not df_mapping.empty:
-             df_onbekend = df_totals[
-                 ~df_totals["hope"].astype(str).isin(df_mapping["hope"])
-             ]
-         else:
-            df_onbekend = df_totals.copy()
+    # 🔎 DEBUG START
+    if DEBUG:
+        mapping = load_mapping()
+        st.write("Aantal mapping records:", len(mapping))
+        st.write("Voorbeeld mapping HOPE:", mapping.hopes[:10].tolist())
+        st.write("Voorbeeld onbekende HOPE:", df_onbekend["hope"].head(10).tolist())
+    # 🔎 DEBUG EINDE
 
     if df_onbekend.empty:
         st.success("✅ Alle producten hebben een afdeling toegewezen!")
-        st.stop()
+        stop()
 
     st.metric("🔎 Onbekende producten", len(df_onbekend))
 
     # Toon top 20 onbekenden (gesorteerd op verlies)
-    st.dataframe(df_onbekend.head(20), use_container_width=True)
+    show_dataframe(df_onbekend.head(20), use_container_width=True)
 
     st.divider()
     st.subheader("✏️ Afdelingen toewijzen (meerdere tegelijk)")
 
     # Toon tabel met onbekenden
-    st.dataframe(
+    show_dataframe(
         df_onbekend[["hope", "product", "euro"]].head(100),
         use_container_width=True
     )
 
-    # 🔎 Zoekveld 
-    zoekterm = st.text_input("Zoek op HOPE of productnaam")
-
-    df_filter = df_onbekend.copy()
-    st.write("Lengte df_filter:", len(df_filter))
+    # zoeken en selecteren herlopen enkel dit blok
+    @fragment
+    def toewijzen():
 
-    if zoekterm:
-        df_filter = df_filter[
-            df_filter["hope"].astype(str).str.contains(zoekterm, case=False, na=False)
-        | df_filter["product"].str.contains(zoekterm, case=False, na=False)
-        ]
+        # 🔎 Zoekveld (trigram index, gerangschikt op verlies)
+        zoekterm = st.text_input("Zoek op HOPE of productnaam")
 
-    st.caption(f"{len(df_filter)} resultaten gevonden")
-
-    # Multi-select met eigen key
-    selected_hopes = st.multiselect(
-        "Selecteer HOPE's",
-        df_filter["hope"],
-        key="selected_hopes",
-        format_func=lambda x: f"{x} - {df_filter[df_filter['hope']==x]['product'].values[0]}"
-    )
+        index = load_unmapped_index()
+        gevonden = index.search(zoekterm)
 
-    # Selecteer alle knop
-    if st.button("Selecteer alle gefilterde resultaten"):
-        st.session_state["selected_hopes"] = df_filter["hope"].tolist()
-
-    # Afdelingen
-    afdelingen = [
-        "DIEPVRIES",
-        "VOEDING",
-        "PARFUMERIE",
-        "DROGISTERIJ",
-        "FRUIT EN GROENTEN",
-        "ZUIVEL",
-        "VERS VLEES",
-        "GEVOGELTE",
-        "CHARCUTERIE",
-        "VIS EN SAURISSERIE",
-        "SELF-TRAITEUR",
-        "BAKKERIJ",
-        "TRAITEUR",
-        "DRANKEN"
-    ]
-
-    if selected_hopes:
-
-        nieuwe_afdeling = st.selectbox("Nieuwe afdeling", afdelingen)
-        
-        if st.button("💾 Opslaan voor selectie"):
-
-            unique_hopes = list(set(selected_hopes))
-
-            data = [
-                {
-                    "store_id": store_id,
-                    "hope": str(hope),
-                    "afdeling": nieuwe_afdeling
-                }
-                for hope in unique_hopes
-            ]
-
-            try:
-                result = supabase.table("product_afdelingen") \
-                    .upsert(data, on_conflict="store_id,hope") \
-                    .execute()
-
-                st.session_state["save_message"] = f"✅ {len(unique_hopes)} producten toegewezen"
-                st.cache_data.clear()   # 🔥 wist ALLES
-                st.rerun()
-
-            except Exception as e:
-                st.error(f"❌ Fout bij opslaan: {e}")
-        # 👇 HIER komt de melding
-        if "save_message" in st.session_state:
-            st.success(st.session_state["save_message"])
-            del st.session_state["save_message"]
-    
-    
-# =====================
-# PRODUCT ANALYSE
-# =====================
-
-elif menu == "📦 Product analyse (PRO)":
-
-    st.title("📦 Shrink Intelligence Dashboard")
+        st.caption(f"{len(gevonden)} resultaten gevonden")
 
-    df = df_products.copy()
+        # Multi-select met eigen key
+        selected_hopes = st.multiselect(
+            "Selecteer HOPE's",
+            gevonden,
+            key="selected_hopes",
+            format_func=index.label
+        )
 
-    # =====================
-    # 🔄 LIVE MAPPING MERGE
-    # =====================
+        # Selecteer alle knop
+        if st.button("Selecteer alle gefilterde resultaten"):
+            st.session_state["selected_hopes"] = gevonden
 
-    # mapping ophalen
-    df_mapping = load_mapping()
+        if selected_hopes:
 
-    df["hope"] = df["hope"].astype(str).str.strip()
+            nieuwe_afdeling = st.selectbox("Nieuwe afdeling", AFDELINGEN)
+        
+            if st.button("💾 Opslaan voor selectie"):
 
-    if "hope" in df_mapping.columns:
-        df_mapping["hope"] = df_mapping["hope"].astype(str).str.strip()
+                unique_hopes = list(set(selected_hopes))
 
-    # verwijder oude afdeling uit shrink_data
-    if "afdeling" in df.columns:
-        df = df.drop(columns=["afdeling"])
+                data = [
+                    {
+                        "store_id": store_id,
+                        "hope": str(hope),
+                        "afdeling": nieuwe_afdeling
+                    }
+                    for hope in unique_hopes
+                ]
 
-    # merge met live mapping
-    df = df.merge(
-        df_mapping,
-        on="hope",
-        how="left"
-    )
+                try:
+                    result = supabase.table("product_afdelingen") \
+                        .upsert(data, on_conflict="store_id,hope") \
+                        .execute()
 
-    df["afdeling"] = df["afdeling"].fillna("ONBEKEND")
+                    st.session_state["save_message"] = f"✅ {len(unique_hopes)} producten toegewezen"
+                    versions.bump(store_id, "product_afdelingen")
+                    rerun()
 
-    # =====================
-    # AFSLAG ANALYSE (SNELLE VERSIE - GEEN LOOPS)
-    # =====================
+                except Exception as e:
+                    st.error(f"❌ Fout bij opslaan: {e}")
+            # 👇 HIER komt de melding
+            if "save_message" in st.session_state:
+                st.success(st.session_state["save_message"])
+                del st.session_state["save_message"]
 
-    df["datum"] = pd.to_datetime(df["datum"], errors="coerce")
+    toewijzen()
 
-    grouped = (
-        df.groupby(["hope", "datum", "reden"])["euro"]
-        .sum()
-        .reset_index()
-    )
+    @fragment
+    def suggesties():
 
-    afslag = grouped[grouped["reden"].str.contains("AFSLAG", case=False, na=False)]
-    verval = grouped[grouped["reden"].str.contains("VERVAL", case=False, na=False)]
-    tgtg = grouped[grouped["reden"] == "38 VERLIES - ANDERE"]
+        # =====================
+        # 🤖 SUGGESTIES (TF-IDF + kNN op de bestaande mappings)
+        # =====================
 
-    merged = afslag.merge(
-        verval[["hope", "datum", "euro"]],
-        on=["hope", "datum"],
-        how="left",
-        suffixes=("_afslag", "_verval")
-    )
+        st.divider()
+        st.subheader("🤖 Suggesties voor alle onbekende producten")
 
-    merged = merged.merge(
-        tgtg[["hope", "datum", "euro"]],
-        on=["hope", "datum"],
-        how="left"
-    )
+        if "suggest_message" in st.session_state:
+            st.success(st.session_state.pop("suggest_message"))
 
-    merged = merged.rename(columns={"euro": "euro_tgtg"})
+        if st.toggle("Suggesties berekenen", key="show_suggestions"):
 
-    merged["euro_verval"] = merged["euro_verval"].fillna(0)
-    merged["euro_tgtg"] = merged["euro_tgtg"].fillna(0)
+            df_suggest = load_suggestions()
 
-    afslag_euro = merged["euro_afslag"].sum()
-    verval_euro = merged["euro_verval"].sum()
-    tgtg_euro = merged["euro_tgtg"].sum()
+            if df_suggest.empty:
+                st.info("Nog te weinig gemapte producten om suggesties te maken")
+                return
 
-    effectief_verkocht = afslag_euro - verval_euro - tgtg_euro
+            min_conf = st.slider("Minimale confidence", 0.0, 1.0, 0.3, 0.05)
+            df_suggest = df_suggest[
+                (df_suggest["confidence"] >= min_conf)
+                & df_suggest["afdeling"].isin(AFDELINGEN)
+            ]
 
-    if afslag_euro > 0:
-        afslag_eff = (effectief_verkocht / afslag_euro) * 100
-    else:
-        afslag_eff = 0
+            st.caption(f"{len(df_suggest)} suggesties (gesorteerd op verlies)")
+
+            # afdeling aanpasbaar, vinkje uit = niet overnemen
+            df_edit = st.data_editor(
+                df_suggest.assign(overnemen=True)[
+                    ["overnemen", "hope", "product", "euro", "afdeling", "confidence", "gelijkend_op"]
+                ],
+                column_config={
+                    "overnemen": st.column_config.CheckboxColumn("✅"),
+                    "afdeling": st.column_config.SelectboxColumn("Afdeling", options=AFDELINGEN, required=True),
+                    "confidence": st.column_config.ProgressColumn("Confidence", min_value=0.0, max_value=1.0),
+                    "euro": st.column_config.NumberColumn("€", format="%.2f"),
+                },
+                disabled=["hope", "product", "euro", "confidence", "gelijkend_op"],
+                hide_index=True,
+                use_container_width=True,
+                key="suggest_editor"
+            )
 
-    # =====================
-    # CLEANING
-    # =====================
+            accepted = df_edit[df_edit["overnemen"]]
 
-    df["reden"] = df["reden"].fillna("Onbekend")
-    df = df[df["datum"].notna()]
-    df["stuks"] = pd.to_numeric(df["stuks"], errors="coerce").fillna(0)
-    df["euro"] = pd.to_numeric(df["euro"], errors="coerce").fillna(0)
+            if st.button(f"💾 {len(accepted)} suggesties overnemen", disabled=accepted.empty):
 
-    # =====================
-    # FILTER RIJ 1
-    # =====================
+                data = [
+                    {"store_id": store_id, "hope": str(hope), "afdeling": afdeling}
+                    for hope, afdeling in zip(accepted["hope"], accepted["afdeling"])
+                ]
 
-    col1, col2 = st.columns(2)
+                try:
+                    for i in range(0, len(data), MAPPING_BATCH):
+                        supabase.table("product_afdelingen") \
+                            .upsert(data[i:i + MAPPING_BATCH], on_conflict="store_id,hope") \
+                            .execute()
 
-    # 🏬 Afdeling
-    with col1:
-        st.subheader("🏬 Afdeling")
+                    st.session_state["suggest_message"] = f"✅ {len(data)} producten toegewezen"
+                    versions.bump(store_id, "product_afdelingen")
+                    rerun()
 
-        afdeling_opties = sorted(df["afdeling"].dropna().unique())
-        afdeling_keuze = st.selectbox(
-            "Kies afdeling",
-            ["Alles"] + afdeling_opties,
-            label_visibility="collapsed"
-        )
+                except Exception as e:
+                    # reeds geschreven blokken blijven staan; opnieuw proberen is veilig (upsert)
+                    versions.bump(store_id, "product_afdelingen")
+                    st.error(f"❌ Fout bij opslaan: {e}")
 
-        if afdeling_keuze != "Alles":
+    suggesties()
 
-            # mapping ophalen
-            df_mapping = load_mapping()
 
-            if not df_mapping.empty:
-                afdeling_hopes = df_mapping[
-                    df_mapping["afdeling"] == afdeling_keuze
-                ]["hope"].unique()
+# =====================
+# PRODUCT ANALYSE
+# =====================
 
-            df = df[df["hope"].isin(afdeling_hopes)]
-            
-            # HOPE's van gekozen afdeling
-            afdeling_hopes = df_mapping[
-                df_mapping["afdeling"] == afdeling_keuze
-            ]["hope"].unique()
+elif menu == "📦 Product analyse (PRO)":
 
-            # filter shrink_data op die HOPE's
-            df = df[df["hope"].isin(afdeling_hopes)]
+    st.title("📦 Shrink Intelligence Dashboard")
 
+    @fragment
+    def ai_inzichten(index, rows):
 
-    # 🎯 Reden
-    with col2:
-        st.subheader("🎯 Reden")
+        # =====================
+        # AI INSIGHTS
+        # =====================
 
-        reden_opties = sorted(df["reden"].dropna().unique())
-        reden_keuze = st.selectbox(
-            "Kies reden",
-            ["Alles"] + reden_opties,
-            label_visibility="collapsed"
-        )
+        st.subheader("🧠 AI inzichten")
 
-        if reden_keuze != "Alles":
-            df = df[df["reden"] == reden_keuze]
+        if st.button("Genereer AI inzichten"):
 
+            # exacte aggregaten over de gefilterde data (geen steekproef)
+            with tracing.span("agg:insight_summary"):
+                summary = insights.insight_summary(index.take(rows))
 
-    # =====================
-    # FILTER RIJ 2
-    # =====================
+            if summary is None:
+                st.info("Geen data voor deze filters")
+            else:
+                key = insights.summary_hash(summary, AI_MODEL)
+                ai_text = insight_cache().get(key)
 
-    col3, col4 = st.columns(2)
+                st.success("AI Analyse:")
 
-    # 📅 Periode
-    with col3:
-        st.subheader("📅 Periode")
+                if ai_text is not None:
+                    st.write(ai_text)
+                else:
+                    try:
+                        with tracing.span("ai:insight", model=AI_MODEL) as span:
+                            ai_text = st.write_stream(
+                                insights.stream_insight(client, insights.build_prompt(summary), AI_MODEL)
+                            )
+                            span.set(chars=len(ai_text))
+                        insight_cache().put(key, ai_text)
 
-        min_date = df["datum"].min()
-        max_date = df["datum"].max()
+                    except Exception as e:
+                        st.error(f"AI fout: {e}")
 
-        date_range = st.date_input(
-            "Kies periode",
-            [min_date, max_date],
-            label_visibility="collapsed"
-        )
+    # filters, KPI's en grafieken herlopen samen, zonder de rest van de app
+    @fragment
+    def product_analyse():
 
-        if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
-            df = df[
-                (df["datum"] >= pd.to_datetime(date_range[0])) &
-                (df["datum"] <= pd.to_datetime(date_range[1]))
-            ]
+        # versie één keer lezen: index en cijfers horen bij dezelfde data
+        version = product_version()
 
+        # nog geen upload voor deze winkel: geen index opbouwen
+        if load_shrink().empty:
+            st.warning("Geen data")
+            return
 
-    # 🔍 Zoek HOPE
-    with col4:
-        st.subheader("🔍 Zoek HOPE")
+        # filter index per versie van shrink_data + mapping (filters.py)
+        index = load_filter_index(version=version)
 
-        search_hope = st.text_input(
-            "Geef HOPE nummer",
-            label_visibility="collapsed"
-        )
+        # =====================
+        # FILTER RIJ 1
+        # =====================
 
-        if search_hope:
-            df = df[df["hope"].astype(str) == search_hope]
+        col1, col2 = st.columns(2)
 
+        # 🏬 Afdeling
+        with col1:
+            st.subheader("🏬 Afdeling")
 
-# ♻️ Recuperatie pakketten (38 VERLIES - ANDERE)
+            afdeling_opties = index.values("afdeling", index.rows())
+            afdeling_keuze = st.selectbox(
+                "Kies afdeling",
+                ["Alles"] + afdeling_opties,
+                label_visibility="collapsed"
+            )
 
-    tg2g = df[df["reden"] == "38 VERLIES - ANDERE"]
+        filters = {"afdeling": afdeling_keuze if afdeling_keuze != "Alles" else None}
 
-    verlies_andere = tg2g["euro"].sum()
 
-    waarde_pakket = 20
-    winst_per_pakket = 3.29   # of 3.29 als dat correct is
+        # 🎯 Reden
+        with col2:
+            st.subheader("🎯 Reden")
 
-    pakketten = verlies_andere / waarde_pakket
-    recup = pakketten * winst_per_pakket
+            reden_opties = index.values("reden", index.rows(**filters))
+            reden_keuze = st.selectbox(
+                "Kies reden",
+                ["Alles"] + reden_opties,
+                label_visibility="collapsed"
+            )
 
-    bruto = df["euro"].sum()
-    netto = bruto - recup
-    recup_pct = (recup / bruto) * 100 if bruto > 0 else 0
+        filters["reden"] = reden_keuze if reden_keuze != "Alles" else None
 
-    # =====================
-    # KPI BLOK (3 + 2 layout)
-    # =====================
 
-    # Rij 1 (3 kolommen)
-    col1, col2, col3 = st.columns(3)
+        # =====================
+        # FILTER RIJ 2
+        # =====================
 
-    col1.metric("💸 Bruto verlies", f"€{bruto:.2f}")
-    col2.metric("♻️ Too Good to Go", f"€{recup:.2f}", f"{int(pakketten)} pakketten")
-    col3.metric("💰 Netto verlies", f"€{netto:.2f}")
+        col3, col4 = st.columns(2)
 
-    st.markdown("")
+        # 📅 Periode
+        with col3:
+            st.subheader("📅 Periode")
 
-    # Rij 2 (4 kolommen)
-    col4, col5, col6, col7 = st.columns(4)
+            min_date, max_date = index.date_bounds(index.rows(**filters))
 
-    col4.metric("📦 Afslag totaal", f"€{afslag_euro:.2f}")
-    col5.metric("📛 Afslag vuilbak", f"€{verval_euro:.2f}")
-    col6.metric("♻️ Afslag TGTG", f"€{tgtg_euro:.2f}")
-    col7.metric(
-        "📉 Afslag efficiëntie",
-        f"{afslag_eff:.1f}%",
-        f"€{effectief_verkocht:.2f} effectief verkocht"
-    )
+            date_range = st.date_input(
+                "Kies periode",
+                [min_date, max_date],
+                label_visibility="collapsed"
+            )
 
-    st.divider()
+            if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
+                filters["start"] = pd.to_datetime(date_range[0])
+                filters["end"] = pd.to_datetime(date_range[1])
 
-    # 📊 grafieken
-    st.subheader("📊 Verlies per reden")
-    st.bar_chart(df.groupby("reden")["euro"].sum())
 
-    st.subheader("📈 Trend per week")
-    df["week"] = df["datum"].dt.isocalendar().week
-    st.line_chart(df.groupby("week")["euro"].sum())
+        # 🔍 Zoek HOPE
+        with col4:
+            st.subheader("🔍 Zoek HOPE")
 
+            search_hope = st.text_input(
+                "Geef HOPE nummer",
+                label_visibility="collapsed"
+            )
 
-    # =====================
-    # PRODUCTEN PER AFDELING
-    # =====================
+            # HOPE is een int32 code
+            search_code = pd.to_numeric(search_hope.strip(), errors="coerce") if search_hope else None
 
-    st.subheader("📦 Artikels per afdeling")
+            if search_hope:
+                filters["hope"] = search_code
 
-    producten_per_afdeling = (
-        df.groupby("afdeling")["product"]
-        .nunique()
-        .sort_values(ascending=False)
-    )
+        # rijnummers doorsnijden; materialiseren enkel als het resultaat niet in cache zit
+        rows = index.rows(**filters)
+        agg = load_product_aggregates(index, rows, filters, version)
 
-    st.bar_chart(producten_per_afdeling)
+        pakketten = agg["pakketten"]
+        recup = agg["recup"]
+        bruto = agg["bruto"]
+        netto = agg["netto"]
+        afslag = agg["afslag"]
 
-    st.subheader("🏆 Top producten binnen geselecteerde afdeling(en)")
+        # =====================
+        # KPI BLOK (3 + 2 layout)
+        # =====================
 
-    top_products = (
-        df.groupby(["afdeling", "product", "hope"])
-        .agg({
-            "stuks": "sum",
-            "euro": "sum"
-        })
-        .reset_index()
-        .sort_values(["afdeling", "euro"], ascending=[True, False])
-    )
+        # Rij 1 (3 kolommen)
+        col1, col2, col3 = st.columns(3)
 
-    st.dataframe(top_products, use_container_width=True)
+        col1.metric("💸 Bruto verlies", f"€{bruto:.2f}")
+        col2.metric("♻️ Too Good to Go", f"€{recup:.2f}", f"{int(pakketten)} pakketten")
+        col3.metric("💰 Netto verlies", f"€{netto:.2f}")
 
-    # =====================
-    # AI INSIGHTS
-    # =====================
+        st.markdown("")
 
-    from openai import OpenAI
-    import os
+        # Rij 2 (4 kolommen)
+        col4, col5, col6, col7 = st.columns(4)
 
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        col4.metric("📦 Afslag totaal", f"€{afslag['afslag_euro']:.2f}")
+        col5.metric("📛 Afslag vuilbak", f"€{afslag['verval_euro']:.2f}")
+        col6.metric("♻️ Afslag TGTG", f"€{afslag['tgtg_euro']:.2f}")
+        col7.metric(
+            "📉 Afslag efficiëntie",
+            f"{afslag['afslag_eff']:.1f}%",
+            f"€{afslag['effectief_verkocht']:.2f} effectief verkocht"
+        )
 
-    st.subheader("🧠 AI inzichten")
+        st.divider()
 
-    if st.button("Genereer AI inzichten"):
+        # 📊 grafieken
+        st.subheader("📊 Verlies per reden")
+        show_chart(st.bar_chart, agg["per_reden"])
 
-        # beperk data (belangrijk voor snelheid)
-        sample = df.sample(min(len(df), 50))
+        st.subheader("📈 Trend per week")
+        show_chart(st.line_chart, agg["per_week"])
 
-        summary = (
-            sample.groupby("reden")["euro"]
-            .sum()
-            .sort_values(ascending=False)
-            .head(5)
-        )
 
-        prompt = f"""
-        Analyseer deze retail shrink data.
+        # =====================
+        # PRODUCTEN PER AFDELING
+        # =====================
 
-        Top verlies redenen:
-        {summary.to_string()}
+        st.subheader("📦 Artikels per afdeling")
 
-        Geef:
-        - grootste probleem
-        - belangrijkste oorzaak
-        - 2 concrete acties voor de winkel
-        """
+        show_chart(st.bar_chart, agg["producten_per_afdeling"])
 
-        try:
-            response = client.responses.create(
-                model="gpt-4o-mini",
-                input=prompt
-            )
+        st.subheader("🏆 Top producten binnen geselecteerde afdeling(en)")
 
-            ai_text = response.output[0].content[0].text
+        show_dataframe(agg["top_products"], use_container_width=True)
 
-            st.success("AI Analyse:")
-            st.write(ai_text)
+        # 🧠 eigen fragment: de knop herberekent niets van hierboven
+        ai_inzichten(index, rows)
 
-        except Exception as e:
-            st.error(f"AI fout: {e}")
+        # 📋 detail (enkel de getoonde rijen formatteren)
+        df_display = index.take(rows[:200])
+        df_display = df_display.assign(datum=format_date_series(df_display["datum"]))
 
-    # 📋 detail
-    df_display = df.copy()
-    df_display["datum"] = format_date_series(df_display["datum"])
+        show_dataframe(df_display)
 
-    st.dataframe(df_display.head(200))
+    product_analyse()
 
 # =====================
 # 📤 UPLOAD (zelfde structuur)
@@ -781,130 +1049,82 @@ elif menu == "📤 Upload":
 
     if file is not None:
 
-        df = pd.read_excel(file)
-        df.columns = df.columns.str.strip()
-
         st.subheader("👀 Preview")
-        st.dataframe(df.head(20))
-
-        # =====================
-        # KOLOMMEN MAPPING
-        # =====================
+        show_dataframe(ingest.preview(file))
 
-        df = df.rename(columns={
-            "Datum": "datum",
-            "Benaming": "product",
-            "Reden / Winkel": "reden",
-            "Hoeveelheid": "stuks",
-            "Totale prijs": "euro",
-            "Hope": "hope"
-        })
+        # mapping: gepagineerd + gecachet, toegepast per blok via array lookup
+        mapping = load_mapping()
 
         # =====================
-        # CLEANING
+        # KPI PREVIEW (één streaming pass, onthouden per bestand)
         # =====================
 
-        df["datum"] = pd.to_datetime(df["datum"], errors="coerce")
-        df = df[df["datum"].notna()]
+        scan_key = (file.file_id, store_id)
 
-        if df.empty:
-            st.error("❌ Geen geldige data")
-            st.stop()
-
-        df["week"] = df["datum"].dt.isocalendar().week.astype(int)
-        df["jaar"] = df["datum"].dt.year.astype(int)
-        df["maand"] = df["datum"].dt.month.astype(int)
-
-        df["stuks"] = pd.to_numeric(df["stuks"], errors="coerce").fillna(0)
-        df["euro"] = pd.to_numeric(df["euro"], errors="coerce").fillna(0)
-
-        df["product"] = df["product"].astype(str).str.upper().str.strip()
-        df["reden"] = df["reden"].astype(str).str.strip()
-
-        # =====================
-        # HOPE FIX (cruciaal)
-        # =====================
-
-        df["hope"] = (
-            pd.to_numeric(df["hope"], errors="coerce")
-            .fillna(0)
-            .astype(int)
-            .astype(str)
-        )
-
-        # =====================
-        # AFDELING MAPPING
-        # =====================
-
-        mapping_res = (
-            supabase.table("product_afdelingen")
-            .select("*")
-            .eq("store_id", store_id)
-            .execute()
-        )
-        mapping_df = pd.DataFrame(mapping_res.data)
-
-        if not mapping_df.empty:
-            mapping_df["hope"] = mapping_df["hope"].astype(str)
-            df = df.merge(mapping_df, on="hope", how="left")
-        else:
-            df["afdeling"] = None
+        if st.session_state.get("upload_scan_key") != scan_key:
+            with st.spinner("🔎 Bestand scannen..."):
+                st.session_state["upload_scan"] = ingest.scan(file, mapping, store_id)
+            st.session_state["upload_scan_key"] = scan_key
 
-        df["afdeling"] = df["afdeling"].fillna("ONBEKEND")
+        scan = st.session_state["upload_scan"]
 
-        # =====================
-        # KOLOMMEN SELECTIE
-        # =====================
-
-        df = df[[
-            "datum","week","jaar","maand",
-            "afdeling",
-            "product","hope","reden","stuks","euro"
-        ]]
-
-        df["store_id"] = store_id
-        df["categorie"] = "ONBEKEND"
-
-        df = df.replace({np.nan: None})
-        df["datum"] = df["datum"].astype(str)
-
-        # =====================
-        # BEVEILIGING: max upload
-        # =====================
-
-        if len(df) > 10000:
-            st.error("❌ Max 10.000 records per upload")
-            st.stop()
-
-        # =====================
-        # KPI PREVIEW
-        # =====================
+        if scan["valid"] == 0:
+            st.error("❌ Geen geldige data")
+            stop()
 
         col1, col2, col3 = st.columns(3)
 
-        col1.metric("📦 Rijen", len(df))
-        col2.metric("💸 Totaal €", f"€{df['euro'].sum():.2f}")
-        col3.metric("🛒 Producten", df["product"].nunique())
+        col1.metric("📦 Rijen", scan["valid"])
+        col2.metric("💸 Totaal €", f"€{scan['euro']:.2f}")
+        col3.metric("🛒 Producten", scan["products"])
 
         # =====================
         # UPLOAD BUTTON
         # =====================
 
-        if st.button("🚀 Upload naar database"):
+        # manifest per bestand: afgewerkte batches worden niet opnieuw verstuurd
+        manifest = upload.UploadManifest(store_id, upload.file_hash(file.getvalue()))
 
-            data = df.to_dict(orient="records")
+        if manifest.complete:
+            st.info("ℹ️ Dit bestand werd al geüpload; opnieuw uploaden voegt geen dubbele lijnen toe")
+        elif manifest.started:
+            st.warning(f"⏸️ Onderbroken upload gevonden: {len(manifest.done)} batches al weggeschreven")
 
-            try:
-                for i in range(0, len(data), 500):
-                    supabase.table("shrink_data").insert(data[i:i+500]).execute()
+        label = "▶️ Hervat upload" if manifest.started and not manifest.complete else "🚀 Upload naar database"
+
+        if st.button(label):
 
-                st.success(f"✅ {len(data)} records geüpload")
+            progress = st.progress(0.0, text="Uploaden...")
+            stand = {"inserted": 0, "duplicates": 0}
 
-                st.cache_data.clear()
-                st.rerun()
+            try:
+                # blokken streamen, batches parallel + idempotent wegschrijven
+                for stand in upload.run_upload(
+                    supabase,
+                    store_id,
+                    ingest.iter_clean_chunks(file, mapping, store_id),
+                    manifest
+                ):
+                    progress.progress(
+                        min(stand["rows_read"] / max(scan["rows"], 1), 1.0),
+                        text=f"{stand['inserted']} nieuw · {stand['duplicates']} al aanwezig"
+                    )
+
+                st.success(
+                    f"✅ {stand['inserted']} records geüpload"
+                    f" ({stand['duplicates']} al aanwezig, {stand['skipped']} batches hervat)"
+                )
+
+                versions.bump(store_id, "shrink_data", "afslag_dag")
+                rerun()
 
-            except Exception:
-                st.error("❌ Er ging iets mis bij upload")
+            except Exception as e:
+                # een deel kan al weggeschreven zijn: manifest blijft staan
+                versions.bump(store_id, "shrink_data", "afslag_dag")
+                st.error(
+                    f"❌ Upload onderbroken na {stand['inserted']} records: {e}. "
+                    "Kies hetzelfde bestand opnieuw om te hervatten."
+                )
 
 # =====================
 # DATA INVOEREN
@@ -916,28 +1136,11 @@ elif menu == "➕ Data invoeren":
 
     today = datetime.datetime.now()
 
-    afdelingen = [
-        "DIEPVRIES",
-        "VOEDING",
-        "PARFUMERIE",
-        "DROGISTERIJ",
-        "FRUIT EN GROENTEN",
-        "ZUIVEL",
-        "VERS VLEES",
-        "GEVOGELTE",
-        "CHARCUTERIE",
-        "VIS EN SAURISSERIE",
-        "SELF-TRAITEUR",
-        "BAKKERIJ",
-        "TRAITEUR",
-        "DRANKEN"
-    ]
-
     jaar = st.number_input("Jaar", value=today.year)
     maand = st.number_input("Maand", value=today.month)
     week = st.number_input("Week", value=today.isocalendar()[1])
 
-    afdeling = st.selectbox("Afdeling", afdelingen)
+    afdeling = st.selectbox("Afdeling", AFDELINGEN)
 
     shrink = st.number_input("Shrink €")
     sales = st.number_input("Sales €")
@@ -955,7 +1158,90 @@ elif menu == "➕ Data invoeren":
         }).execute()
 
         st.success(f"✅ Opgeslagen voor {afdeling}")
-        st.cache_data.clear()
+        versions.bump(store_id, "weeks")
+
+# =====================
+# 🏬 WINKELVERGELIJKING
+# =====================
+
+elif menu == "🏬 Winkelvergelijking":
+
+    st.title("🏬 Winkelvergelijking")
+
+    jaar = st.number_input("Jaar", value=datetime.datetime.now().year, step=1)
+
+    # één rij per winkel, server-side geaggregeerd
+    df_cmp = load_store_comparison(tuple(stores), int(jaar))
+
+    if df_cmp.empty:
+        st.warning("Geen data")
+        stop()
+
+    df_cmp = df_cmp.set_index("store_id")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("📊 Shrink %")
+        show_chart(st.bar_chart, df_cmp["shrink_pct"])
+
+    with col2:
+        st.subheader("📦 Afslag vs vuilbak")
+        show_chart(st.bar_chart, df_cmp[["afslag_euro", "verval_euro", "tgtg_euro"]])
+
+    show_dataframe(df_cmp.round(2), use_container_width=True)
+
+# =====================
+# RERUN CPU (volledige run; fragment-runs komen hier niet)
+# =====================
+
+_finish(trace, "app", RUN_START)
+
+if DEBUG:
+    st.sidebar.caption(
+        " · ".join(f"{k} {v:.0f} ms" for k, v in st.session_state["rerun_cpu"].items())
+    )
+
+# =====================
+# PERFORMANCE (enkel admins)
+# =====================
+
+if st.session_state["user"].email.lower() in ADMIN_EMAILS:
+
+    with st.sidebar.expander("⏱️ Performance"):
+
+        log = trace_log()
+        pages = log.pages()
+        page = st.selectbox("Pagina", pages, index=pages.index(menu) if menu in pages else 0)
+        runs = log.recent(page)
+
+        st.dataframe(pd.DataFrame([
+            {
+                "tijd": time.strftime("%H:%M:%S", time.localtime(t.started_at)),
+                "ms": round(t.ms, 1),
+                "cpu_ms": t.attrs.get("cpu_ms"),
+                "traagste stap": next(iter(t.stages()), None),
+            }
+            for t in runs
+        ]), hide_index=True)
+
+        if runs:
+            run = st.selectbox(
+                "Run",
+                range(len(runs)),
+                format_func=lambda i: f"{time.strftime('%H:%M:%S', time.localtime(runs[i].started_at))} · {runs[i].ms:.0f} ms"
+            )
+            st.dataframe(
+                pd.DataFrame(runs[run].to_dict()["spans"]).drop(columns=["thread"], errors="ignore"),
+                hide_index=True
+            )
+
+        st.download_button(
+            "JSON", tracing.to_json(runs), f"traces_{store_id}.json", "application/json"
+        )
+        st.download_button(
+            "Chrome trace", tracing.to_chrome(runs), f"traces_{store_id}.trace.json", "application/json"
+        )
 
 
 
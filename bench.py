@@ -0,0 +1,556 @@
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import duck
+from fake_supabase import FakeSupabase
+from filters import FilterIndex
+import ingest
+import insights
+import loader
+import rpc
+from schema import AfdelingMapping, normalize_shrink
+from search import SearchIndex
+import suggest
+import synth
+import tracing
+import upload
+
+# =====================
+# BENCHMARKS (offline)
+# =====================
+#
+#   python bench.py loader --rows 100000 --latency 0.03
+#   python bench.py dashboard --years 5
+#   python bench.py upload --rows 20000 --latency 0.3
+#   python bench.py pipelines --sizes 10k,100k,1M,10M --save baseline.json
+#   python bench.py pipelines --sizes 10k,100k --baseline baseline.json
+#   python bench.py duckdb --sizes 100k,1M,10M
+
+
+def _shrink_rows(n, store_id="delhaize_halle", seed=42):
+    rnd = random.Random(seed)
+    return [
+        {
+            "store_id": store_id,
+            "datum": f"2025-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+            "hope": str(rnd.randint(100000, 999999)),
+            "product": f"PRODUCT {i % 5000}",
+            "reden": rnd.choice(["AFSLAG", "VERVAL", "38 VERLIES - ANDERE", "BREUK"]),
+            "stuks": rnd.randint(1, 10),
+            "euro": round(rnd.uniform(0.5, 40), 2),
+        }
+        for i in range(n)
+    ]
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def bench_loader(args):
+    client = FakeSupabase(
+        {"shrink_data": _shrink_rows(args.rows)},
+        latency=args.latency,
+        offset_cost=args.offset_cost,
+    )
+
+    client.requests = 0
+    old, t_old = _timed(lambda: loader.fetch_offset(client, "shrink_data", "*", "delhaize_halle"))
+    n_old = client.requests
+
+    client.requests = 0
+    new, t_new = _timed(lambda: loader.fetch_table(
+        client, "shrink_data", "*", "delhaize_halle", workers=args.workers
+    ))
+    n_new = client.requests
+
+    assert len(old) == len(new) == args.rows
+
+    print(f"rows={args.rows} latency={args.latency}s workers={args.workers}")
+    print(f"  offset (sequentieel): {t_old:7.2f}s  {n_old} requests")
+    print(f"  keyset (parallel)   : {t_new:7.2f}s  {n_new} requests")
+    print(f"  speedup             : {t_old / t_new:7.1f}x")
+
+
+def _weeks_rows(years, store_id="delhaize_halle", seed=42):
+    rnd = random.Random(seed)
+    afdelingen = ["DIEPVRIES", "VOEDING", "ZUIVEL", "BAKKERIJ", "DRANKEN", "TRAITEUR"]
+    return [
+        {
+            "store_id": store_id,
+            "jaar": 2020 + y,
+            "maand": min(w // 4 + 1, 12),
+            "week": w,
+            "afdeling": afd,
+            "shrink": round(rnd.uniform(50, 900), 2),
+            "sales": round(rnd.uniform(5000, 40000), 2),
+        }
+        for y in range(years)
+        for w in range(1, 53)
+        for afd in afdelingen
+        for _ in range(3)
+    ]
+
+
+def bench_dashboard(args):
+    # stand-in voor Postgres: de RPC draait server-side op dezelfde rijen
+    def rpc_aggregates(client, p_store_id, p_afdelingen=None):
+        df = pd.DataFrame(client.rows("weeks"))
+        agg = analytics.dashboard_aggregates(df[df["store_id"] == p_store_id], p_afdelingen)
+        return {
+            "total_shrink": agg["total_shrink"],
+            "total_sales": agg["total_sales"],
+            "latest_week": int(agg["latest_week"]),
+            "trend": agg["trend"].to_dict(orient="records"),
+            "compare": agg["compare"].reset_index().to_dict(orient="records"),
+        }
+
+    client = FakeSupabase({"weeks": _weeks_rows(args.years)}, latency=args.latency)
+    client.register_rpc("dashboard_aggregates", rpc_aggregates)
+
+    df_weeks = loader.fetch_table(client, "weeks", "*", "delhaize_halle")
+    afdelingen = analytics.dashboard_afdelingen(df_weeks)
+
+    # enkel de kost aan app-kant per interactie telt
+    _, t_pandas = _timed(lambda: [
+        analytics.dashboard_aggregates(df_weeks, afdelingen) for _ in range(args.repeat)
+    ])
+    client.latency = 0
+    _, t_rpc = _timed(lambda: [
+        rpc.dashboard_aggregates(client, "delhaize_halle", afdelingen) for _ in range(args.repeat)
+    ])
+    server = sum(
+        _timed(lambda: rpc_aggregates(client, "delhaize_halle", afdelingen))[1]
+        for _ in range(args.repeat)
+    )
+
+    print(f"weeks rijen={len(df_weeks)} ({args.years} jaar)")
+    print(f"  pandas (app)       : {t_pandas / args.repeat * 1000:7.1f} ms/interactie")
+    print(f"  rpc (app, decode)  : {(t_rpc - server) / args.repeat * 1000:7.1f} ms/interactie")
+    print(f"  rpc payload        : {len(rpc_aggregates(client, 'delhaize_halle', afdelingen)['trend'])} trend-rijen")
+
+
+def _upload_chunks(n, chunk_size=2000):
+    rows = pd.DataFrame(_shrink_rows(n)).drop(columns=["store_id"])
+    rows = rows.assign(
+        week=1, jaar=2025, maand=1, afdeling="ONBEKEND",
+        store_id="delhaize_halle", categorie="ONBEKEND"
+    )
+    for i in range(0, n, chunk_size):
+        chunk = rows.iloc[i:i + chunk_size]
+        yield len(chunk), chunk
+
+
+def bench_upload(args):
+    import tempfile
+    import local_store
+
+    local_store.CACHE_DIR = upload.CACHE_DIR = Path(tempfile.mkdtemp())
+
+    def shrink_insert(client, p_store_id, p_rows):
+        # server-side: geen tweede round-trip
+        written = client._apply_write(
+            "shrink_data", "upsert",
+            [dict(r, store_id=p_store_id) for r in p_rows],
+            "store_id,row_hash", True
+        )
+        return len(written)
+
+    # oud: sequentiële inserts van 500
+    client = FakeSupabase(latency=args.latency)
+    def sequential():
+        for _, chunk in _upload_chunks(args.rows):
+            data = chunk.to_dict(orient="records")
+            for i in range(0, len(data), 500):
+                client.table("shrink_data").insert(data[i:i + 500]).execute()
+    _, t_old = _timed(sequential)
+
+    client = FakeSupabase(latency=args.latency)
+    client.register_rpc("shrink_insert", shrink_insert)
+
+    def engine(digest):
+        manifest = upload.UploadManifest("delhaize_halle", digest)
+        return list(upload.run_upload(
+            client, "delhaize_halle", _upload_chunks(args.rows), manifest, workers=args.workers
+        ))[-1]
+
+    last, t_new = _timed(lambda: engine("eerste"))
+    again, t_again = _timed(lambda: engine("tweede"))
+
+    assert len(client.rows("shrink_data")) == args.rows
+
+    print(f"rows={args.rows} latency={args.latency}s workers={args.workers}")
+    print(f"  sequentieel insert  : {t_old:7.2f}s")
+    print(f"  engine (parallel)   : {t_new:7.2f}s  {last['inserted']} nieuw")
+    print(f"  speedup             : {t_old / t_new:7.1f}x")
+    print(f"  opnieuw uploaden    : {t_again:7.2f}s  {again['inserted']} nieuw, {again['duplicates']} dubbel")
+
+
+# =====================
+# PAGINA PIPELINES (synthetische data, headless)
+# =====================
+#
+# Dezelfde stappen als de pagina's, zonder Streamlit en zonder netwerk:
+# "load" is het normaliseren na een sync, de andere pipelines starten van
+# die genormaliseerde datasets. Upload = werkblad lezen + opkuis + row
+# hashes + payload per blok (het wegschrijven zelf meet `bench.py upload`);
+# tot 1M rijen uit een echte .xlsx (vooraf aangemaakt, niet gemeten), boven
+# de Excel-limiet uit DataFrame-blokken zonder de openpyxl parse. "rijen" =
+# lijnen in shrink_data; weeks krijgt rijen / 10 (zie synth.generate).
+
+def _sizes(text):
+    units = {"k": 1_000, "m": 1_000_000}
+    return [
+        int(float(part[:-1]) * units[part[-1].lower()]) if part[-1].lower() in units else int(part)
+        for part in text.split(",")
+    ]
+
+
+def pipeline_load(data):
+    with tracing.span("normalize_shrink"):
+        df = normalize_shrink(data["shrink_data"])
+    with tracing.span("mapping"):
+        mapping = AfdelingMapping(data["product_afdelingen"])
+    with tracing.span("afslag_table"):
+        afslag = analytics.afslag_table(df)
+    return {"weeks": data["weeks"], "shrink": df, "mapping": mapping, "afslag": afslag}
+
+
+def pipeline_dashboard(ds):
+    with tracing.span("afdelingen"):
+        afdelingen = analytics.dashboard_afdelingen(ds["weeks"])
+    with tracing.span("aggregates_alle"):
+        agg = analytics.dashboard_aggregates(ds["weeks"], afdelingen)
+        analytics.finish_compare(agg["compare"])
+    with tracing.span("aggregates_een"):
+        analytics.dashboard_aggregates(ds["weeks"], afdelingen[:1])
+
+
+def pipeline_product(ds):
+    with tracing.span("filter_index"):
+        index = FilterIndex(ds["shrink"], ds["mapping"])
+
+    with tracing.span("alles"):
+        analytics.product_aggregates(index.take(index.rows()), ds["afslag"])
+
+    # grootste afdeling + laatste 3 maanden, zoals een typische filterstand
+    afdeling = index.values("afdeling", index.rows())[0]
+    start, end = index.date_bounds(index.rows())
+    start = end - pd.Timedelta(days=90)
+
+    with tracing.span("gefilterd"):
+        rows = index.rows(afdeling=afdeling, start=start, end=end)
+        afslag = analytics.filter_afslag(
+            ds["afslag"], ds["mapping"], {"afdeling": afdeling, "start": start, "end": end}
+        )
+        df = index.take(rows)
+        analytics.product_aggregates(df, afslag)
+
+    with tracing.span("insight_summary"):
+        insights.insight_summary(df)
+
+
+def pipeline_beheer(ds):
+    with tracing.span("unmapped"):
+        unmapped = analytics.unmapped_hopes(ds["shrink"], ds["mapping"])
+    with tracing.span("search_index"):
+        index = SearchIndex(unmapped)
+    with tracing.span("zoeken"):
+        for query in ("pa", "kaas", "delhaize", "1234"):
+            index.search(query)
+    with tracing.span("suggesties"):
+        suggest.suggest(suggest.training_set(ds["shrink"], ds["mapping"]), unmapped)
+
+
+def pipeline_upload(ds, data):
+    seen = Counter()
+    if "workbook" in data:
+        chunks = ingest.iter_raw_chunks(data["workbook"], ingest.CHUNK_SIZE)
+    else:
+        chunks = synth.excel_chunks(data["shrink_data"], ingest.CHUNK_SIZE)
+
+    while True:
+        with tracing.span("parse"):
+            raw = next(chunks, None)
+        if raw is None:
+            break
+        with tracing.span("clean_chunk"):
+            chunk = ingest.clean_chunk(raw, ds["mapping"], synth.STORE_ID)
+        with tracing.span("row_hashes"):
+            chunk = upload.add_row_hashes(chunk, synth.STORE_ID, seen)
+        with tracing.span("payload"):
+            chunk.to_dict(orient="records")
+
+
+PIPELINES = {
+    "load": lambda data, ds: pipeline_load(data),
+    "dashboard": lambda data, ds: pipeline_dashboard(ds),
+    "product": lambda data, ds: pipeline_product(ds),
+    "beheer": lambda data, ds: pipeline_beheer(ds),
+    "upload": lambda data, ds: pipeline_upload(ds, data),
+}
+
+
+def _run_pipeline(fn, memory):
+    # (seconden, piek MB of None, tijd per stap); het resultaat zelf wordt
+    # meteen vrijgegeven zodat runs elkaars geheugen niet meetellen
+    trace = tracing.start("bench")
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    tracing.finish(trace)
+    return seconds, peak, trace.stages()
+
+
+def bench_pipelines(args):
+    names = args.only.split(",") if args.only else list(PIPELINES)
+    results = []
+
+    print(f"{'pipeline':<10} {'rijen':>10} {'tijd':>9} {'piek':>9} {'rijen/s':>12}  traagste stappen")
+
+    for rows in _sizes(args.sizes):
+        data = synth.generate(rows, seed=args.seed)
+        ds = pipeline_load(data)
+        if "upload" in names and rows <= synth.EXCEL_MAX_ROWS:
+            data["workbook"] = synth.excel_workbook(data["shrink_data"])
+
+        for name in names:
+            fn = PIPELINES[name]
+            times = []
+            for _ in range(args.repeat):
+                seconds, _, stages = _run_pipeline(lambda: fn(data, ds), memory=False)
+                times.append(seconds)
+            seconds = min(times)
+
+            # piekgeheugen in een aparte run: tracemalloc vertraagt zelf
+            peak = None
+            if not args.no_memory:
+                _, peak, _ = _run_pipeline(lambda: fn(data, ds), memory=True)
+
+            results.append({"pipeline": name, "rows": rows, "seconds": seconds, "peak_mb": peak})
+            top = ", ".join(f"{k} {v:.0f}ms" for k, v in list(stages.items())[:3])
+            peak_text = f"{peak:7.1f}MB" if peak is not None else f"{'-':>9}"
+            print(f"{name:<10} {rows:>10,} {seconds:8.3f}s {peak_text} {rows / seconds:>12,.0f}  {top}")
+
+        del data, ds
+
+    if args.save:
+        Path(args.save).write_text(json.dumps({"seed": args.seed, "results": results}, indent=2))
+
+    if args.baseline:
+        baseline = {
+            (r["pipeline"], r["rows"]): r
+            for r in json.loads(Path(args.baseline).read_text())["results"]
+        }
+        regressions = []
+        for r in results:
+            old = baseline.get((r["pipeline"], r["rows"]))
+            if old is None:
+                continue
+            # relatief én absoluut trager: ruis op kleine datasets negeren
+            slower = r["seconds"] - old["seconds"]
+            if slower > args.min_delta and r["seconds"] > old["seconds"] * (1 + args.tolerance):
+                regressions.append(f"  {r['pipeline']} @ {r['rows']:,}: {old['seconds']:.3f}s → {r['seconds']:.3f}s")
+            if r["peak_mb"] and old.get("peak_mb") and r["peak_mb"] > old["peak_mb"] * (1 + args.tolerance):
+                regressions.append(f"  {r['pipeline']} @ {r['rows']:,}: {old['peak_mb']:.1f}MB → {r['peak_mb']:.1f}MB")
+
+        if regressions:
+            print(f"❌ regressies t.o.v. {args.baseline} (tolerantie {args.tolerance:.0%}):")
+            print("\n".join(regressions))
+            sys.exit(1)
+        print(f"✅ geen regressies t.o.v. {args.baseline}")
+
+
+def _product_states(index):
+    # typische filterstanden van de Product analyse
+    afdeling = index.values("afdeling", index.rows())[0]
+    reden = index.values("reden", index.rows())[0]
+    start, end = index.date_bounds(index.rows())
+    hope = index.frame["hope"].iloc[0]
+    return {
+        "alles": {},
+        "afdeling": {"afdeling": afdeling},
+        "afdeling+90d": {"afdeling": afdeling, "start": end - pd.Timedelta(days=90), "end": end},
+        "reden": {"reden": reden},
+        "afdeling+reden": {"afdeling": afdeling, "reden": reden},
+        "hope": {"hope": hope, "start": start, "end": end},
+        "geen rijen": {"afdeling": "BESTAAT NIET"},
+    }
+
+
+def _max_diff(a, b):
+    # grootste relatieve afwijking tussen twee float resultaten
+    a = np.asarray(a, dtype="float64")
+    b = np.asarray(b, dtype="float64")
+    return float(np.max(np.abs(a - b) / np.maximum(np.abs(a), 1e-9), initial=0.0))
+
+
+def _parity(expected, actual):
+    # (verschillen, max relatieve afwijking); enkel de optelvolgorde van
+    # de float64 sommen mag verschillen
+    problems, diff = [], 0.0
+    for key, value in expected.items():
+        other = actual[key]
+        if isinstance(value, dict):
+            diff = max(diff, _max_diff(list(value.values()), list(other.values())))
+        elif isinstance(value, pd.Series):
+            if not value.index.equals(other.index) or value.dtype != other.dtype:
+                problems.append(key)
+            elif key == "producten_per_afdeling" and not value.equals(other):
+                problems.append(key)
+            else:
+                diff = max(diff, _max_diff(value, other))
+        elif isinstance(value, pd.DataFrame):
+            if value.empty or other.empty:
+                if value.empty != other.empty or list(value.columns) != list(other.columns):
+                    problems.append(key)
+                continue
+            # producten met (bijna) gelijke bedragen mogen van plaats wisselen;
+            # stuks in kg is float32 en telt mee als som
+            keys = ["afdeling", "product", "hope"]
+            value = value.sort_values(keys).reset_index(drop=True)
+            other = other.sort_values(keys).reset_index(drop=True)
+            if not value[keys].equals(other[keys]) or not value.dtypes.equals(other.dtypes):
+                problems.append(key)
+            else:
+                diff = max(diff, _max_diff(value["stuks"], other["stuks"]), _max_diff(value["euro"], other["euro"]))
+        else:
+            diff = max(diff, _max_diff(value, other))
+    if diff > 1e-6:
+        problems.append(f"afwijking {diff:.1e}")
+    return problems, diff
+
+
+def _kg_data():
+    # gewichtsartikelen: 0,4 + 0,4 kg KAAS blijft 0,8 (geen afronding naar 1)
+    shrink = pd.DataFrame({
+        "id": [1, 2, 3, 4],
+        "store_id": synth.STORE_ID,
+        "datum": ["2024-03-04", "2024-03-04", "2024-03-05", "2024-03-05"],
+        "hope": ["100001", "100001", "100002", "100003"],
+        "product": ["KAAS BIO 250G", "KAAS BIO 250G", "HAM DELHAIZE 100G", "PASTA BARILLA 500G"],
+        "reden": ["AFSLAG", "AFSLAG", "VERVAL", "01 BREUK"],
+        "stuks": [0.4, 0.4, 1.25, 2.0],
+        "euro": [3.16, 3.16, 4.99, 2.58],
+    })
+    mapping = pd.DataFrame({
+        "id": [1, 2],
+        "store_id": synth.STORE_ID,
+        "hope": ["100001", "100002"],
+        "afdeling": ["ZUIVEL", "CHARCUTERIE"],
+    })
+    return {"weeks": pd.DataFrame(), "shrink_data": shrink, "product_afdelingen": mapping}
+
+
+def _compare_engines(rows, ds, args):
+    # opbouw: één keer per versie van de datasets
+    index, t_index = _timed(lambda: FilterIndex(ds["shrink"], ds["mapping"]))
+    engine, t_engine = _timed(lambda: duck.ProductEngine(
+        ds["shrink"], ds["mapping"], ds["afslag"], args.threads
+    ))
+    print(f"{rows:>10,} {'opbouw':<15} {t_index * 1000:8.1f}ms {t_engine * 1000:8.1f}ms")
+
+    def pandas_path(filters):
+        return analytics.product_aggregates(
+            index.take(index.rows(**filters)),
+            analytics.filter_afslag(ds["afslag"], ds["mapping"], filters)
+        )
+
+    for name, filters in _product_states(index).items():
+        expected, t_pandas = min(
+            (_timed(lambda: pandas_path(filters)) for _ in range(args.repeat)), key=lambda r: r[1]
+        )
+        actual, t_duck = min(
+            (_timed(lambda: engine.product_aggregates(filters)) for _ in range(args.repeat)), key=lambda r: r[1]
+        )
+        problems, diff = _parity(expected, actual)
+        status = f"❌ {', '.join(problems)}" if problems else f"✅ (max {diff:.0e})"
+        print(f"{rows:>10,} {name:<15} {t_pandas * 1000:8.1f}ms {t_duck * 1000:8.1f}ms "
+              f"{t_pandas / t_duck:5.1f}x  {status}")
+
+    engine.close()
+
+
+def bench_duckdb(args):
+    if not duck.available():
+        sys.exit("duckdb is niet geïnstalleerd (pip install duckdb)")
+
+    print(f"{'rijen':>10} {'filter':<15} {'pandas':>9} {'duckdb':>9} {'x':>6}  pariteit")
+
+    for rows in _sizes(args.sizes):
+        data = synth.generate(rows, seed=args.seed)
+        ds = pipeline_load(data)
+        _compare_engines(rows, ds, args)
+        del data, ds
+
+    print("gewichtsartikelen (kg):")
+    data = _kg_data()
+    _compare_engines(len(data["shrink_data"]), pipeline_load(data), args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks shrink-analyzer")
+    sub = parser.add_subparsers(dest="bench", required=True)
+
+    p = sub.add_parser("loader", help="offset-lus vs keyset bulk loader")
+    p.add_argument("--rows", type=int, default=50_000)
+    p.add_argument("--latency", type=float, default=0.03)
+    p.add_argument("--offset-cost", type=float, default=1e-7)
+    p.add_argument("--workers", type=int, default=loader.WORKERS)
+    p.set_defaults(fn=bench_loader)
+
+    p = sub.add_parser("dashboard", help="pandas vs RPC dashboard aggregaties")
+    p.add_argument("--years", type=int, default=5)
+    p.add_argument("--latency", type=float, default=0.0)
+    p.add_argument("--repeat", type=int, default=20)
+    p.set_defaults(fn=bench_dashboard)
+
+    p = sub.add_parser("upload", help="sequentiële inserts vs upload engine")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--latency", type=float, default=0.3)
+    p.add_argument("--workers", type=int, default=4)
+    p.set_defaults(fn=bench_upload)
+
+    p = sub.add_parser("pipelines", help="alle pagina pipelines op synthetische data")
+    p.add_argument("--sizes", default="10k,100k,1M,10M")
+    p.add_argument("--only", default=None, help="bv. product,beheer")
+    p.add_argument("--seed", type=int, default=synth.SEED)
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--no-memory", action="store_true", help="geen tracemalloc run")
+    p.add_argument("--save", default=None, help="resultaten als JSON (nieuwe baseline)")
+    p.add_argument("--baseline", default=None, help="vergelijk met een eerder --save bestand")
+    p.add_argument("--tolerance", type=float, default=0.25)
+    p.add_argument("--min-delta", type=float, default=0.05, help="seconden")
+    p.set_defaults(fn=bench_pipelines)
+
+    p = sub.add_parser("duckdb", help="Product analyse: pandas vs DuckDB (tijd + pariteit)")
+    p.add_argument("--sizes", default="100k,1M,10M")
+    p.add_argument("--seed", type=int, default=synth.SEED)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--threads", type=int, default=None, help="standaard: alle cores")
+    p.set_defaults(fn=bench_duckdb)
+
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import threading
+from collections import OrderedDict
+
+# =====================
+# DATASET VERSIES
+# =====================
+#
+# Eén versienummer per (store_id, dataset). De loaders krijgen de versie
+# mee als cache-sleutel: na een write bumpt de app enkel de datasets die
+# effectief gewijzigd zijn, de rest blijft in cache.
+
+DATASETS = ("weeks", "shrink_data", "product_afdelingen", "afslag_dag")
+
+
+class DatasetVersions:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def get(self, store_id, name):
+        return self._versions.get((store_id, name), 0)
+
+    def bump(self, store_id, *names):
+        with self._lock:
+            for name in names:
+                if name not in DATASETS:
+                    raise KeyError(f"Onbekende dataset: {name}")
+                key = (store_id, name)
+                self._versions[key] = self._versions.get(key, 0) + 1
+
+    def etag(self, store_id, *names):
+        # samengestelde sleutel voor afgeleide resultaten
+        return tuple(self.get(store_id, name) for name in names)
+
+
+# =====================
+# GEDEELDE DATASET REGISTRY
+# =====================
+#
+# Eén kopie per (sleutel, versie) voor het hele proces, i.p.v. een kopie
+# per sessie zoals st.cache_data. Frames zijn read-only: pagina's maken
+# nieuwe frames (filter/assign, copy-on-write) en wijzigen nooit in-place.
+# Boven het geheugenbudget gaat de minst recent gebruikte dataset eruit.
+
+
+def frame_bytes(value):
+    if hasattr(value, "memory_usage"):
+        usage = value.memory_usage(deep=True)
+        return int(usage.sum() if hasattr(usage, "sum") else usage)
+    return 0
+
+
+def result_bytes(value):
+    # afgeleide resultaten: dicts/lijsten met frames, series en getallen
+    if isinstance(value, dict):
+        return sum(result_bytes(v) for v in value.values()) + 64 * len(value)
+    if isinstance(value, (list, tuple)):
+        return sum(result_bytes(v) for v in value) + 8 * len(value)
+    return frame_bytes(value) or 32
+
+
+class DatasetRegistry:
+
+    def __init__(self, budget_bytes, sizeof=frame_bytes, max_entries=None):
+        self.budget_bytes = budget_bytes
+        self.max_entries = max_entries
+        self._sizeof = sizeof
+        self._lock = threading.Lock()
+        self._loading = {}
+        self._entries = OrderedDict()   # key -> (version, value, bytes)
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version, loader):
+        # version mag een functie zijn: dan wordt ze onder de lock gelezen,
+        # zodat een swap() (versie bump + nieuwe waarde) atomisch is
+        with self._lock:
+            current = version() if callable(version) else version
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == current:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            key_lock = self._loading.setdefault(key, threading.Lock())
+
+        # één loader per sleutel tegelijk; de rest wacht en krijgt een hit
+        with key_lock:
+            with self._lock:
+                current = version() if callable(version) else version
+                entry = self._entries.get(key)
+                if entry is not None and entry[0] == current:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                self.misses += 1
+
+            value = loader()
+            self.put(key, current, value)
+            return value
+
+    def put(self, key, version, value):
+        size = self._sizeof(value)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (version, value, size)
+            self._bytes += size
+            self._evict(keep=key)
+
+    def swap(self, values, commit=None):
+        """Vervang waarden in één stap, zonder dat iemand een koude fetch ziet.
+
+        `values` is {key: (versie of versie-functie, waarde)}. `commit` (bv.
+        een versions.bump) loopt onder dezelfde lock; versie-functies worden
+        pas daarna gelezen. Versie None = deze waarde niet bewaren.
+        """
+        sizes = {key: self._sizeof(value) for key, (_, value) in values.items()}
+        with self._lock:
+            if commit is not None:
+                commit()
+            for key, (version, value) in values.items():
+                current = version() if callable(version) else version
+                if current is None:
+                    continue
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[2]
+                self._entries[key] = (current, value, sizes[key])
+                self._bytes += sizes[key]
+                self._evict(keep=key)
+
+    def peek(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return None if entry is None else entry[:2]
+
+    def drop(self, key):
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+
+    def _full(self):
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self._bytes > self.budget_bytes
+
+    def _evict(self, keep):
+        while self._full() and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                self._entries.move_to_end(key)
+                key = next(iter(self._entries))
+            _, _, size = self._entries.pop(key)
+            self._loading.pop(key, None)
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "budget_bytes": self.budget_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+                "keys": [
+                    (key, version, size)
+                    for key, (version, _, size) in self._entries.items()
+                ],
+            }
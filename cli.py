@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+import analytics
+import kpis
+import synth
+from storage import TABLES, LocalStorage, Storage, SupabaseStorage
+
+# =====================
+# BATCH CLI
+# =====================
+#
+#   python cli.py kpis --source local --root data --periods 2024,2025-Q1 --out kpis.csv
+#   python cli.py kpis --source supabase --stores delhaize_halle,delhaize_ninove --workers 4
+#   python cli.py export --root data --stores delhaize_halle      (Supabase → Parquet)
+#   python cli.py synth --root data --stores test_a,test_b --rows 1M
+#
+# Eén job per winkel in een process pool: elke worker laadt de datasets van
+# zijn winkel één keer en rekent alle periodes. Supabase: SUPABASE_URL en
+# SUPABASE_SERVICE_KEY uit de omgeving (de anon key ziet onder RLS niets).
+
+
+def _supabase(args: argparse.Namespace) -> SupabaseStorage:
+    try:
+        return SupabaseStorage.from_env(args.stores.split(",") if args.stores else None)
+    except RuntimeError as e:
+        sys.exit(str(e))
+
+
+def _storage(args: argparse.Namespace) -> Storage:
+    if args.source == "supabase":
+        return _supabase(args)
+    return LocalStorage(args.root)
+
+
+def _store_job(storage: Storage, store_id: str, periods: list[kpis.Period],
+               winst_per_pakket: float, top: int) -> tuple[list[dict], list[dict], float]:
+    start = time.perf_counter()
+    data = kpis.load(storage, store_id)
+
+    rows, top_rows = [], []
+    for period in periods:
+        rows.append(kpis.store_kpis(data, store_id, period, winst_per_pakket).row())
+        if top:
+            shrink = data.shrink[period.mask(data.shrink["datum"])] if len(data.shrink) else data.shrink
+            if len(shrink):
+                # float32 opslag laat anders ruis in CSV/JSON: euro op centen, kg op grammen
+                products = kpis.top_products(shrink, data.mapping, top)
+                stuks = products["stuks"]
+                products = products.assign(
+                    stuks=stuks.astype("float64").round(3) if stuks.dtype.kind == "f" else stuks,
+                    euro=products["euro"].round(2)
+                )
+                top_rows.extend(
+                    {"store_id": store_id, "period": period.name, "rank": i + 1, **r}
+                    for i, r in enumerate(products.astype({"afdeling": str, "product": str}).to_dict(orient="records"))
+                )
+
+    return rows, top_rows, time.perf_counter() - start
+
+
+def _write(df: pd.DataFrame, path: str) -> None:
+    if path.endswith(".json"):
+        Path(path).write_text(df.to_json(orient="records", indent=2, force_ascii=False))
+    elif path.endswith(".parquet"):
+        df.to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+
+
+def cmd_kpis(args: argparse.Namespace) -> None:
+    storage = _storage(args)
+    stores = args.stores.split(",") if args.stores else storage.stores()
+    if not stores:
+        sys.exit("Geen winkels gevonden")
+    periods = [kpis.Period.parse(p) for p in args.periods.split(",")]
+
+    rows, top_rows, failed = [], [], []
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(stores))) as pool:
+        jobs = {
+            pool.submit(_store_job, storage, store, periods, args.winst_per_pakket, args.top): store
+            for store in stores
+        }
+        for job in as_completed(jobs):
+            store = jobs[job]
+            try:
+                store_rows, store_top, seconds = job.result()
+            except Exception as e:
+                print(f"  ❌ {store}: {e}", file=sys.stderr)
+                failed.append(store)
+                continue
+            rows.extend(store_rows)
+            top_rows.extend(store_top)
+            print(f"  {store:<24} {len(store_rows)} periodes  {seconds:6.2f}s", file=sys.stderr)
+
+    print(f"{len(stores) - len(failed)}/{len(stores)} winkels × {len(periods)} periodes in "
+          f"{time.perf_counter() - start:.2f}s ({args.workers} workers)", file=sys.stderr)
+
+    if not rows:
+        sys.exit("Geen resultaten: alle winkels faalden")
+
+    df = pd.DataFrame(rows).sort_values(["store_id", "period"], kind="stable").reset_index(drop=True)
+
+    if args.out:
+        _write(df, args.out)
+    else:
+        print(df.to_string(index=False))
+
+    if args.top and args.top_out:
+        _write(pd.DataFrame(top_rows), args.top_out)
+
+    # gedeeltelijke resultaten zijn weggeschreven, maar niet stil slagen
+    if failed:
+        sys.exit(f"{len(failed)} winkel(s) faalden: {', '.join(sorted(failed))}")
+
+
+def cmd_export(args: argparse.Namespace) -> None:
+    # Supabase → lokale Parquet bestanden (zelfde kolommen als de app laadt)
+    source = _supabase(args)
+    target = LocalStorage(args.root)
+    for store in source.stores():
+        for name in TABLES:
+            try:
+                df = source.table(store, name)
+            except Exception as e:
+                print(f"  ⚠️ {store}/{name}: {e}", file=sys.stderr)
+                continue
+            target.write(store, name, df)
+            print(f"  {store}/{name}: {len(df)} rijen", file=sys.stderr)
+
+
+def cmd_synth(args: argparse.Namespace) -> None:
+    # synthetische winkels (synth.py), bv. om de batch run te benchmarken
+    target = LocalStorage(args.root)
+    rows = _rows(args.rows)
+    for i, store in enumerate(args.stores.split(",")):
+        data = synth.generate(rows, seed=args.seed + i, store_id=store)
+        for name, df in data.items():
+            target.write(store, name, df)
+        print(f"  {store}: {rows} lijnen", file=sys.stderr)
+
+
+def _rows(text: str) -> int:
+    # "100k", "1M" of "250000"
+    units = {"k": 1_000, "m": 1_000_000}
+    suffix = text[-1].lower()
+    return int(float(text[:-1]) * units[suffix]) if suffix in units else int(text)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Batch KPI's shrink-analyzer (zonder Streamlit)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+
+    p = sub.add_parser("kpis", help="alle KPI's voor veel winkels en periodes")
+    p.add_argument("--source", choices=["local", "supabase"], default="local")
+    p.add_argument("--root", default="data", help="map met <store_id>/<tabel>.parquet")
+    p.add_argument("--stores", default=None, help="komma-gescheiden; standaard alle")
+    p.add_argument("--periods", default=str(pd.Timestamp.today().year),
+                   help="bv. 2024,2025-Q1,2025-03,2025-01-01:2025-02-15")
+    p.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--winst-per-pakket", type=float, default=analytics.WINST_PER_PAKKET)
+    p.add_argument("--top", type=int, default=0, help="top N producten per winkel en periode")
+    p.add_argument("--out", default=None, help=".csv, .json of .parquet (standaard: stdout)")
+    p.add_argument("--top-out", default=None)
+    p.set_defaults(fn=cmd_kpis)
+
+    p = sub.add_parser("export", help="Supabase tabellen naar lokale Parquet bestanden")
+    p.add_argument("--root", default="data")
+    p.add_argument("--stores", default=None)
+    p.set_defaults(fn=cmd_export)
+
+    p = sub.add_parser("synth", help="synthetische winkels als Parquet bestanden")
+    p.add_argument("--root", default="data")
+    p.add_argument("--stores", default="synth_a,synth_b")
+    p.add_argument("--rows", default="100k")
+    p.add_argument("--seed", type=int, default=synth.SEED)
+    p.set_defaults(fn=cmd_synth)
+
+    args = parser.parse_args()
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import time
+
+import httpx
+from openai import DefaultHttpxClient, OpenAI
+from postgrest import SyncPostgrestClient
+from supabase import ClientOptions, SupabaseAuthClient, create_client
+
+# =====================
+# GEDEELDE CLIENTS (één per proces)
+# =====================
+#
+# Eén Supabase en één OpenAI client per proces, elk met een eigen
+# keep-alive connectiepool. De gedeelde Supabase client logt nooit in:
+# een login gebeurt via een losse auth client en de gebruiker krijgt een
+# lichte UserClient (eigen Authorization header) over dezelfde pool.
+
+POOL_SIZE = 20
+TIMEOUT = 30.0
+CONNECT_TIMEOUT = 5.0
+KEEPALIVE = 60.0
+
+# token vernieuwen zoveel seconden voor het verloopt
+REFRESH_MARGIN = 60
+
+
+def _limits(pool_size):
+    return httpx.Limits(
+        max_connections=pool_size,
+        max_keepalive_connections=pool_size,
+        keepalive_expiry=KEEPALIVE
+    )
+
+
+def _timeout(timeout, connect_timeout):
+    return httpx.Timeout(timeout, connect=connect_timeout)
+
+
+def http_pool(pool_size=POOL_SIZE, timeout=TIMEOUT, connect_timeout=CONNECT_TIMEOUT):
+    return httpx.Client(
+        limits=_limits(pool_size),
+        timeout=_timeout(timeout, connect_timeout),
+        follow_redirects=True
+    )
+
+
+def supabase_client(url, key, http):
+    # geen sessie en geen token refresh: de auth-state wordt nooit gewijzigd
+    return create_client(url, key, options=ClientOptions(
+        httpx_client=http,
+        auto_refresh_token=False,
+        persist_session=False
+    ))
+
+
+def openai_client(api_key, base_url=None, pool_size=POOL_SIZE, timeout=TIMEOUT,
+                  connect_timeout=CONNECT_TIMEOUT, max_retries=2):
+    return OpenAI(
+        api_key=api_key,
+        base_url=base_url,
+        timeout=_timeout(timeout, connect_timeout),
+        max_retries=max_retries,
+        http_client=DefaultHttpxClient(limits=_limits(pool_size))
+    )
+
+
+# =====================
+# PER GEBRUIKER
+# =====================
+
+def _auth(base):
+    # kortlevende auth client over de gedeelde pool (enkel voor login/refresh)
+    return SupabaseAuthClient(
+        url=str(base.auth_url),
+        headers=dict(base.options.headers),
+        auto_refresh_token=False,
+        persist_session=False,
+        http_client=base.options.httpx_client
+    )
+
+
+def sign_in(base, email, password):
+    return _auth(base).sign_in_with_password({
+        "email": email,
+        "password": password
+    }).session
+
+
+def refresh(base, session):
+    # zelfde sessie zolang het token nog geldig is
+    if session.expires_at and session.expires_at - REFRESH_MARGIN > time.time():
+        return session
+    return _auth(base).refresh_session(session.refresh_token).session
+
+
+class UserClient:
+    """table()/rpc() met het token van één gebruiker, over de gedeelde pool."""
+
+    def __init__(self, base, access_token):
+        self.access_token = access_token
+        self._postgrest = SyncPostgrestClient(
+            str(base.rest_url),
+            headers={**base.options.headers, "Authorization": f"Bearer {access_token}"},
+            schema=base.options.schema,
+            http_client=base.options.httpx_client
+        )
+
+    def table(self, name):
+        return self._postgrest.from_(name)
+
+    def rpc(self, fn, params=None):
+        return self._postgrest.rpc(fn, params or {})
@@ -0,0 +1,82 @@
+import pandas as pd
+
+import analytics
+import tracing
+from loader import fetch_table
+from local_store import sync_table
+from schema import AfdelingMapping, hope_codes, normalize_shrink
+
+# =====================
+# DATASET LOADERS
+# =====================
+#
+# Eén loader per dataset, met de client expliciet meegegeven: de app
+# gebruikt de client van de gebruiker, de achtergrond-warmer zijn eigen.
+# Enkel de kolommen die de pagina's gebruiken (geen select("*")).
+# fetch() geeft de ruwe rijen, prepare() normaliseert; zo kunnen andere
+# bronnen (storage.LocalStorage) dezelfde normalisatie gebruiken.
+
+WEEKS_COLUMNS = ["jaar", "week", "afdeling", "shrink", "sales"]
+SHRINK_COLUMNS = ["datum", "hope", "product", "reden", "stuks", "euro"]
+MAPPING_COLUMNS = ["hope", "afdeling"]
+AFSLAG_COLUMNS = ["hope", "datum"] + analytics.AFSLAG_COLUMNS
+
+COLUMNS = {
+    "weeks": WEEKS_COLUMNS,
+    "shrink_data": SHRINK_COLUMNS,
+    "product_afdelingen": MAPPING_COLUMNS,
+    "afslag_dag": AFSLAG_COLUMNS,
+}
+
+# append-only: lokale Arrow-cache + enkel nieuwe rijen (id > hwm) uit Supabase
+APPEND_ONLY = ("weeks", "shrink_data")
+
+
+def fetch(client, name, store_id):
+    if name in APPEND_ONLY:
+        return sync_table(client, name, store_id, COLUMNS[name])
+    return fetch_table(client, name, COLUMNS[name], store_id)
+
+
+def prepare_shrink(df):
+    # één keer normaliseren: categorieën, int32 HOPE, float32 euro, datum geparst
+    with tracing.span("clean:shrink_data") as span:
+        return span.size(normalize_shrink(df))
+
+
+def prepare_mapping(df_mapping, version=None):
+    with tracing.span("clean:product_afdelingen", rows=len(df_mapping)):
+        return AfdelingMapping(df_mapping, version)
+
+
+def prepare_afslag(df_afslag):
+    with tracing.span("clean:afslag_dag") as span:
+        return span.size(df_afslag.assign(
+            hope=hope_codes(df_afslag["hope"]),
+            datum=pd.to_datetime(df_afslag["datum"], errors="coerce")
+        ))
+
+
+def load_weeks(client, store_id):
+    return fetch(client, "weeks", store_id)
+
+
+def load_shrink(client, store_id):
+    return prepare_shrink(fetch(client, "shrink_data", store_id))
+
+
+def load_mapping(client, store_id, version=None):
+    # volledig (gepagineerd) geladen, gedeeld door Upload, Product en Beheer
+    return prepare_mapping(fetch(client, "product_afdelingen", store_id), version)
+
+
+def load_afslag(client, store_id):
+    return prepare_afslag(fetch(client, "afslag_dag", store_id))
+
+
+LOADERS = {
+    "weeks": load_weeks,
+    "shrink_data": load_shrink,
+    "product_afdelingen": load_mapping,
+    "afslag_dag": load_afslag,
+}
@@ -0,0 +1,242 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+import tracing
+
+try:
+    import duckdb
+except ImportError:
+    # optioneel: zonder duckdb blijft de Product analyse op pandas
+    duckdb = None
+
+# =====================
+# DUCKDB ENGINE (Product analyse)
+# =====================
+#
+# De Product analyse als SQL in een in-process DuckDB: filters, verlies
+# per reden, trend per week, artikels per afdeling, top producten en de
+# afslag KPI's. Eén keer per versie van shrink_data + mapping + afslag_dag
+# opgebouwd; de tabellen zijn Arrow views op de gecachete frames (geen
+# kopie van de getallen), DuckDB rekent ze multi-threaded en vectorieel.
+#
+# Afdeling, reden en product gaan als categorie-codes naar DuckDB. Zo
+# groeperen en sorteren beide paden in dezelfde volgorde, en worden de
+# (kleine) resultaten in pandas met dezelfde types en dezelfde laatste
+# stappen (analytics.*_totals, sort_products) afgewerkt als analytics.py.
+# Enkel de optelvolgorde van de sommen verschilt (parallel), dus op de
+# laatste bit van een float na zijn de resultaten gelijk; zie
+# `python bench.py duckdb`.
+
+# geen rijen: een filterwaarde die niet bestaat
+_NONE = "FALSE"
+
+
+def available():
+    return duckdb is not None
+
+
+def _codes(categorical, dtype):
+    return pa.array(np.asarray(categorical.cat.codes, dtype=dtype))
+
+
+class ProductEngine:
+
+    def __init__(self, df_shrink, mapping, df_afslag, threads=None):
+        if duckdb is None:
+            raise ImportError("duckdb is niet geïnstalleerd (pip install duckdb)")
+
+        reden = df_shrink["reden"].astype("category")
+        product = df_shrink["product"].astype("category")
+
+        self.afdelingen = mapping.categories
+        self.redenen = reden.cat.categories
+        self.producten = product.cat.categories
+        self._dtypes = df_shrink[["hope", "stuks"]].dtypes
+
+        # codes -1 = geen reden / product (pandas laat die weg bij groupby)
+        self._shrink = pa.table({
+            "datum": pa.Array.from_pandas(df_shrink["datum"]),
+            "hope": pa.array(df_shrink["hope"].to_numpy()),
+            "afdeling": pa.array(mapping.codes_for(df_shrink["hope"].to_numpy())),
+            "reden": _codes(reden, np.int16),
+            "product": _codes(product, np.int32),
+            "stuks": pa.array(df_shrink["stuks"].to_numpy()),
+            "euro": pa.array(df_shrink["euro"].to_numpy()),
+        })
+        self._afslag = pa.table({
+            "datum": pa.Array.from_pandas(df_afslag["datum"]),
+            "hope": pa.array(df_afslag["hope"].to_numpy()),
+            "afdeling": pa.array(mapping.codes_for(df_afslag["hope"].to_numpy())),
+            **{c: pa.array(df_afslag[c].to_numpy()) for c in analytics.AFSLAG_COLUMNS},
+        })
+
+        # geregistreerde views bestaan enkel op deze connectie (niet op
+        # cursors): sessies wachten op elkaar, elke query zelf is parallel
+        self._con = duckdb.connect(config={"threads": threads} if threads else {})
+        self._lock = threading.Lock()
+        self._con.register("shrink", self._shrink)
+        self._con.register("afslag", self._afslag)
+
+    def __len__(self):
+        return self._shrink.num_rows
+
+    def memory_usage(self, deep=True):
+        # codes + Arrow buffers (numerieke kolommen delen het geheugen met het frame)
+        return self._shrink.nbytes + self._afslag.nbytes
+
+    def close(self):
+        self._con.close()
+
+    # =====================
+    # FILTERS
+    # =====================
+
+    def _code(self, labels, value):
+        return labels.get_loc(value) if value in labels else None
+
+    def _where(self, filters, reden=True):
+        # zelfde semantiek als FilterIndex.rows en analytics.filter_afslag
+        clauses, params = [], []
+
+        if filters.get("afdeling") is not None:
+            code = self._code(self.afdelingen, filters["afdeling"])
+            clauses.append("afdeling = ?" if code is not None else _NONE)
+            params += [code] if code is not None else []
+
+        if reden and filters.get("reden") is not None:
+            code = self._code(self.redenen, filters["reden"])
+            clauses.append("reden = ?" if code is not None else _NONE)
+            params += [code] if code is not None else []
+
+        if filters.get("start") is not None:
+            clauses.append("datum BETWEEN ? AND ?")
+            params += [pd.Timestamp(filters["start"]).to_pydatetime(), pd.Timestamp(filters["end"]).to_pydatetime()]
+
+        if "hope" in filters:
+            hope = filters["hope"]
+            if hope is None or pd.isna(hope) or hope != int(hope):
+                clauses.append(_NONE)
+            else:
+                clauses.append("hope = ?")
+                params.append(int(hope))
+
+        return " AND ".join(clauses) or "TRUE", params
+
+    def _query(self, name, sql, params):
+        with tracing.span(f"sql:{name}") as span, self._lock:
+            result = self._con.execute(sql, params).fetchnumpy()
+            span.set(rows=len(next(iter(result.values()), [])))
+            return result
+
+    # =====================
+    # QUERIES
+    # =====================
+
+    def _groups(self, filters):
+        # één scan voor alle shrink-cijfers: GROUPING SETS per grafiek/tabel
+        where, params = self._where(filters)
+        pakket = self._code(self.redenen, analytics.PAKKET_REDEN)
+        r = self._query("product_groups", f"""
+            SELECT
+                grouping(reden, week, afdeling, product, hope) AS set,
+                reden, week, afdeling, product, hope,
+                sum(stuks::DOUBLE) AS stuks,
+                sum(euro::DOUBLE) AS euro,
+                coalesce(sum(euro::DOUBLE) FILTER (WHERE reden = ?), 0) AS pakket
+            FROM (
+                SELECT reden, weekofyear(datum) AS week, afdeling, product, hope, stuks, euro
+                FROM shrink WHERE {where}
+            )
+            GROUP BY GROUPING SETS ((), (reden), (week), (afdeling), (afdeling, product, hope))
+            ORDER BY set, reden, week, afdeling, product, hope
+        """, [-2 if pakket is None else pakket] + params)
+
+        # grouping(): bit = kolom niet gegroepeerd (reden, week, afdeling, product, hope)
+        sets = r.pop("set")
+        # NaT: week NULL, valt weg zoals bij groupby
+        no_week = np.ma.getmaskarray(r["week"])
+        groups = {}
+        for name, bits in (
+            ("totaal", 0b11111),
+            ("reden", 0b01111),
+            ("week", 0b10111),
+            ("afdeling", 0b11011),
+            ("product", 0b11000),
+        ):
+            keep = (sets == bits) & ~no_week if name == "week" else sets == bits
+            groups[name] = {k: np.ma.getdata(v)[keep] for k, v in r.items()}
+        return groups
+
+    def recovery(self, totaal, winst_per_pakket=analytics.WINST_PER_PAKKET):
+        # geen rijen: geen groep, som 0 zoals numpy
+        if not len(totaal["euro"]):
+            return analytics.recovery_totals(np.float64(0), np.float64(0), winst_per_pakket)
+        return analytics.recovery_totals(totaal["pakket"][0], totaal["euro"][0], winst_per_pakket)
+
+    def afslag(self, filters):
+        where, params = self._where(filters, reden=False)
+        r = self._query("afslag", f"""
+            SELECT
+                coalesce(sum(euro_afslag::DOUBLE), 0) AS afslag,
+                coalesce(sum(euro_verval::DOUBLE) FILTER (WHERE n_afslag > 0), 0) AS verval,
+                coalesce(sum(euro_tgtg::DOUBLE) FILTER (WHERE n_afslag > 0), 0) AS tgtg
+            FROM afslag WHERE {where}
+        """, params)
+        return analytics.afslag_totals(r["afslag"][0], r["verval"][0], r["tgtg"][0])
+
+    def per_reden(self, groups):
+        keep = groups["reden"] >= 0
+        return pd.Series(
+            groups["euro"][keep],
+            index=pd.CategoricalIndex(
+                pd.Categorical.from_codes(groups["reden"][keep], self.redenen), name="reden"
+            ),
+            name="euro"
+        )
+
+    def per_week(self, groups):
+        return pd.Series(
+            groups["euro"],
+            index=pd.Index(groups["week"], dtype="UInt32", name="week"),
+            name="euro"
+        )
+
+    def products_per_afdeling(self, groups, products):
+        # nunique(product) per afdeling uit de (afdeling, product, hope) groepen;
+        # afdelingen met enkel lege productnamen tellen 0
+        keep = products["product"] >= 0
+        pairs = np.unique(np.stack([products["afdeling"][keep], products["product"][keep]]), axis=1)
+        counts = np.bincount(pairs[0], minlength=len(self.afdelingen))
+        return pd.Series(
+            counts[groups["afdeling"]].astype(np.int64),
+            index=pd.CategoricalIndex(
+                pd.Categorical.from_codes(groups["afdeling"], self.afdelingen), name="afdeling"
+            ),
+            name="product"
+        ).sort_values(ascending=False)
+
+    def top_products(self, groups):
+        keep = groups["product"] >= 0
+        return analytics.sort_products(pd.DataFrame({
+            "afdeling": pd.Categorical.from_codes(groups["afdeling"][keep], self.afdelingen),
+            "product": pd.Categorical.from_codes(groups["product"][keep], self.producten),
+            "hope": groups["hope"][keep].astype(self._dtypes["hope"]),
+            "stuks": groups["stuks"][keep].astype(self._dtypes["stuks"]),
+            "euro": groups["euro"][keep],
+        }))
+
+    def product_aggregates(self, filters):
+        # zelfde dict als analytics.product_aggregates(index.take(rows), filter_afslag(...))
+        groups = self._groups(filters)
+        return {
+            **self.recovery(groups["totaal"]),
+            "afslag": self.afslag(filters),
+            "per_reden": self.per_reden(groups["reden"]),
+            "per_week": self.per_week(groups["week"]),
+            "producten_per_afdeling": self.products_per_afdeling(groups["afdeling"], groups["product"]),
+            "top_products": self.top_products(groups["product"]),
+        }
@@ -0,0 +1,222 @@
+import bisect
+import threading
+import time
+
+# =====================
+# FAKE SUPABASE CLIENT
+# =====================
+#
+# In-memory stand-in voor `supabase.Client` (enkel de query builder die de
+# app gebruikt), om de loaders offline te benchmarken. `latency` simuleert
+# een round-trip per request, `offset_cost` de kost van overgeslagen rijen
+# bij `.range()` (Postgres moet die ook lezen).
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._columns = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._range = None
+        self._write = None
+
+    # ---- select ----
+
+    def select(self, columns="*"):
+        if columns != "*":
+            self._columns = [c.strip() for c in columns.split(",")]
+        return self
+
+    def eq(self, col, value):
+        return self._filter(col, lambda v: v == value, "eq", value)
+
+    def neq(self, col, value):
+        return self._filter(col, lambda v: v != value, "neq", value)
+
+    def gt(self, col, value):
+        return self._filter(col, lambda v: v is not None and v > value, "gt", value)
+
+    def gte(self, col, value):
+        return self._filter(col, lambda v: v is not None and v >= value, "gte", value)
+
+    def lt(self, col, value):
+        return self._filter(col, lambda v: v is not None and v < value, "lt", value)
+
+    def lte(self, col, value):
+        return self._filter(col, lambda v: v is not None and v <= value, "lte", value)
+
+    def in_(self, col, values):
+        values = set(values)
+        return self._filter(col, lambda v: v in values, "in", values)
+
+    def order(self, col, desc=False):
+        self._order.append((col, desc))
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def range(self, start, end):
+        self._range = (start, end)
+        return self
+
+    def _filter(self, col, fn, op, value):
+        self._filters.append((col, fn, op, value))
+        return self
+
+    # ---- write ----
+
+    def insert(self, rows):
+        self._write = ("insert", rows, None, False)
+        return self
+
+    def upsert(self, rows, on_conflict=None, ignore_duplicates=False):
+        self._write = ("upsert", rows, on_conflict, ignore_duplicates)
+        return self
+
+    # ---- execute ----
+
+    def execute(self):
+        self._client._sleep(self._client.latency)
+
+        if self._write:
+            return _Response(self._client._apply_write(self._table, *self._write))
+
+        rows = self._client._scan(self._table, self._filters)
+
+        for col, desc in reversed(self._order):
+            rows = sorted(rows, key=lambda r: (r.get(col) is None, r.get(col)), reverse=desc)
+
+        if self._range:
+            start, end = self._range
+            time.sleep(self._client.offset_cost * start)
+            rows = rows[start:end + 1]
+
+        limit = min(self._limit or self._client.max_rows, self._client.max_rows)
+        rows = rows[:limit]
+
+        if self._columns:
+            rows = [{c: r.get(c) for c in self._columns} for r in rows]
+        else:
+            rows = [dict(r) for r in rows]
+
+        return _Response(rows)
+
+
+class FakeSupabase:
+
+    def __init__(self, tables=None, latency=0.0, offset_cost=0.0, max_rows=1000):
+        self.latency = latency
+        self.offset_cost = offset_cost
+        self.max_rows = max_rows
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._ids = {}
+        self._rpcs = {}
+        self._indexes = {}
+        for name, rows in (tables or {}).items():
+            self._apply_write(name, "insert", rows, None, False)
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def rows(self, name):
+        return list(self._tables.get(name, []))
+
+    # ---- rpc ----
+
+    def register_rpc(self, name, fn):
+        # fn(client, **params) -> list van dicts
+        self._rpcs[name] = fn
+
+    def rpc(self, name, params=None):
+        client = self
+
+        class _Rpc:
+            def execute(self):
+                client._sleep(client.latency)
+                return _Response(client._rpcs[name](client, **(params or {})))
+
+        return _Rpc()
+
+    # ---- intern ----
+
+    def _sleep(self, seconds):
+        with self._lock:
+            self.requests += 1
+        if seconds:
+            time.sleep(seconds)
+
+    def _scan(self, table, filters):
+        rows = self._tables.get(table, [])
+
+        # rijen staan op id: id-grenzen via bisect (zoals een index)
+        lo, hi = 0, len(rows)
+        ids = self._ids.get(table, [])
+        rest = []
+        for col, fn, op, value in filters:
+            if col == "id" and op in ("gt", "gte"):
+                find = bisect.bisect_right if op == "gt" else bisect.bisect_left
+                lo = max(lo, find(ids, value))
+            elif col == "id" and op in ("lt", "lte"):
+                find = bisect.bisect_left if op == "lt" else bisect.bisect_right
+                hi = min(hi, find(ids, value))
+            else:
+                rest.append((col, fn))
+
+        return [
+            r for r in rows[lo:hi]
+            if all(fn(r.get(col)) for col, fn in rest)
+        ]
+
+    def _index(self, table, keys):
+        # unieke index per on_conflict sleutel, bijgehouden bij elke insert
+        key = (table, tuple(keys))
+        if key not in self._indexes:
+            self._indexes[key] = {
+                tuple(r.get(k) for k in keys): r for r in self._tables.get(table, [])
+            }
+        return self._indexes[key]
+
+    def _apply_write(self, table, kind, rows, on_conflict, ignore_duplicates):
+        if isinstance(rows, dict):
+            rows = [rows]
+
+        with self._lock:
+            data = self._tables.setdefault(table, [])
+            ids = self._ids.setdefault(table, [])
+            keys = [k.strip() for k in on_conflict.split(",")] if on_conflict else None
+            index = self._index(table, keys) if kind == "upsert" and keys else None
+
+            written = []
+            for row in rows:
+                row = dict(row)
+                existing = index.get(tuple(row.get(k) for k in keys)) if index is not None else None
+
+                if existing is not None:
+                    if not ignore_duplicates:
+                        existing.update(row)
+                        written.append(dict(existing))
+                    continue
+
+                row.setdefault("id", (ids[-1] + 1) if ids else 1)
+                pos = bisect.bisect_right(ids, row["id"])
+                data.insert(pos, row)
+                ids.insert(pos, row["id"])
+                for (t, idx_keys), idx in self._indexes.items():
+                    if t == table:
+                        idx[tuple(row.get(k) for k in idx_keys)] = row
+                written.append(dict(row))
+
+            return written
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+
+# =====================
+# FILTER INDEX (Product analyse)
+# =====================
+#
+# Eén keer per versie van shrink_data + mapping opgebouwd:
+# - de rijen gesorteerd op datum → een periode is een binary search
+# - per afdeling / reden / HOPE de (gesorteerde) rijnummers
+# Filters combineren door rijnummers te doorsnijden; enkel het resultaat
+# wordt als DataFrame gematerialiseerd.
+#
+# Rijnummers verwijzen naar de datum-volgorde, niet naar het frame zelf.
+# Het frame wordt gedeeld met de shrink_data dataset (geen kopie).
+
+
+class _Postings:
+
+    def __init__(self, values):
+        # stabiele sortering: rijnummers per waarde blijven oplopend
+        self.order = np.argsort(values, kind="stable").astype(np.int32)
+        self.keys, self.starts = np.unique(values[self.order], return_index=True)
+        self.ends = np.append(self.starts[1:], len(values))
+
+    def rows(self, key):
+        i = np.searchsorted(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            return self.order[:0]
+        return self.order[self.starts[i]:self.ends[i]]
+
+    @property
+    def nbytes(self):
+        return self.order.nbytes + self.keys.nbytes + self.starts.nbytes + self.ends.nbytes
+
+
+class FilterIndex:
+
+    def __init__(self, df, mapping):
+        self.frame = df
+        self._order = np.argsort(df["datum"].to_numpy(), kind="stable").astype(np.int32)
+        self.datum = df["datum"].to_numpy()[self._order]
+
+        hope = df["hope"].to_numpy()[self._order]
+        reden = df["reden"].astype("category")
+
+        self.afdelingen = mapping.categories
+        self._frame_afdeling = mapping.codes_for(df["hope"].to_numpy())
+        self._afdeling = self._frame_afdeling[self._order]
+        self.redenen = reden.cat.categories
+        self._reden = reden.cat.codes.to_numpy()[self._order]
+
+        self._postings = {
+            "afdeling": _Postings(self._afdeling),
+            "reden": _Postings(self._reden),
+            "hope": _Postings(hope),
+        }
+
+    def __len__(self):
+        return len(self._order)
+
+    def _code(self, column, value):
+        labels = self.afdelingen if column == "afdeling" else self.redenen
+        return labels.get_loc(value) if value in labels else None
+
+    def rows(self, afdeling=None, reden=None, hope=None, start=None, end=None):
+        # rijnummers (datum-volgorde) die aan alle filters voldoen
+        lo = np.searchsorted(self.datum, np.datetime64(start, "ns")) if start is not None else 0
+        hi = np.searchsorted(self.datum, np.datetime64(end, "ns"), side="right") if end is not None else len(self.datum)
+
+        lists = []
+        for column, value in (("afdeling", afdeling), ("reden", reden)):
+            if value is not None:
+                code = self._code(column, value)
+                if code is None:
+                    return self._order[:0]
+                lists.append(self._postings[column].rows(code))
+
+        if hope is not None:
+            if pd.isna(hope):
+                return self._order[:0]
+            lists.append(self._postings["hope"].rows(hope))
+
+        if not lists:
+            return np.arange(lo, max(lo, hi), dtype=np.int32)
+
+        # periode eerst (binary search in elke lijst), dan kleinste eerst doorsnijden
+        lists = sorted(
+            (rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)] for rows in lists),
+            key=len
+        )
+        result = lists[0]
+        for rows in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, rows, assume_unique=True)
+        return result
+
+    def values(self, column, rows):
+        # aanwezige waarden binnen de selectie (voor de keuzelijsten)
+        codes = self._afdeling if column == "afdeling" else self._reden
+        labels = self.afdelingen if column == "afdeling" else self.redenen
+        present = np.unique(codes[rows])
+        return sorted(str(labels[c]) for c in present if c >= 0)
+
+    def date_bounds(self, rows):
+        # rijen staan op datum: eerste en laatste rij
+        if not len(rows):
+            rows = np.arange(len(self.datum))
+        if not len(rows):
+            return None, None
+        return pd.Timestamp(self.datum[rows[0]]), pd.Timestamp(self.datum[rows[-1]])
+
+    def take(self, rows):
+        if len(rows) == len(self._order):
+            # geen filter: frame zelf (originele volgorde), enkel afdeling erbij
+            return self.frame.assign(afdeling=pd.Categorical.from_codes(
+                self._frame_afdeling, categories=self.afdelingen
+            ))
+        return self.frame.take(self._order[rows]).assign(
+            afdeling=pd.Categorical.from_codes(self._afdeling[rows], categories=self.afdelingen)
+        )
+
+    def memory_usage(self, deep=True):
+        # enkel de index zelf; het frame telt mee onder shrink_data
+        return (
+            self._order.nbytes + self.datum.nbytes + self._reden.nbytes
+            + self._afdeling.nbytes + self._frame_afdeling.nbytes
+            + sum(p.nbytes for p in self._postings.values())
+        )
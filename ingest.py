@@ -0,0 +1,138 @@
+import numpy as np
+import openpyxl
+import pandas as pd
+
+# =====================
+# EXCEL INGEST (streaming)
+# =====================
+#
+# Het werkblad wordt rij per rij gelezen (openpyxl read_only) en in
+# blokken van CHUNK_SIZE rijen opgekuist, zodat het geheugen begrensd
+# blijft ongeacht de grootte van het bestand.
+
+CHUNK_SIZE = 2000
+
+COLUMN_MAP = {
+    "Datum": "datum",
+    "Benaming": "product",
+    "Reden / Winkel": "reden",
+    "Hoeveelheid": "stuks",
+    "Totale prijs": "euro",
+    "Hope": "hope"
+}
+
+UPLOAD_COLUMNS = [
+    "datum", "week", "jaar", "maand",
+    "afdeling",
+    "product", "hope", "reden", "stuks", "euro"
+]
+
+
+def _header(row):
+    return [str(h).strip() if h is not None else "" for h in row]
+
+
+def iter_raw_chunks(file, chunk_size=CHUNK_SIZE):
+    # ruwe blokken met de originele kolomnamen
+    file.seek(0)
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = _header(next(rows, ()))
+
+        buffer = []
+        for row in rows:
+            buffer.append(row[:len(header)])
+            if len(buffer) == chunk_size:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        wb.close()
+
+
+def preview(file, n=20):
+    return next(iter_raw_chunks(file, n), pd.DataFrame())
+
+
+def clean_chunk(df, mapping, store_id):
+    # zelfde regels als vroeger pd.read_excel + cleaning op het hele bestand
+
+    # =====================
+    # KOLOMMEN MAPPING
+    # =====================
+
+    df = df.rename(columns=COLUMN_MAP)
+
+    # =====================
+    # CLEANING
+    # =====================
+
+    df = df.assign(datum=pd.to_datetime(df["datum"], errors="coerce"))
+    df = df[df["datum"].notna()]
+
+    if df.empty:
+        return None
+
+    df = df.assign(
+        week=df["datum"].dt.isocalendar().week.astype(int),
+        jaar=df["datum"].dt.year.astype(int),
+        maand=df["datum"].dt.month.astype(int),
+        stuks=pd.to_numeric(df["stuks"], errors="coerce").fillna(0),
+        euro=pd.to_numeric(df["euro"], errors="coerce").fillna(0),
+        product=df["product"].astype(str).str.upper().str.strip(),
+        reden=df["reden"].astype(str).str.strip(),
+        # HOPE FIX (cruciaal)
+        hope=(
+            pd.to_numeric(df["hope"], errors="coerce")
+            .fillna(0)
+            .astype(int)
+            .astype(str)
+        )
+    )
+
+    # =====================
+    # AFDELING MAPPING
+    # =====================
+
+    # mapping = schema.AfdelingMapping; niet gemapt → ONBEKEND
+    df["afdeling"] = np.asarray(mapping.lookup(df["hope"]), dtype=object)
+
+    # =====================
+    # KOLOMMEN SELECTIE
+    # =====================
+
+    df = df[UPLOAD_COLUMNS]
+
+    df = df.assign(store_id=store_id, categorie="ONBEKEND")
+
+    df["datum"] = df["datum"].astype(str)
+    df = df.replace({np.nan: None})
+
+    return df
+
+
+def iter_clean_chunks(file, mapping, store_id, chunk_size=CHUNK_SIZE):
+    # (aantal gelezen rijen, opgekuist blok of None)
+    for raw in iter_raw_chunks(file, chunk_size):
+        yield len(raw), clean_chunk(raw, mapping, store_id)
+
+
+def scan(file, mapping, store_id, chunk_size=CHUNK_SIZE):
+    # KPI's over het hele bestand in één streaming pass
+    rows = 0
+    valid = 0
+    euro = 0.0
+    products = set()
+
+    for n, chunk in iter_clean_chunks(file, mapping, store_id, chunk_size):
+        rows += n
+        if chunk is None:
+            continue
+        valid += len(chunk)
+        euro += float(pd.to_numeric(chunk["euro"]).sum())
+        products.update(chunk["product"])
+
+    return {"rows": rows, "valid": valid, "euro": euro, "products": len(products)}
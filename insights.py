@@ -0,0 +1,149 @@
+import hashlib
+import json
+import threading
+import time
+
+import pandas as pd
+
+# =====================
+# AI INZICHTEN
+# =====================
+#
+# De prompt wordt opgebouwd uit exacte aggregaten over de gefilterde data
+# (geen steekproef). Antwoorden worden bewaard per hash van die
+# samenvatting, dus dezelfde filters opnieuw vragen kost niets. De client
+# wordt meegegeven: een OpenAI client of een lokale stub met dezelfde
+# responses.create(..., stream=True) interface.
+
+MODEL = "gpt-4o-mini"
+TTL = 6 * 3600
+TOP_N = 5
+
+
+def _money(x):
+    return round(float(x), 2)
+
+
+def insight_summary(df):
+    # JSON-serialiseerbaar en deterministisch (afgerond) → stabiele hash
+    if df.empty:
+        return None
+
+    # float32 opslag, sommen in float64
+    euro = df["euro"].to_numpy(dtype="float64")
+    df = df.assign(euro=euro)
+    total = euro.sum()
+
+    redenen = (
+        df.groupby("reden", observed=True)["euro"]
+        .sum()
+        .sort_values(ascending=False, kind="stable")
+        .head(TOP_N)
+    )
+
+    producten = (
+        df.groupby(["hope", "product"], observed=True)
+        .agg(euro=("euro", "sum"), stuks=("stuks", "sum"))
+        .sort_values("euro", ascending=False, kind="stable")
+        .head(TOP_N)
+        .reset_index()
+    )
+
+    # ISO jaar * 100 + week, bv. 202507
+    iso = df["datum"].dt.isocalendar()
+    weeknr = (iso["year"].astype("int32") * 100 + iso["week"].astype("int32")).to_numpy()
+    weken = pd.Series(euro).groupby(weeknr).sum().sort_index()
+
+    summary = {
+        "periode": [str(df["datum"].min().date()), str(df["datum"].max().date())],
+        "rijen": int(len(df)),
+        "totaal_euro": _money(total),
+        "top_redenen": [
+            {"reden": str(r), "euro": _money(e), "aandeel_pct": round(e / total * 100, 1) if total else 0.0}
+            for r, e in redenen.items()
+        ],
+        "top_producten": [
+            {"hope": int(p.hope), "product": str(p.product), "euro": _money(p.euro), "stuks": _money(p.stuks)}
+            for p in producten.itertuples()
+        ],
+        "weken": [
+            {"week": f"{w // 100}-W{w % 100:02d}", "euro": _money(e)}
+            for w, e in weken.tail(8).items()
+        ],
+    }
+
+    if len(weken) >= 2:
+        (vorige_week, vorige), (laatste_week, laatste) = list(weken.tail(2).items())
+        summary["week_op_week"] = {
+            "laatste_week": f"{laatste_week // 100}-W{laatste_week % 100:02d}",
+            "delta_euro": _money(laatste - vorige),
+            "delta_pct": round((laatste - vorige) / vorige * 100, 1) if vorige else None,
+            "stijgers": _risers(df, weeknr, vorige_week, laatste_week),
+        }
+
+    return summary
+
+
+def _risers(df, weeknr, vorige_week, laatste_week):
+    # redenen met de grootste stijging tussen de laatste twee weken
+    def per_reden(week):
+        return df[weeknr == week].groupby("reden", observed=True)["euro"].sum()
+
+    delta = per_reden(laatste_week).sub(per_reden(vorige_week), fill_value=0)
+    delta = delta[delta > 0].sort_values(ascending=False).head(3)
+    return [{"reden": str(r), "delta_euro": _money(d)} for r, d in delta.items()]
+
+
+def summary_hash(summary, model=MODEL):
+    payload = json.dumps({"model": model, "summary": summary}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def build_prompt(summary):
+    return f"""Analyseer deze retail shrink data van één winkel (exacte totalen in euro).
+
+{json.dumps(summary, indent=2, ensure_ascii=False)}
+
+Geef:
+- grootste probleem
+- belangrijkste oorzaak
+- 2 concrete acties voor de winkel
+"""
+
+
+def stream_insight(client, prompt, model=MODEL):
+    # tekst-delta's van de Responses API
+    stream = client.responses.create(model=model, input=prompt, stream=True)
+    for event in stream:
+        if getattr(event, "type", None) == "response.output_text.delta":
+            yield event.delta
+
+
+# =====================
+# TTL CACHE
+# =====================
+
+class InsightCache:
+
+    def __init__(self, ttl=TTL, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}   # hash -> (tijdstip, tekst)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                return None
+            return entry[1]
+
+    def put(self, key, text):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+            self._entries[key] = (time.monotonic(), text)
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass
+
+import pandas as pd
+import pyarrow as pa
+
+import analytics
+import datasets
+from schema import ONBEKEND, AfdelingMapping
+from storage import Storage
+
+# =====================
+# KPI KERN (headless)
+# =====================
+#
+# Dezelfde cijfers als de pagina's, zonder Streamlit en zonder login:
+# weekvergelijking, afslag efficiëntie, TGTG recuperatie en top producten
+# per winkel en periode. Werkt op pandas DataFrames of Arrow tables; de
+# berekeningen zelf blijven in analytics.py (één bron voor app en batch).
+
+Frame = pd.DataFrame | pa.Table
+
+
+def as_frame(data: Frame) -> pd.DataFrame:
+    return data.to_pandas() if isinstance(data, pa.Table) else data
+
+
+# =====================
+# PERIODE
+# =====================
+
+@dataclass(frozen=True)
+class Period:
+    name: str
+    start: pd.Timestamp
+    end: pd.Timestamp   # inclusief
+
+    @classmethod
+    def parse(cls, text: str) -> Period:
+        # "2025", "2025-Q1", "2025-03" of "2025-01-01:2025-03-31"
+        text = text.strip()
+        if ":" in text:
+            start, end = text.split(":", 1)
+            return cls(text, pd.Timestamp(start), pd.Timestamp(end))
+        if re.fullmatch(r"\d{4}", text):
+            year = int(text)
+            return cls(text, pd.Timestamp(year, 1, 1), pd.Timestamp(year, 12, 31))
+        match = re.fullmatch(r"(\d{4})-Q([1-4])", text, re.IGNORECASE)
+        if match:
+            start = pd.Timestamp(int(match[1]), 3 * int(match[2]) - 2, 1)
+            return cls(text, start, start + pd.offsets.QuarterEnd(0))
+        if re.fullmatch(r"\d{4}-\d{2}", text):
+            start = pd.Timestamp(f"{text}-01")
+            return cls(text, start, start + pd.offsets.MonthEnd(0))
+        raise ValueError(f"Onbekende periode: {text}")
+
+    def mask(self, dates: pd.Series) -> pd.Series:
+        return (dates >= self.start) & (dates <= self.end)
+
+
+# =====================
+# DATASETS PER WINKEL
+# =====================
+
+@dataclass
+class StoreData:
+    weeks: pd.DataFrame
+    shrink: pd.DataFrame
+    mapping: AfdelingMapping
+    afslag: pd.DataFrame
+
+
+def load(storage: Storage, store_id: str) -> StoreData:
+    # zelfde normalisatie als de app (datasets.prepare_*), voor elke bron
+    shrink = datasets.prepare_shrink(storage.table(store_id, "shrink_data"))
+    try:
+        afslag = datasets.prepare_afslag(storage.table(store_id, "afslag_dag"))
+    except Exception:
+        # zoals de app zolang sql/afslag.sql niet uitgerold is
+        afslag = analytics.afslag_table(shrink)
+
+    return StoreData(
+        weeks=storage.table(store_id, "weeks"),
+        shrink=shrink,
+        mapping=datasets.prepare_mapping(storage.table(store_id, "product_afdelingen")),
+        afslag=afslag,
+    )
+
+
+def weeks_in(weeks: Frame, period: Period) -> pd.DataFrame:
+    # een week hoort bij de periode als haar maandag erin valt (ISO week)
+    df = as_frame(weeks)
+    if df.empty:
+        return df
+    monday = pd.to_datetime(
+        df["jaar"].astype(int).astype(str) + "-W" + df["week"].astype(int).astype(str).str.zfill(2) + "-1",
+        format="%G-W%V-%u",
+        errors="coerce"
+    )
+    return df[period.mask(monday).to_numpy()]
+
+
+# =====================
+# KPI'S
+# =====================
+
+@dataclass(frozen=True)
+class WeekComparison:
+    latest_week: int
+    current: float
+    previous: float
+    delta: float
+
+
+@dataclass(frozen=True)
+class Recovery:
+    pakketten: float
+    recup: float
+    bruto: float
+    netto: float
+    recup_pct: float
+
+
+@dataclass(frozen=True)
+class AfslagEfficiency:
+    afslag_euro: float
+    verval_euro: float
+    tgtg_euro: float
+    effectief_verkocht: float
+    afslag_eff: float
+
+
+def week_comparison(weeks: Frame, afdelingen: list[str] | None = None) -> WeekComparison | None:
+    # laatste week vs vorige week, zoals het Dashboard
+    df = as_frame(weeks)
+    if df.empty:
+        return None
+    afdelingen = analytics.dashboard_afdelingen(df) if afdelingen is None else afdelingen
+    agg = analytics.dashboard_aggregates(df, afdelingen)
+    if agg is None:
+        return None
+    week = analytics.week_comparison(agg["compare"])
+    return WeekComparison(
+        latest_week=int(agg["latest_week"]),
+        current=float(week["current"]),
+        previous=float(week["previous"]),
+        delta=float(week["delta"]),
+    )
+
+
+def recovery(shrink: Frame, winst_per_pakket: float = analytics.WINST_PER_PAKKET) -> Recovery:
+    result = analytics.recovery(as_frame(shrink), winst_per_pakket)
+    return Recovery(**{k: float(v) for k, v in result.items()})
+
+
+def afslag_efficiency(afslag: Frame) -> AfslagEfficiency:
+    result = analytics.afslag_kpis(as_frame(afslag))
+    return AfslagEfficiency(**{k: float(v) for k, v in result.items()})
+
+
+def top_products(shrink: Frame, mapping: AfdelingMapping | None = None, n: int | None = None) -> pd.DataFrame:
+    # per afdeling gesorteerd zoals de Product analyse; met n: de n grootste overall
+    df = as_frame(shrink)
+    if "afdeling" not in df.columns:
+        afdeling = mapping.lookup(df["hope"]) if mapping is not None else ONBEKEND
+        df = df.assign(afdeling=afdeling)
+    top = analytics.top_products(df)
+    if n is not None:
+        top = top.sort_values("euro", ascending=False, kind="stable").head(n).reset_index(drop=True)
+    return top
+
+
+@dataclass(frozen=True)
+class StoreKpis:
+    store_id: str
+    period: str
+    lines: int
+    shrink: float
+    sales: float
+    shrink_pct: float
+    week: WeekComparison | None
+    recovery: Recovery
+    afslag: AfslagEfficiency
+
+    def row(self) -> dict[str, object]:
+        # één platte rij (CSV / DataFrame)
+        row = {k: v for k, v in asdict(self).items() if k not in ("week", "recovery", "afslag")}
+        week = asdict(self.week) if self.week is not None else dict.fromkeys(
+            WeekComparison.__dataclass_fields__
+        )
+        row.update({f"week_{k}": v for k, v in week.items()})
+        row.update(asdict(self.recovery))
+        row.update(asdict(self.afslag))
+        return row
+
+
+def store_kpis(data: StoreData, store_id: str, period: Period,
+               winst_per_pakket: float = analytics.WINST_PER_PAKKET) -> StoreKpis:
+    shrink = data.shrink[period.mask(data.shrink["datum"])] if len(data.shrink) else data.shrink
+    afslag = data.afslag[period.mask(data.afslag["datum"])] if len(data.afslag) else data.afslag
+    weeks = weeks_in(data.weeks, period)
+
+    total_shrink = float(pd.to_numeric(weeks.get("shrink"), errors="coerce").sum()) if len(weeks) else 0.0
+    total_sales = float(pd.to_numeric(weeks.get("sales"), errors="coerce").sum()) if len(weeks) else 0.0
+
+    return StoreKpis(
+        store_id=store_id,
+        period=period.name,
+        lines=int(len(shrink)),
+        shrink=total_shrink,
+        sales=total_sales,
+        shrink_pct=round(total_shrink / total_sales * 100, 2) if total_sales > 0 else 0.0,
+        week=week_comparison(weeks),
+        recovery=recovery(shrink, winst_per_pakket) if len(shrink) else Recovery(0.0, 0.0, 0.0, 0.0, 0.0),
+        afslag=afslag_efficiency(afslag),
+    )
@@ -0,0 +1,208 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+import pandas as pd
+
+import tracing
+
+# =====================
+# BULK LOADER
+# =====================
+#
+# Keyset-paginering op een geïndexeerde sleutel (standaard `id`) i.p.v.
+# `.range()` offsets: diepe pagina's blijven even snel. De sleutelruimte
+# wordt in partities geknipt zodat pagina's parallel opgehaald worden,
+# met één begrensde pool voor alle tabellen samen.
+
+PAGE_SIZE = 1000      # = max-rows van PostgREST
+WORKERS = 4
+KEY = "id"
+IN_BATCH = 500        # sleutels per in.(...) filter: de URL blijft kort
+
+
+def _query(client, table, columns, store_id):
+    q = client.table(table).select(",".join(columns) if columns != "*" else "*")
+    if store_id is not None:
+        q = q.eq("store_id", store_id)
+    return q
+
+
+def _bounds(client, table, store_id, key, after=None, until=None):
+    # kleinste en grootste sleutel voor deze store (2 index lookups)
+    def edge(desc):
+        q = _query(client, table, [key], store_id)
+        if after is not None:
+            q = q.gt(key, after)
+        if until is not None:
+            q = q.lte(key, until)
+        data = q.order(key, desc=desc).limit(1).execute().data
+        return data[0][key] if data else None
+
+    lo = edge(False)
+    if lo is None:
+        return None
+    return lo, edge(True)
+
+
+def _partitions(lo, hi, n):
+    # enkel numerieke sleutels kunnen we opknippen
+    if not isinstance(lo, int) or not isinstance(hi, int) or n <= 1:
+        return [(lo, hi)]
+
+    step = max((hi - lo + 1) // n, 1)
+    parts = []
+    start = lo
+    while start <= hi:
+        end = min(start + step - 1, hi)
+        parts.append((start, end))
+        start = end + 1
+    return parts
+
+
+def _fetch_partition(client, table, columns, store_id, key, lo, hi, page_size, after=None):
+    pages = []
+    last = after
+
+    while True:
+        q = _query(client, table, columns, store_id).gte(key, lo).lte(key, hi)
+        if last is not None:
+            q = q.gt(key, last)
+
+        with tracing.span(f"page:{table}") as span:
+            data = q.order(key).limit(page_size).execute().data
+            span.set(rows=len(data))
+
+        if not data:
+            break
+
+        pages.append(data)
+
+        if len(data) < page_size:
+            break
+
+        last = data[-1][key]
+
+    return pages
+
+
+def frame_from_pages(pages, columns=None):
+    # kolom per kolom opbouwen i.p.v. een lijst van dicts te laten groeien
+    if columns is None or columns == "*":
+        first = next((page[0] for page in pages if page), None)
+        columns = list(first) if first else []
+
+    data = {
+        col: [row.get(col) for page in pages for row in page]
+        for col in columns
+    }
+    return pd.DataFrame(data, columns=columns)
+
+
+def _with_key(columns, key):
+    if columns == "*" or key in columns:
+        return columns
+    return list(columns) + [key]
+
+
+def fetch_tables(client, tables, store_id=None, key=KEY, page_size=PAGE_SIZE,
+                 workers=WORKERS, after=None, until=None):
+    """Haal meerdere tabellen parallel op; `tables` is {tabel: kolommen of "*"}.
+
+    `after` (optioneel {tabel: sleutel}) haalt enkel rijen met een grotere sleutel,
+    `until` (idem) enkel rijen met een sleutel tot en met die waarde.
+    """
+    after = after or {}
+    until = until or {}
+    names = list(tables)
+
+    # één span per tabel: van de eerste request tot het frame klaar is; bij
+    # een fout sluit de ExitStack de spans die nog open staan (met "error")
+    with ExitStack() as open_spans:
+        stacks, spans = {}, {}
+        for table in names:
+            stacks[table] = open_spans.enter_context(ExitStack())
+            spans[table] = stacks[table].enter_context(tracing.span(f"fetch:{table}"))
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+
+            # fase 1: sleutelgrenzen per tabel
+            bounds = dict(zip(names, pool.map(
+                tracing.bind(lambda t: _bounds(client, t, store_id, key, after.get(t), until.get(t))),
+                names
+            )))
+
+            # fase 2: alle partities van alle tabellen in dezelfde pool
+            jobs = {}
+            for table in names:
+                if bounds[table] is None:
+                    continue
+                lo, hi = bounds[table]
+                columns = _with_key(tables[table], key)
+                jobs[table] = [
+                    pool.submit(
+                        tracing.bind(_fetch_partition), client, table, columns, store_id, key,
+                        p_lo, p_hi, page_size, after.get(table)
+                    )
+                    for p_lo, p_hi in _partitions(lo, hi, workers * 2)
+                ]
+
+            result = {}
+            for table in names:
+                pages = [page for job in jobs.get(table, []) for page in job.result()]
+                requested = tables[table]
+                df = frame_from_pages(pages, _with_key(requested, key))
+                if requested != "*" and key not in requested:
+                    df = df.drop(columns=[key])
+                result[table] = df
+                spans[table].set(pages=len(pages), **tracing.sizes(df))
+                stacks[table].close()
+
+    return result
+
+
+def fetch_by_key(client, table, columns, store_id, keys, key=KEY, batch=IN_BATCH):
+    # enkel deze sleutels (bv. gaten in een lokale cache), per batch van in.(...)
+    pages = []
+    for i in range(0, len(keys), batch):
+        with tracing.span(f"page:{table}") as span:
+            data = _query(client, table, columns, store_id).in_(key, keys[i:i + batch]).order(key).execute().data
+            span.set(rows=len(data))
+        pages.append(data)
+    return frame_from_pages(pages, _with_key(columns, key))
+
+
+def max_key(client, table, store_id=None, key=KEY):
+    # goedkope wijzigingsprobe: grootste sleutel voor deze store (of None)
+    rows = _query(client, table, [key], store_id).order(key, desc=True).limit(1).execute().data
+    return rows[0][key] if rows else None
+
+
+def fetch_table(client, table, columns="*", store_id=None, **kwargs):
+    return fetch_tables(client, {table: columns}, store_id=store_id, **kwargs)[table]
+
+
+# enkel voor benchmarks: de oude sequentiële offset-lus
+def fetch_offset(client, table, columns="*", store_id=None, page_size=PAGE_SIZE):
+    all_data = []
+    start = 0
+
+    while True:
+        data = (
+            _query(client, table, columns, store_id)
+            .range(start, start + page_size - 1)
+            .execute()
+            .data
+        )
+
+        if not data:
+            break
+
+        all_data.extend(data)
+
+        if len(data) < page_size:
+            break
+
+        start += page_size
+
+    return pd.DataFrame(all_data)
+
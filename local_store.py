@@ -0,0 +1,216 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import tracing
+from loader import KEY, fetch_by_key, fetch_tables
+
+# =====================
+# LOKALE KOLOMMENSTORE
+# =====================
+#
+# Per store_id een map met Arrow IPC segmenten per tabel + een meta.json
+# met de high-water mark (max id). Een sync haalt enkel rijen met
+# id > hwm op (plus de gaten in een lookback venster, zie LOOKBACK) en
+# schrijft die als nieuw segment weg; lezen gebeurt via memory mapping. Enkel voor
+# append-only tabellen (weeks, shrink_data): updates/deletes in Supabase
+# vragen een reset().
+
+CACHE_DIR = Path(os.environ.get("SHRINK_CACHE_DIR", ".cache"))
+MAX_SEGMENTS = 16
+
+# ids worden niet in volgorde zichtbaar: parallelle upload batches (elk een
+# eigen transactie) committen door elkaar. Elke sync vraagt daarom ook de
+# sleutels (enkel `id`) van de laatste LOOKBACK ids onder de hwm op en haalt
+# volledige rijen enkel voor de ids die lokaal nog ontbreken.
+LOOKBACK = int(os.environ.get("SHRINK_SYNC_LOOKBACK", 10_000))
+
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def _lock(store_id, table):
+    with _locks_guard:
+        return _locks.setdefault((store_id, table), threading.Lock())
+
+
+def _dir(store_id):
+    return CACHE_DIR / store_id
+
+
+def _meta_path(store_id, table):
+    return _dir(store_id) / f"{table}.meta.json"
+
+
+def _read_meta(store_id, table):
+    path = _meta_path(store_id, table)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def _write_atomic(path, write):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def _write_meta(store_id, table, meta):
+    _write_atomic(
+        _meta_path(store_id, table),
+        lambda tmp: tmp.write_text(json.dumps(meta))
+    )
+
+
+def _write_segment(path, arrow_table):
+    def write(tmp):
+        with pa.OSFile(str(tmp), "wb") as sink:
+            with pa.ipc.new_file(sink, arrow_table.schema) as writer:
+                writer.write_table(arrow_table)
+
+    _write_atomic(path, write)
+
+
+def _read_segments(store_id, meta):
+    tables = []
+    for name in meta["segments"]:
+        source = pa.memory_map(str(_dir(store_id) / name), "r")
+        tables.append(pa.ipc.open_file(source).read_all())
+
+    if not tables:
+        return None
+    return pa.concat_tables(tables, promote_options="permissive")
+
+
+def read_local(table, store_id):
+    meta = _read_meta(store_id, table)
+    if meta is None:
+        return None
+    return _read_segments(store_id, meta)
+
+
+def reset(table, store_id):
+    meta = _read_meta(store_id, table)
+    if meta is None:
+        return
+    for name in meta["segments"]:
+        (_dir(store_id) / name).unlink(missing_ok=True)
+    _meta_path(store_id, table).unlink(missing_ok=True)
+
+
+def _compact(store_id, table, meta, arrow_table):
+    # veel kleine segmenten → één segment
+    name = f"{table}.{meta['seq']:06d}.arrow"
+    _write_segment(_dir(store_id) / name, arrow_table)
+    old = meta["segments"]
+    meta["segments"] = [name]
+    meta["seq"] += 1
+    _write_meta(store_id, table, meta)
+    for seg in old:
+        try:
+            (_dir(store_id) / seg).unlink(missing_ok=True)
+        except OSError:
+            pass    # nog gemapt (Windows): volgende compactie ruimt op
+
+
+def _gaps(client, tables, metas, store_id, key):
+    # {tabel: rijen met een id ≤ hwm die lokaal ontbreken}: eerst enkel de
+    # sleutels in (hwm - LOOKBACK, hwm], dan volledige rijen voor de gaten
+    windows = {
+        t: (max(m["hwm"] - LOOKBACK, 0), m["hwm"])
+        for t, m in metas.items() if m["hwm"] is not None and LOOKBACK > 0
+    }
+    if not windows:
+        return {}
+
+    probe = fetch_tables(
+        client, {t: [key] for t in windows}, store_id=store_id, key=key,
+        after={t: lo for t, (lo, _) in windows.items()},
+        until={t: hi for t, (_, hi) in windows.items()}
+    )
+
+    gaps = {}
+    for table, (lo, _) in windows.items():
+        cached = _read_segments(store_id, metas[table])
+        known = cached.column(key) if cached is not None else pa.array([], pa.int64())
+        known = pc.filter(known, pc.greater(known, lo)).to_numpy()
+        missing = np.setdiff1d(probe[table][key].to_numpy(dtype=np.int64), known)
+        if len(missing):
+            gaps[table] = fetch_by_key(
+                client, table, tables[table], store_id, missing.tolist(), key=key
+            )
+    return gaps
+
+
+def sync_tables(client, tables, store_id, key=KEY):
+    """Breng lokale tabellen bij met enkel de nieuwe rijen (id > hwm + gaten).
+
+    `tables` is {tabel: kolommen of "*"}; geeft {tabel: pandas DataFrame}.
+    """
+    _dir(store_id).mkdir(parents=True, exist_ok=True)
+
+    locks = [_lock(store_id, t) for t in sorted(tables)]
+    for lock in locks:
+        lock.acquire()
+
+    try:
+        metas = {}
+        for table, columns in tables.items():
+            meta = _read_meta(store_id, table)
+            # andere kolomselectie = andere cache
+            if meta is not None and meta.get("columns") != columns:
+                reset(table, store_id)
+                meta = None
+            metas[table] = meta or {"columns": columns, "hwm": None, "segments": [], "seq": 0}
+
+        # sleutel altijd mee voor de hwm
+        tables = {t: c if c == "*" or key in c else [*c, key] for t, c in tables.items()}
+
+        # één parallelle fetch voor alle delta's samen
+        delta = fetch_tables(
+            client, tables, store_id=store_id, key=key,
+            after={t: m["hwm"] for t, m in metas.items() if m["hwm"] is not None}
+        )
+        gaps = _gaps(client, tables, metas, store_id, key)
+
+        result = {}
+        for table, meta in metas.items():
+            new = delta[table]
+            if table in gaps:
+                new = pd.concat([gaps[table], new], ignore_index=True)
+
+            # segment schrijven + lokaal (memory mapped) inlezen
+            with tracing.span(f"local:{table}", new_rows=len(new)) as span:
+                if not new.empty:
+                    name = f"{table}.{meta['seq']:06d}.arrow"
+                    _write_segment(
+                        _dir(store_id) / name,
+                        pa.Table.from_pandas(new, preserve_index=False)
+                    )
+                    meta["segments"].append(name)
+                    meta["seq"] += 1
+                    meta["hwm"] = max(meta["hwm"] or 0, int(new[key].max()))
+                    _write_meta(store_id, table, meta)
+
+                arrow_table = _read_segments(store_id, meta)
+
+                if arrow_table is not None and len(meta["segments"]) > MAX_SEGMENTS:
+                    _compact(store_id, table, meta, arrow_table)
+
+                result[table] = span.size(arrow_table.to_pandas() if arrow_table is not None else new)
+
+        return result
+
+    finally:
+        for lock in locks:
+            lock.release()
+
+
+def sync_table(client, table, store_id, columns="*", key=KEY):
+    return sync_tables(client, {table: columns}, store_id, key=key)[table]
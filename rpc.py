@@ -0,0 +1,61 @@
+import pandas as pd
+
+from analytics import COMPARE_COLUMNS
+
+# =====================
+# SERVER-SIDE AGGREGATIES (Supabase RPC)
+# =====================
+#
+# Wrappers rond de functies in sql/*.sql. Ze geven dezelfde structuur
+# terug als de pandas-varianten in analytics.py, zodat de pagina's niet
+# hoeven te weten waar er gerekend werd.
+
+
+def dashboard_afdelingen(client, store_id):
+    data = client.rpc("dashboard_afdelingen", {"p_store_id": store_id}).execute().data
+    return [row["afdeling"] for row in data or []]
+
+
+def dashboard_aggregates(client, store_id, afdelingen):
+    data = client.rpc("dashboard_aggregates", {
+        "p_store_id": store_id,
+        "p_afdelingen": list(afdelingen),
+    }).execute().data
+
+    if not data or data.get("latest_week") is None:
+        return None
+
+    trend = pd.DataFrame(data["trend"], columns=["jaar", "week", "shrink", "sales"])
+
+    compare = pd.DataFrame(
+        data["compare"], columns=["afdeling"] + COMPARE_COLUMNS
+    ).set_index("afdeling").fillna(0)
+
+    return {
+        "total_shrink": data["total_shrink"],
+        "total_sales": data["total_sales"],
+        "latest_week": data["latest_week"],
+        "trend": trend,
+        "compare": compare,
+    }
+
+
+def store_comparison(client, store_ids, jaar):
+    data = client.rpc("store_comparison", {
+        "p_store_ids": list(store_ids),
+        "p_jaar": jaar,
+    }).execute().data
+
+    return pd.DataFrame(data or [], columns=[
+        "store_id", "shrink", "sales", "shrink_pct",
+        "afslag_euro", "verval_euro", "tgtg_euro"
+    ])
+
+
+def unmapped_hopes(client, store_id):
+    # HOPE's zonder afdeling, gesorteerd op verlies (sql/unmapped.sql); één
+    # jsonb array, dus niet afgekapt op PostgREST max-rows
+    data = client.rpc("unmapped_hopes", {"p_store_id": store_id}).execute().data
+
+    df = pd.DataFrame(data or [], columns=["hope", "product", "euro"])
+    return df.assign(euro=pd.to_numeric(df["euro"], errors="coerce").fillna(0.0))
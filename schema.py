@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+# =====================
+# NORMALISATIE (één keer bij het laden)
+# =====================
+#
+# Compacte dtypes voor de in-memory datasets: categorieën voor de
+# herhalende tekstkolommen, int32 HOPE codes, float32 bedragen en een
+# reeds geparste datum. De pagina's hoeven daarna niets meer te casten.
+
+CATEGORY_COLUMNS = ["reden", "afdeling", "store_id", "categorie", "product"]
+INT32_MAX = np.iinfo(np.int32).max
+
+
+def hope_codes(series):
+    # "123456" / 123456.0 / " 123456 " → 123456; ongeldig → 0 (zoals bij upload)
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.strip()
+    codes = pd.to_numeric(series, errors="coerce").fillna(0)
+    return codes.astype("int32" if len(codes) == 0 or codes.max() <= INT32_MAX else "int64")
+
+
+def _numeric(series, dtype):
+    return pd.to_numeric(series, errors="coerce").fillna(0).astype(dtype)
+
+
+def normalize_shrink(df):
+    # ook zonder rijen: de pagina's rekenen op de dtypes (.dt, .cat)
+    if "datum" in df.columns:
+        df = df.assign(datum=pd.to_datetime(df["datum"], errors="coerce"))
+        df = df[df["datum"].notna()].reset_index(drop=True)
+
+    cols = {}
+
+    if "hope" in df.columns:
+        cols["hope"] = hope_codes(df["hope"])
+
+    if "euro" in df.columns:
+        cols["euro"] = _numeric(df["euro"], "float32")
+
+    if "stuks" in df.columns:
+        stuks = pd.to_numeric(df["stuks"], errors="coerce").fillna(0)
+        # gewichtsartikelen hebben soms kommagetallen
+        integral = np.array_equal(stuks.to_numpy(), np.round(stuks.to_numpy()))
+        cols["stuks"] = stuks.astype("int32" if integral else "float32")
+
+    for col, dtype in (("week", "int8"), ("maand", "int8"), ("jaar", "int16")):
+        if col in df.columns:
+            cols[col] = _numeric(df[col], dtype)
+
+    if "reden" in df.columns:
+        cols["reden"] = df["reden"].fillna("Onbekend")
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            cols[col] = cols.get(col, df[col]).astype("category")
+
+    return df.assign(**cols)
+
+
+def normalize_mapping(df_mapping):
+    if "hope" not in df_mapping.columns:
+        return df_mapping
+    return df_mapping.assign(
+        hope=hope_codes(df_mapping["hope"]),
+        afdeling=df_mapping["afdeling"].astype("category")
+    )
+
+
+def product_names(df):
+    # HOPE → laatst gebruikte productnaam
+    names = df[["hope", "product"]].drop_duplicates("hope", keep="last")
+    return dict(zip(names["hope"].to_numpy(), names["product"].astype(str)))
+
+
+def fill_category(series, value):
+    # fillna op een categorie: waarde eerst als categorie toevoegen
+    series = series.astype("category")
+    if value not in series.cat.categories:
+        series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+# =====================
+# HOPE → AFDELING
+# =====================
+#
+# Eén gedeelde mapping per winkel en versie: gesorteerde HOPE codes met
+# de bijhorende categorie-code. Voor gewone (6-cijferige) HOPE's ook een
+# dense tabel, zodat toepassen op een kolom één array take is.
+
+ONBEKEND = "ONBEKEND"
+DENSE_LIMIT = 2_000_000
+
+
+def _hope_array(hopes):
+    if not pd.api.types.is_numeric_dtype(hopes):
+        hopes = hope_codes(pd.Series(hopes))
+    return np.asarray(hopes, dtype=np.int64)
+
+
+class AfdelingMapping:
+
+    def __init__(self, df_mapping, version=None):
+        df = normalize_mapping(df_mapping) if "hope" in df_mapping.columns else df_mapping
+
+        if df.empty:
+            hopes = np.array([], dtype=np.int64)
+            afdeling = pd.Categorical([])
+        else:
+            # laatste rij wint, zoals bij een upsert
+            df = df.drop_duplicates("hope", keep="last").sort_values("hope")
+            hopes = df["hope"].to_numpy(dtype=np.int64)
+            afdeling = pd.Categorical(df["afdeling"])
+
+        categories = list(afdeling.categories)
+        if ONBEKEND not in categories:
+            categories.append(ONBEKEND)
+
+        self.version = version
+        self.categories = pd.Index(categories)
+        self.hopes = hopes
+        self.codes = pd.Categorical(afdeling, categories=categories).codes.astype(np.int16)
+        self._unknown = np.int16(self.categories.get_loc(ONBEKEND))
+
+        # lege afdeling in de tabel telt als onbekend
+        self.codes[self.codes < 0] = self._unknown
+
+        self._dense = None
+        if len(hopes) and hopes[0] >= 0 and hopes[-1] < DENSE_LIMIT:
+            self._dense = np.full(hopes[-1] + 1, self._unknown, dtype=np.int16)
+            self._dense[hopes] = self.codes
+
+    def __len__(self):
+        return len(self.hopes)
+
+    @property
+    def empty(self):
+        return len(self.hopes) == 0
+
+    def _positions(self, hopes):
+        # index in self.hopes, of -1 als de HOPE niet gemapt is
+        hopes = _hope_array(hopes)
+        pos = np.searchsorted(self.hopes, hopes).clip(max=max(len(self.hopes) - 1, 0))
+        found = (self.hopes[pos] == hopes) if len(self.hopes) else np.zeros(len(hopes), dtype=bool)
+        return np.where(found, pos, -1)
+
+    def codes_for(self, hopes):
+        # categorie-code per rij (onbekend voor niet-gemapte HOPE's)
+        if self._dense is not None:
+            hopes = _hope_array(hopes)
+            inside = (hopes >= 0) & (hopes < len(self._dense))
+            return np.where(inside, self._dense[np.where(inside, hopes, 0)], self._unknown)
+
+        if self.empty:
+            return np.full(len(hopes), self._unknown, dtype=np.int16)
+
+        pos = self._positions(hopes)
+        return np.where(pos >= 0, self.codes[pos], self._unknown).astype(np.int16)
+
+    def lookup(self, hopes):
+        return pd.Categorical.from_codes(self.codes_for(hopes), categories=self.categories)
+
+    def contains(self, hopes):
+        return self._positions(hopes) >= 0
+
+    def hopes_of(self, afdeling):
+        if afdeling not in self.categories:
+            return self.hopes[:0]
+        return self.hopes[self.codes == self.categories.get_loc(afdeling)]
+
+    def frame(self):
+        return pd.DataFrame({
+            "hope": self.hopes,
+            "afdeling": pd.Categorical.from_codes(self.codes, categories=self.categories),
+        })
+
+    def memory_usage(self, deep=True):
+        # voor het geheugenbudget van de DatasetRegistry
+        dense = self._dense.nbytes if self._dense is not None else 0
+        return self.hopes.nbytes + self.codes.nbytes + dense
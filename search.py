@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+# =====================
+# ZOEKINDEX (HOPE / productnaam)
+# =====================
+#
+# Trigram index over "hope product" (lowercase): elke trigram wijst naar
+# de gesorteerde rijnummers waarin hij voorkomt. De rijen staan op
+# verlies gesorteerd, dus lagere rijnummers = hogere rang. Een zoekterm
+# van 3+ tekens is de doorsnede van zijn trigrams plus een controle op
+# de kandidaten; kortere termen scannen de voorbereide tekst.
+
+N = 3
+
+
+def _grams(text):
+    return {text[i:i + N] for i in range(len(text) - N + 1)}
+
+
+class SearchIndex:
+
+    def __init__(self, df):
+        # df: hope, product, euro — gesorteerd op euro (aflopend)
+        df = df.sort_values("euro", ascending=False, kind="stable").reset_index(drop=True)
+
+        self.hopes = df["hope"].astype(str).to_numpy()
+        self._text = (
+            df["hope"].astype(str) + " " + df["product"].astype(str)
+        ).str.lower().to_numpy()
+
+        # eerste (= grootste verlies) productnaam per HOPE
+        first = df.drop_duplicates("hope")
+        self.labels = dict(zip(
+            first["hope"].astype(str),
+            first["hope"].astype(str) + " - " + first["product"].astype(str)
+        ))
+
+        postings = {}
+        for row, text in enumerate(self._text):
+            for gram in _grams(text):
+                postings.setdefault(gram, []).append(row)
+
+        self._postings = {g: np.array(rows, dtype=np.int32) for g, rows in postings.items()}
+
+    def __len__(self):
+        return len(self.hopes)
+
+    def rows(self, query):
+        # rijnummers die de zoekterm bevatten, in volgorde van verlies
+        query = query.strip().lower()
+        if not query:
+            return np.arange(len(self.hopes))
+
+        if len(query) < N:
+            return np.flatnonzero([query in text for text in self._text])
+
+        lists = []
+        for gram in _grams(query):
+            rows = self._postings.get(gram)
+            if rows is None:
+                return np.array([], dtype=np.int32)
+            lists.append(rows)
+
+        lists.sort(key=len)
+        candidates = lists[0]
+        for rows in lists[1:]:
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+            if not len(candidates):
+                return candidates
+
+        # trigrams kunnen in een andere volgorde staan → echte substring check
+        return candidates[[query in self._text[i] for i in candidates]]
+
+    def search(self, query):
+        # unieke HOPE's, gerangschikt op verlies
+        return list(pd.unique(self.hopes[self.rows(query)]))
+
+    def label(self, hope):
+        return self.labels.get(str(hope), str(hope))
+
+    def memory_usage(self, deep=True):
+        # voor het geheugenbudget van de DatasetRegistry
+        return (
+            self.hopes.nbytes
+            + sum(len(t) for t in self._text) + 8 * len(self._text)
+            + sum(a.nbytes + 64 for a in self._postings.values())
+            + 100 * len(self.labels)
+        )
@@ -0,0 +1,40 @@
+-- =====================
+-- AFSLAG PER (HOPE, DATUM)
+-- =====================
+--
+-- Voorberekende afslag / verval / TGTG bedragen per HOPE en dag. Elke
+-- upload telt er de nieuwe lijnen bij op via shrink_insert (upload.sql),
+-- in dezelfde transactie; de Product analyse doet enkel een gefilterde som.
+
+create table if not exists afslag_dag (
+    id          bigint generated always as identity,
+    store_id    text    not null,
+    hope        text    not null,
+    datum       date    not null,
+    euro_afslag numeric not null default 0,
+    euro_verval numeric not null default 0,
+    euro_tgtg   numeric not null default 0,
+    n_afslag    integer not null default 0,
+    primary key (store_id, hope, datum)
+);
+
+create unique index if not exists afslag_dag_id_idx on afslag_dag (id);
+
+-- vervangen door shrink_insert (upload.sql)
+drop function if exists afslag_apply(text, jsonb);
+
+-- eenmalige backfill vanuit de bestaande shrink_data
+insert into afslag_dag (store_id, hope, datum, euro_afslag, euro_verval, euro_tgtg, n_afslag)
+select
+    store_id,
+    trim(hope::text),
+    datum::date,
+    coalesce(sum(euro) filter (where reden ilike '%AFSLAG%'), 0),
+    coalesce(sum(euro) filter (where reden ilike '%VERVAL%'), 0),
+    coalesce(sum(euro) filter (where reden = '38 VERLIES - ANDERE'), 0),
+    count(*) filter (where reden ilike '%AFSLAG%')
+from shrink_data
+where datum is not null
+  and (reden ilike '%AFSLAG%' or reden ilike '%VERVAL%' or reden = '38 VERLIES - ANDERE')
+group by 1, 2, 3
+on conflict (store_id, hope, datum) do nothing;
@@ -0,0 +1,68 @@
+-- =====================
+-- DASHBOARD AGGREGATIES
+-- =====================
+--
+-- Uitvoeren in de Supabase SQL editor. De app roept deze functies op via
+-- supabase.rpc(...) wanneer QUERY_MODE = "rpc"; enkel de geaggregeerde
+-- rijen gaan over de lijn.
+
+create index if not exists weeks_store_afdeling_week_idx
+    on weeks (store_id, afdeling, week);
+
+create or replace function dashboard_afdelingen(p_store_id text)
+returns table (afdeling text)
+language sql stable
+as $$
+    select distinct w.afdeling
+    from weeks w
+    where w.store_id = p_store_id
+      and w.afdeling is not null
+    order by w.afdeling;
+$$;
+
+create or replace function dashboard_aggregates(
+    p_store_id text,
+    p_afdelingen text[] default null
+)
+returns jsonb
+language sql stable
+as $$
+    with w as (
+        select
+            jaar,
+            week,
+            afdeling,
+            coalesce(shrink, 0)::numeric as shrink,
+            coalesce(sales, 0)::numeric as sales
+        from weeks
+        where store_id = p_store_id
+          and (p_afdelingen is null or afdeling = any (p_afdelingen))
+    ),
+    latest as (
+        select max(week) as week from w
+    ),
+    trend as (
+        select jaar, week, sum(shrink) as shrink, sum(sales) as sales
+        from w
+        group by jaar, week
+    ),
+    compare as (
+        select
+            w.afdeling,
+            coalesce(sum(w.shrink) filter (where w.week = l.week), 0)     as current_shrink,
+            coalesce(sum(w.sales)  filter (where w.week = l.week), 0)     as current_sales,
+            coalesce(sum(w.shrink) filter (where w.week = l.week - 1), 0) as previous_shrink,
+            coalesce(sum(w.sales)  filter (where w.week = l.week - 1), 0) as previous_sales
+        from w
+        cross join latest l
+        where w.week in (l.week, l.week - 1)
+        group by w.afdeling
+    )
+    select jsonb_build_object(
+        'total_shrink', (select coalesce(sum(shrink), 0) from w),
+        'total_sales',  (select coalesce(sum(sales), 0) from w),
+        'latest_week',  (select week from latest),
+        'trend',   (select coalesce(jsonb_agg(t order by t.jaar, t.week), '[]'::jsonb) from trend t),
+        'compare', (select coalesce(jsonb_agg(c), '[]'::jsonb) from compare c)
+    );
+$$;
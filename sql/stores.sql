@@ -0,0 +1,102 @@
+-- =====================
+-- MEERDERE WINKELS
+-- =====================
+--
+-- Koppeling gebruiker → winkel(s), indexen zodat elke winkel enkel zijn
+-- eigen partitie leest, en een server-side vergelijking per winkel.
+-- Uitvoeren na afslag.sql (afslag_dag moet bestaan).
+
+create table if not exists user_stores (
+    user_id  uuid not null references auth.users (id) on delete cascade,
+    store_id text not null,
+    primary key (user_id, store_id)
+);
+
+-- =====================
+-- ROW LEVEL SECURITY
+-- =====================
+--
+-- user_stores bepaalt welke winkels een gebruiker ziet: enkel de eigen
+-- rijen lezen, koppelingen toevoegen kan enkel met de service key (of
+-- in de SQL editor). De datatabellen zijn per winkel afgeschermd in de
+-- database zelf, niet enkel via .eq("store_id", ...) in de app; de RPC's
+-- (security invoker) volgen dezelfde policies. De service key (warm-up,
+-- batch CLI) omzeilt RLS.
+
+alter table user_stores enable row level security;
+
+drop policy if exists user_stores_select on user_stores;
+create policy user_stores_select on user_stores
+    for select to authenticated
+    using (user_id = (select auth.uid()));
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['shrink_data', 'weeks', 'product_afdelingen', 'afslag_dag'] loop
+        execute format('alter table %I enable row level security', t);
+        execute format('drop policy if exists %I on %I', t || '_store', t);
+        execute format(
+            'create policy %I on %I for all to authenticated
+                 using (store_id in (select us.store_id from user_stores us where us.user_id = (select auth.uid())))
+                 with check (store_id in (select us.store_id from user_stores us where us.user_id = (select auth.uid())))',
+            t || '_store', t
+        );
+    end loop;
+end
+$$;
+
+-- keyset loader: eq(store_id) + order(id) moet een index-range scan zijn
+create index if not exists shrink_data_store_id_idx        on shrink_data (store_id, id);
+create index if not exists weeks_store_id_idx              on weeks (store_id, id);
+create index if not exists product_afdelingen_store_id_idx on product_afdelingen (store_id, id);
+create index if not exists afslag_dag_store_id_idx         on afslag_dag (store_id, id);
+
+create or replace function store_comparison(p_store_ids text[], p_jaar integer)
+returns table (
+    store_id     text,
+    shrink       numeric,
+    sales        numeric,
+    shrink_pct   numeric,
+    afslag_euro  numeric,
+    verval_euro  numeric,
+    tgtg_euro    numeric
+)
+language sql stable
+as $$
+    with w as (
+        select
+            store_id,
+            coalesce(sum(shrink), 0) as shrink,
+            coalesce(sum(sales), 0)  as sales
+        from weeks
+        where store_id = any (p_store_ids)
+          and jaar = p_jaar
+        group by store_id
+    ),
+    a as (
+        select
+            store_id,
+            sum(euro_afslag) as afslag_euro,
+            sum(euro_verval) filter (where n_afslag > 0) as verval_euro,
+            sum(euro_tgtg)   filter (where n_afslag > 0) as tgtg_euro
+        from afslag_dag
+        where store_id = any (p_store_ids)
+          and datum >= make_date(p_jaar, 1, 1)
+          and datum <  make_date(p_jaar + 1, 1, 1)
+        group by store_id
+    )
+    select
+        s.store_id,
+        coalesce(w.shrink, 0),
+        coalesce(w.sales, 0),
+        case when coalesce(w.sales, 0) > 0 then round(w.shrink / w.sales * 100, 2) else 0 end,
+        coalesce(a.afslag_euro, 0),
+        coalesce(a.verval_euro, 0),
+        coalesce(a.tgtg_euro, 0)
+    from unnest(p_store_ids) as s (store_id)
+    left join w on w.store_id = s.store_id
+    left join a on a.store_id = s.store_id
+    order by s.store_id;
+$$;
@@ -0,0 +1,41 @@
+-- =====================
+-- NIET-GEMAPTE HOPE'S
+-- =====================
+--
+-- Anti-join shrink_data ⟕ product_afdelingen in de database: enkel de
+-- HOPE's zonder afdeling komen terug, al geaggregeerd en gesorteerd op
+-- verlies. Gebruikt door "⚙️ Afdeling beheer".
+
+-- not exists (...) moet een index lookup zijn op (store_id, hope)
+create index if not exists product_afdelingen_store_hope_idx
+    on product_afdelingen (store_id, hope);
+
+create index if not exists shrink_data_store_hope_idx
+    on shrink_data (store_id, hope);
+
+-- één jsonb array i.p.v. een set rijen: een set-returning RPC wordt door
+-- PostgREST afgekapt op max-rows (1000), er kunnen tienduizenden HOPE's
+-- ongemapt zijn. Ander return type → eerst droppen.
+drop function if exists unmapped_hopes(text);
+
+create or replace function unmapped_hopes(p_store_id text)
+returns jsonb
+language sql stable
+as $$
+    select coalesce(jsonb_agg(u order by u.euro desc, u.hope, u.product), '[]'::jsonb)
+    from (
+        select
+            trim(s.hope) as hope,
+            s.product,
+            coalesce(sum(s.euro), 0)::numeric as euro
+        from shrink_data s
+        where s.store_id = p_store_id
+          and not exists (
+              select 1
+              from product_afdelingen m
+              where m.store_id = p_store_id
+                and m.hope = trim(s.hope)
+          )
+        group by trim(s.hope), s.product
+    ) u;
+$$;
@@ -0,0 +1,68 @@
+-- =====================
+-- IDEMPOTENTE UPLOAD
+-- =====================
+--
+-- Elke lijn krijgt bij upload een row_hash (inhoud + volgnummer binnen
+-- het bestand). Een tweede upload van hetzelfde bestand voegt niets toe.
+-- shrink_insert schrijft een batch weg en werkt afslag_dag bij met enkel
+-- de effectief nieuwe rijen, in één transactie.
+
+alter table shrink_data add column if not exists row_hash text;
+
+create unique index if not exists shrink_data_row_hash_idx
+    on shrink_data (store_id, row_hash);
+
+create or replace function shrink_insert(p_store_id text, p_rows jsonb)
+returns integer
+language sql
+as $$
+    with ins as (
+        insert into shrink_data
+            (store_id, row_hash, datum, week, jaar, maand, afdeling,
+             product, hope, reden, stuks, euro, categorie)
+        select
+            p_store_id, r.row_hash, r.datum, r.week, r.jaar, r.maand, r.afdeling,
+            r.product, r.hope, r.reden, r.stuks, r.euro, r.categorie
+        from jsonb_to_recordset(p_rows) as r (
+            row_hash text,
+            datum date,
+            week integer,
+            jaar integer,
+            maand integer,
+            afdeling text,
+            product text,
+            hope text,
+            reden text,
+            stuks numeric,
+            euro numeric,
+            categorie text
+        )
+        on conflict (store_id, row_hash) do nothing
+        returning hope, datum, reden, euro
+    ),
+    delta as (
+        select
+            hope,
+            datum,
+            coalesce(sum(euro) filter (where reden ilike '%AFSLAG%'), 0) as euro_afslag,
+            coalesce(sum(euro) filter (where reden ilike '%VERVAL%'), 0) as euro_verval,
+            coalesce(sum(euro) filter (where reden = '38 VERLIES - ANDERE'), 0) as euro_tgtg,
+            count(*) filter (where reden ilike '%AFSLAG%') as n_afslag
+        from ins
+        where reden ilike '%AFSLAG%' or reden ilike '%VERVAL%' or reden = '38 VERLIES - ANDERE'
+        group by hope, datum
+    ),
+    afslag as (
+        insert into afslag_dag as a
+            (store_id, hope, datum, euro_afslag, euro_verval, euro_tgtg, n_afslag)
+        select p_store_id, hope, datum, euro_afslag, euro_verval, euro_tgtg, n_afslag
+        from delta
+        on conflict (store_id, hope, datum) do update set
+            euro_afslag = a.euro_afslag + excluded.euro_afslag,
+            euro_verval = a.euro_verval + excluded.euro_verval,
+            euro_tgtg   = a.euro_tgtg   + excluded.euro_tgtg,
+            n_afslag    = a.n_afslag    + excluded.n_afslag
+        returning 1
+    )
+    select count(*)::integer from ins;
+$$;
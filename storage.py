@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Protocol
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import datasets
+
+# =====================
+# STORAGE (bron van de ruwe tabellen)
+# =====================
+#
+# Eén interface voor waar de data vandaan komt: Supabase (zoals de app)
+# of lokale Parquet bestanden (batch runs, benchmarks, offline analyse).
+# table() geeft de ruwe rijen met de kolommen uit datasets.COLUMNS; het
+# normaliseren gebeurt daarna, voor elke bron hetzelfde (kpis.load).
+# Beide implementaties zijn picklable, zodat een process pool ze kan
+# meekrijgen.
+
+TABLES = tuple(datasets.COLUMNS)
+
+
+class Storage(Protocol):
+
+    def stores(self) -> list[str]:
+        ...
+
+    def table(self, store_id: str, name: str) -> pd.DataFrame:
+        ...
+
+
+class SupabaseStorage:
+    """Supabase via de gewone loaders (keyset paging + lokale Arrow-cache)."""
+
+    def __init__(self, url: str, key: str, store_ids: list[str] | None = None) -> None:
+        self.url = url
+        self.key = key
+        self.store_ids = store_ids
+        self._client = None
+
+    @classmethod
+    def from_env(cls, store_ids: list[str] | None = None) -> SupabaseStorage:
+        # service key voor batch runs (geen gebruikerssessie). Geen anon key:
+        # die ziet onder RLS (sql/stores.sql) nul rijen, en nul KPI's
+        # rapporteren is erger dan falen
+        missing = [k for k in ("SUPABASE_URL", "SUPABASE_SERVICE_KEY") if not os.environ.get(k)]
+        if missing:
+            raise RuntimeError(f"niet gezet in de omgeving: {', '.join(missing)}")
+        return cls(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_KEY"], store_ids)
+
+    @property
+    def client(self):
+        # lazy: pas in het proces dat de data effectief ophaalt
+        if self._client is None:
+            import clients
+            self._client = clients.supabase_client(self.url, self.key, clients.http_pool())
+        return self._client
+
+    def __getstate__(self) -> dict:
+        return {**self.__dict__, "_client": None}
+
+    def stores(self) -> list[str]:
+        if self.store_ids is not None:
+            return list(self.store_ids)
+        rows = self.client.table("user_stores").select("store_id").execute().data
+        return sorted({row["store_id"] for row in rows})
+
+    def table(self, store_id: str, name: str) -> pd.DataFrame:
+        return datasets.fetch(self.client, name, store_id)
+
+
+class LocalStorage:
+    """Parquet bestanden: <root>/<store_id>/<tabel>.parquet"""
+
+    def __init__(self, root: str | Path) -> None:
+        self.root = Path(root)
+
+    def path(self, store_id: str, name: str) -> Path:
+        return self.root / store_id / f"{name}.parquet"
+
+    def stores(self) -> list[str]:
+        if not self.root.exists():
+            return []
+        return sorted(p.name for p in self.root.iterdir() if p.is_dir())
+
+    def table(self, store_id: str, name: str) -> pd.DataFrame:
+        # FileNotFoundError als de tabel er niet is (bv. geen afslag_dag)
+        path = self.path(store_id, name)
+        if not path.exists():
+            raise FileNotFoundError(path)
+        columns = [c for c in datasets.COLUMNS[name] if c in pq.read_schema(path).names]
+        return pq.read_table(path, columns=columns).to_pandas()
+
+    def write(self, store_id: str, name: str, df: pd.DataFrame | pa.Table) -> Path:
+        path = self.path(store_id, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        table = df if isinstance(df, pa.Table) else pa.Table.from_pandas(df, preserve_index=False)
+        tmp = path.with_suffix(".parquet.tmp")
+        pq.write_table(table, tmp)
+        os.replace(tmp, path)
+        return path
@@ -0,0 +1,80 @@
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.neighbors import NearestNeighbors
+
+from schema import ONBEKEND, product_names
+
+# =====================
+# AFDELING SUGGESTIES (lokaal, geen externe API)
+# =====================
+#
+# Karakter n-gram TF-IDF op de productnamen + k nearest neighbours over
+# de reeds gemapte HOPE's. Elke buur stemt met zijn cosine similarity;
+# confidence = aandeel van de winnende afdeling in de totale stem.
+
+K = 7
+NGRAMS = (2, 4)
+
+
+def training_set(df_shrink, afdeling_mapping):
+    # (productnaam, afdeling) voor elke gemapte HOPE met een gekende naam
+    names = product_names(df_shrink)
+
+    mapping = afdeling_mapping.frame()
+    mapping = mapping[mapping["afdeling"].astype(str) != ONBEKEND]
+
+    product = mapping["hope"].map(names)
+    keep = product.notna()
+
+    train = pd.DataFrame({
+        "product": product[keep].astype(str).to_numpy(),
+        "afdeling": mapping["afdeling"][keep].astype(str).to_numpy(),
+    })
+
+    # identieke (naam, afdeling) paren zijn maar één buur waard
+    return train.drop_duplicates(ignore_index=True)
+
+
+def suggest(train, unmapped, k=K):
+    # train: product, afdeling — unmapped: hope, product, euro
+    # → hope, product, euro, afdeling, confidence, gelijkend_op
+    query = (
+        unmapped
+        .groupby("hope", sort=False, as_index=False)
+        .agg(product=("product", "first"), euro=("euro", "sum"))
+    )
+
+    if train.empty or query.empty:
+        return query.assign(afdeling=None, confidence=0.0, gelijkend_op=None).iloc[0:0]
+
+    vectorizer = TfidfVectorizer(analyzer="char_wb", ngram_range=NGRAMS, sublinear_tf=True, dtype=np.float32)
+    X_train = vectorizer.fit_transform(train["product"])
+    X_query = vectorizer.transform(query["product"].astype(str))
+
+    k = min(k, X_train.shape[0])
+    knn = NearestNeighbors(n_neighbors=k, metric="cosine", algorithm="brute").fit(X_train)
+    distance, neighbours = knn.kneighbors(X_query)
+
+    # gewogen stemming, volledig gevectoriseerd: (n_query, n_afdelingen)
+    labels, codes = np.unique(train["afdeling"].to_numpy(), return_inverse=True)
+    similarity = np.clip(1.0 - distance, 0.0, None)
+
+    votes = np.zeros((len(query), len(labels)))
+    rows = np.repeat(np.arange(len(query)), k)
+    np.add.at(votes, (rows, codes[neighbours].ravel()), similarity.ravel())
+
+    total = votes.sum(axis=1)
+    best = votes.argmax(axis=1)
+    confidence = np.divide(
+        votes[np.arange(len(query)), best], total,
+        out=np.zeros(len(query)), where=total > 0
+    )
+    # weinig gelijkenis met de dichtste buur → lagere confidence
+    confidence *= similarity[:, 0]
+
+    return query.assign(
+        afdeling=labels[best],
+        confidence=confidence.round(3),
+        gelijkend_op=train["product"].to_numpy()[neighbours[:, 0]]
+    )
@@ -0,0 +1,268 @@
+import io
+
+import numpy as np
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from ingest import COLUMN_MAP
+
+# =====================
+# SYNTHETISCHE DATA (seeded)
+# =====================
+#
+# Reproduceerbare weeks / shrink_data / product_afdelingen in dezelfde vorm
+# als na een sync uit Supabase (tekstkolommen, HOPE als tekst, datum als
+# ISO string). Verdelingen ongeveer zoals in de winkel:
+# - een catalogus van duizenden HOPE's, elk met één afdeling, een
+#   productnaam uit de woordenschat van die afdeling en een basisprijs
+# - populariteit per HOPE volgens een machtswet (weinig artikels, veel lijnen)
+# - een 30-tal redenen, afslag en verval het vaakst
+# - meer lijnen op maandag en zaterdag
+# - gewichtsartikelen (groenten, vlees, kaas, ...) deels in kg met kommagetallen
+# - een paar onleesbare cellen (HOPE of datum) zoals in een export uit de winkel
+# Alles wordt vectorieel opgebouwd (ook 10M rijen in enkele seconden).
+
+SEED = 42
+STORE_ID = "delhaize_halle"
+START = "2023-01-02"
+
+AFDELINGEN = {
+    # afdeling: (gewicht, woorden, gemiddelde prijs)
+    "VOEDING": (0.22, ["PASTA", "RIJST", "SOEP", "SAUS", "KOEKJES", "CHIPS", "MUESLI", "CONFITUUR"], 2.8),
+    "ZUIVEL": (0.12, ["YOGHURT", "MELK", "KAAS", "BOTER", "ROOM", "PUDDING", "PLATTEKAAS"], 2.2),
+    "FRUIT EN GROENTEN": (0.11, ["APPELS", "BANANEN", "TOMATEN", "SLA", "WORTELEN", "AARDBEIEN", "PAPRIKA"], 2.0),
+    "BAKKERIJ": (0.08, ["BROOD", "CROISSANT", "PISTOLET", "TAART", "BAGUETTE", "SANDWICH"], 1.9),
+    "VERS VLEES": (0.07, ["GEHAKT", "STEAK", "ROSBIEF", "VARKENSHAASJE", "WORST", "BURGER"], 6.5),
+    "GEVOGELTE": (0.05, ["KIPFILET", "KIPPENBOUT", "KALKOEN", "KIPPENWIT", "DRUMSTICKS"], 5.8),
+    "CHARCUTERIE": (0.06, ["HAM", "SALAMI", "PATE", "KIPWIT", "SPEK", "PREPARE"], 3.1),
+    "VIS EN SAURISSERIE": (0.04, ["ZALM", "KABELJAUW", "GARNALEN", "TONIJN", "MOSSELEN"], 8.2),
+    "SELF-TRAITEUR": (0.05, ["LASAGNE", "SALADE", "WRAP", "QUICHE", "STOOFVLEES"], 5.1),
+    "TRAITEUR": (0.03, ["HAPJES", "SCAMPI", "VOL-AU-VENT", "TAPAS", "SUSHI"], 7.4),
+    "DIEPVRIES": (0.06, ["PIZZA", "FRIETEN", "IJS", "ERWTEN", "VISSTICKS", "SPINAZIE"], 3.6),
+    "DRANKEN": (0.07, ["COLA", "WATER", "BIER", "WIJN", "SAP", "LIMONADE"], 3.3),
+    "DROGISTERIJ": (0.02, ["SHAMPOO", "TANDPASTA", "ZEEP", "DEO", "WASMIDDEL"], 4.2),
+    "PARFUMERIE": (0.02, ["PARFUM", "CREME", "MAKE-UP", "LOTION", "SCHEERGEL"], 9.5),
+}
+
+MERKEN = ["DELHAIZE", "365", "BIO", "TASTE OF INSPIRATIONS", "BONI", "CARREFOUR", "NESTLE",
+          "DANONE", "INEX", "LU", "BARILLA", "COCA-COLA", "JUPILER", "DOVE", "NIVEA", "IGLO"]
+FORMATEN = ["100G", "250G", "500G", "1KG", "1L", "1,5L", "6X33CL", "4ST", "2ST", "XL"]
+
+REDENEN = {
+    # reden: gewicht (bevat AFSLAG / VERVAL / het pakket-reden zoals in de winkel)
+    "AFSLAG": 0.16,
+    "AFSLAG 30%": 0.08,
+    "AFSLAG 50%": 0.06,
+    "VERVAL": 0.14,
+    "VERVAL DATUM": 0.07,
+    "38 VERLIES - ANDERE": 0.09,
+    "01 BREUK": 0.05,
+    "02 DIEFSTAL": 0.04,
+    "03 BEDERF": 0.04,
+    "04 KWALITEIT": 0.03,
+    "05 TEMPERATUUR": 0.02,
+    "06 VERPAKKING BESCHADIGD": 0.025,
+    "07 ETIKETTERING": 0.015,
+    "08 RETOUR LEVERANCIER": 0.02,
+    "09 PROEVERIJ": 0.01,
+    "10 EIGEN GEBRUIK": 0.01,
+    "11 SCHENKING": 0.015,
+    "12 INVENTARISVERSCHIL": 0.02,
+    "13 PRIJSFOUT": 0.008,
+    "14 KLANTRETOUR": 0.012,
+    "15 ONGEDIERTE": 0.003,
+    "16 STROOMPANNE": 0.004,
+    "17 TRANSPORTSCHADE": 0.008,
+    "18 OVERSCHRIJDING THT": 0.012,
+    "19 RECALL": 0.003,
+    "20 DEMO": 0.004,
+    "21 VERKEERDE LEVERING": 0.006,
+    "22 VERLIES - VERS": 0.012,
+    "23 VERLIES - BAKKERIJ": 0.01,
+    "24 ANDERE": 0.007,
+}
+
+# maandag … zondag
+WEEKDAGEN = np.array([1.3, 1.0, 0.9, 1.0, 1.1, 1.4, 0.3])
+
+# afdelingen met gewichtsartikelen en het aandeel lijnen in kg
+GEWICHT = ["FRUIT EN GROENTEN", "VERS VLEES", "CHARCUTERIE", "VIS EN SAURISSERIE", "ZUIVEL"]
+GEWICHT_AANDEEL = 0.3
+
+# aandeel lijnen met een ongeldige HOPE of datum (ingest / normalize laten die vallen)
+ONGELDIG = 0.0005
+
+
+def _p(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def n_hopes(rows):
+    # duizenden HOPE's, meer naarmate de dataset groeit
+    return int(np.clip(rows // 200, 2_000, 30_000))
+
+
+def catalog(hopes, seed=SEED):
+    # hope (int), product, afdeling, prijs
+    rng = np.random.default_rng(seed)
+    names = list(AFDELINGEN)
+
+    afdeling = rng.choice(len(names), size=hopes, p=_p([AFDELINGEN[a][0] for a in names]))
+    codes = rng.choice(np.arange(100_000, 1_000_000), size=hopes, replace=False)
+
+    woord = np.array([
+        AFDELINGEN[names[a]][1][i % len(AFDELINGEN[names[a]][1])]
+        for a, i in zip(afdeling, rng.integers(0, 1_000, hopes))
+    ])
+    merk = np.array(MERKEN)[rng.integers(0, len(MERKEN), hopes)]
+    formaat = np.array(FORMATEN)[rng.integers(0, len(FORMATEN), hopes)]
+    product = pd.Series(woord).str.cat([pd.Series(merk), pd.Series(formaat)], sep=" ")
+
+    gemiddeld = np.array([AFDELINGEN[a][2] for a in names])[afdeling]
+    prijs = np.round(gemiddeld * rng.lognormal(0.0, 0.5, hopes), 2).clip(0.19)
+
+    return pd.DataFrame({
+        "hope": codes.astype(np.int64),
+        "product": product.to_numpy(dtype=object),
+        "afdeling": np.array(names)[afdeling],
+        "prijs": prijs,
+    })
+
+
+def _dates(rng, rows, years):
+    days = np.arange(np.datetime64(START), np.datetime64(START) + 364 * years)
+    weekday = (days.astype("datetime64[D]").view("int64") - 4) % 7
+    return days, rng.choice(len(days), size=rows, p=_p(WEEKDAGEN[weekday]))
+
+
+def shrink_data(rows, seed=SEED, store_id=STORE_ID, years=2, items=None):
+    # id, store_id, datum, hope, product, reden, stuks, euro
+    rng = np.random.default_rng(seed + 1)
+    items = catalog(n_hopes(rows), seed) if items is None else items
+
+    # machtswet: artikel i krijgt gewicht 1 / (i + 1)^0.9
+    popular = rng.permutation(len(items))
+    item = popular[rng.choice(len(items), size=rows, p=_p(1.0 / np.arange(1, len(items) + 1) ** 0.9))]
+
+    redenen = list(REDENEN)
+    reden = rng.choice(len(redenen), size=rows, p=_p(list(REDENEN.values())))
+
+    days, day = _dates(rng, rows, years)
+
+    stuks = rng.geometric(0.55, size=rows).astype(np.int64)
+    kg = np.isin(items["afdeling"].to_numpy()[item], GEWICHT) & (rng.random(rows) < GEWICHT_AANDEEL)
+    if kg.any():
+        stuks = np.where(kg, np.round(rng.uniform(0.1, 2.5, rows), 3), stuks)
+    euro = np.round(items["prijs"].to_numpy()[item] * stuks, 2)
+
+    # ongeldig: de helft een lege datum, de andere helft een HOPE als tekst
+    bad = rng.random(rows) < ONGELDIG
+    bad_datum = bad & (rng.random(rows) < 0.5)
+    bad_hope = bad & ~bad_datum
+
+    day_text = pa.array(days.astype(str))
+    reden_text = pa.array(redenen)
+    table = pa.table({
+        "id": pa.array(np.arange(1, rows + 1, dtype=np.int64)),
+        "store_id": pa.array([store_id]).take(pa.array(np.zeros(rows, dtype=np.int32))),
+        "datum": pc.if_else(pa.array(bad_datum), "", day_text.take(pa.array(day))),
+        "hope": pc.if_else(
+            pa.array(bad_hope), "n.v.t.", pa.array(items["hope"].astype(str).to_numpy()).take(pa.array(item))
+        ),
+        "product": pa.array(items["product"].to_numpy()).take(pa.array(item)),
+        "reden": reden_text.take(pa.array(reden)),
+        "stuks": pa.array(stuks),
+        "euro": pa.array(euro),
+    })
+    # zelfde conversie als local_store (Arrow → pandas)
+    return table.to_pandas()
+
+
+def product_afdelingen(items, mapped=0.85, seed=SEED, store_id=STORE_ID):
+    # id, store_id, hope, afdeling — een deel van de HOPE's blijft onbekend
+    rng = np.random.default_rng(seed + 2)
+    keep = np.sort(rng.choice(len(items), size=int(len(items) * mapped), replace=False))
+    return pd.DataFrame({
+        "id": np.arange(1, len(keep) + 1, dtype=np.int64),
+        "store_id": store_id,
+        "hope": items["hope"].to_numpy()[keep].astype(str),
+        "afdeling": items["afdeling"].to_numpy()[keep],
+    })
+
+
+def weeks(rows, seed=SEED, store_id=STORE_ID, years=5):
+    # id, store_id, jaar, maand, week, afdeling, shrink, sales —
+    # meerdere lijnen per (week, afdeling) tot `rows` bereikt is
+    rng = np.random.default_rng(seed + 3)
+    names = list(AFDELINGEN)
+
+    combos = years * 52 * len(names)
+    k = max(-(-rows // combos), 1)
+    i = np.arange(rows)
+    jaar = 2021 + (i // (52 * len(names) * k)) % years
+    week = 1 + (i // (len(names) * k)) % 52
+    afdeling = np.array(names)[(i // k) % len(names)]
+
+    # seizoen: pieken rond de feestdagen
+    seizoen = 1.0 + 0.25 * np.cos((week - 51) / 52 * 2 * np.pi)
+    sales = np.round(rng.uniform(5_000, 40_000, rows) * seizoen, 2)
+    shrink = np.round(sales * rng.uniform(0.005, 0.04, rows), 2)
+
+    return pd.DataFrame({
+        "id": i.astype(np.int64) + 1,
+        "store_id": store_id,
+        "jaar": jaar.astype(np.int64),
+        "maand": np.minimum((week - 1) // 4 + 1, 12).astype(np.int64),
+        "week": week.astype(np.int64),
+        "afdeling": afdeling,
+        "shrink": shrink,
+        "sales": sales,
+    })
+
+
+def generate(rows, seed=SEED, store_id=STORE_ID, years=2, mapped=0.85):
+    # {tabel: frame} met één gedeelde catalogus; weeks bevat weektotalen en
+    # is dus veel kleiner dan shrink_data (minstens 5 jaar × 52 × 14)
+    items = catalog(n_hopes(rows), seed)
+    return {
+        "weeks": weeks(max(rows // 10, 5 * 52 * len(AFDELINGEN)), seed, store_id),
+        "shrink_data": shrink_data(rows, seed, store_id, years, items),
+        "product_afdelingen": product_afdelingen(items, mapped, seed, store_id),
+    }
+
+
+def excel_chunks(df_shrink, chunk_size):
+    # blokken zoals ingest.iter_raw_chunks ze uit het werkblad leest
+    headers = {v: k for k, v in COLUMN_MAP.items()}
+    raw = df_shrink[list(headers)].rename(columns=headers)
+    for i in range(0, len(raw), chunk_size):
+        yield raw.iloc[i:i + chunk_size]
+
+
+# rijen per werkblad (zonder de kop)
+EXCEL_MAX_ROWS = 1_048_575
+
+
+def excel_workbook(df_shrink):
+    # .xlsx in het geheugen met dezelfde kolommen als excel_chunks; de datum
+    # als echte datum zoals in een export uit de winkel, ongeldig = lege cel
+    if len(df_shrink) > EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df_shrink):,} rijen past niet in één werkblad")
+
+    raw = next(excel_chunks(df_shrink, len(df_shrink)), None)
+    datum = pd.to_datetime(raw["Datum"], errors="coerce")
+    raw = raw.assign(Datum=datum.dt.to_pydatetime().astype(object).where(datum.notna(), None))
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append(list(raw.columns))
+    for row in raw.itertuples(index=False):
+        ws.append(row)
+
+    file = io.BytesIO()
+    wb.save(file)
+    file.seek(0)
+    return file
@@ -0,0 +1,240 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# =====================
+# TRACING (per rerun)
+# =====================
+#
+# Eén Trace per run (volledige rerun of fragment), met benoemde spans per
+# stap: fetch per tabel en pagina, opkuis, mapping, aggregaties, render,
+# AI. De actieve trace zit in een contextvar: modules roepen span() aan
+# zonder iets door te geven, en zonder actieve trace (bv. de warm-up
+# thread) is span() een no-op. Worker threads krijgen de trace via bind().
+
+_current = contextvars.ContextVar("trace", default=None)
+
+MAX_PER_PAGE = 20
+
+
+def _now_us():
+    return time.perf_counter_ns() // 1000
+
+
+def sizes(value):
+    # rijen + bytes; deep=False: bytes van de buffers, zonder strings te tellen
+    if hasattr(value, "memory_usage") and hasattr(value, "__len__"):
+        usage = value.memory_usage(deep=False)
+        return {"rows": len(value), "bytes": int(usage.sum() if hasattr(usage, "sum") else usage)}
+    if hasattr(value, "__len__"):
+        return {"rows": len(value)}
+    return {}
+
+
+class Span:
+
+    __slots__ = ("trace", "name", "start", "duration", "tid", "attrs")
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.start = _now_us()
+        self.duration = None
+        self.tid = threading.get_ident()
+        self.attrs = attrs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = _now_us() - self.start
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.spans.append(self)
+        return False
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def size(self, value):
+        # rijen/bytes van een (tussen)resultaat
+        self.attrs.update(sizes(value))
+        return value
+
+    def to_dict(self, origin):
+        return {
+            "name": self.name,
+            "start_ms": round((self.start - origin) / 1000, 3),
+            "ms": round((self.duration or 0) / 1000, 3),
+            "thread": self.tid,
+            **self.attrs,
+        }
+
+
+class _NoSpan:
+    # zonder actieve trace: zelfde interface, doet niets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def set(self, **attrs):
+        return self
+
+    def size(self, value):
+        return value
+
+
+_NO_SPAN = _NoSpan()
+
+
+class Trace:
+
+    def __init__(self, name, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self.start = _now_us()
+        self.duration = None
+        self.tid = threading.get_ident()
+        self.spans = []
+        self.done = False
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def finish(self, **attrs):
+        self.attrs.update(attrs)
+        self.duration = _now_us() - self.start
+        self.done = True
+        return self
+
+    @property
+    def ms(self):
+        return (self.duration if self.duration is not None else _now_us() - self.start) / 1000
+
+    def stages(self):
+        # totale tijd (ms) per spannaam, grootste eerst
+        totals = {}
+        for span in self.spans:
+            totals[span.name] = totals.get(span.name, 0.0) + (span.duration or 0) / 1000
+        return dict(sorted(totals.items(), key=lambda kv: -kv[1]))
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "started_at": self.started_at,
+            "ms": round(self.ms, 3),
+            **self.attrs,
+            "spans": [s.to_dict(self.start) for s in sorted(self.spans, key=lambda s: s.start)],
+        }
+
+
+# =====================
+# ACTIEVE TRACE
+# =====================
+
+def start(name, **attrs):
+    trace = Trace(name, **attrs)
+    _current.set(trace)
+    return trace
+
+
+def current():
+    trace = _current.get()
+    return trace if trace is not None and not trace.done else None
+
+
+def finish(trace, **attrs):
+    trace.finish(**attrs)
+    if _current.get() is trace:
+        _current.set(None)
+    return trace
+
+
+def span(name, **attrs):
+    trace = current()
+    if trace is None:
+        return _NO_SPAN
+    return trace.span(name, **attrs)
+
+
+def bind(fn):
+    # voor ThreadPoolExecutor: spans uit de worker komen in dezelfde trace
+    trace = current()
+    if trace is None:
+        return fn
+
+    def run(*args, **kwargs):
+        token = _current.set(trace)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current.reset(token)
+    return run
+
+
+# =====================
+# LOG (laatste N runs per pagina, gedeeld over sessies)
+# =====================
+
+class TraceLog:
+
+    def __init__(self, max_per_page=MAX_PER_PAGE):
+        self.max_per_page = max_per_page
+        self._lock = threading.Lock()
+        self._pages = {}
+
+    def add(self, trace):
+        with self._lock:
+            self._pages.setdefault(trace.name, deque(maxlen=self.max_per_page)).append(trace)
+
+    def pages(self):
+        with self._lock:
+            return sorted(self._pages)
+
+    def recent(self, page=None):
+        # nieuwste eerst
+        with self._lock:
+            if page is not None:
+                traces = list(self._pages.get(page, ()))
+            else:
+                traces = [t for q in self._pages.values() for t in q]
+        return sorted(traces, key=lambda t: t.started_at, reverse=True)
+
+
+# =====================
+# EXPORT
+# =====================
+
+def to_json(traces):
+    return json.dumps([t.to_dict() for t in traces], indent=2, ensure_ascii=False, default=str)
+
+
+def to_chrome(traces):
+    # Chrome trace event format (chrome://tracing, Perfetto): één proces per run
+    events = []
+    pid = os.getpid()
+    for n, trace in enumerate(traces):
+        events.append({
+            "name": "process_name", "ph": "M", "pid": n, "tid": 0,
+            "args": {"name": f"{trace.name} @ {time.strftime('%H:%M:%S', time.localtime(trace.started_at))}"},
+        })
+        events.append({
+            "name": trace.name, "ph": "X", "pid": n, "tid": trace.tid,
+            "ts": 0, "dur": trace.duration or 0,
+            "args": {**trace.attrs, "os_pid": pid},
+        })
+        for span in trace.spans:
+            events.append({
+                "name": span.name, "ph": "X", "pid": n, "tid": span.tid,
+                "ts": span.start - trace.start, "dur": span.duration or 0,
+                "args": span.attrs,
+            })
+    return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, default=str)
@@ -0,0 +1,209 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import pandas as pd
+
+from local_store import CACHE_DIR
+
+# =====================
+# UPLOAD ENGINE
+# =====================
+#
+# - elke rij krijgt een deterministische row_hash → upsert is idempotent
+# - batches lopen parallel met een begrensd aantal workers
+# - mislukte batches worden herhaald met exponentiële backoff
+# - per bestand een manifest met de afgewerkte batches → hervatten
+
+BATCH_SIZE = 500
+WORKERS = 4
+RETRIES = 5
+BACKOFF = 0.5
+
+HASH_COLUMNS = ["datum", "hope", "product", "reden", "stuks", "euro"]
+
+
+# =====================
+# ROW HASH
+# =====================
+
+def add_row_hashes(chunk, store_id, seen):
+    # identieke lijnen in hetzelfde bestand blijven apart (volgnummer),
+    # hetzelfde bestand opnieuw uploaden geeft exact dezelfde hashes
+    values = chunk[HASH_COLUMNS].assign(
+        # 2 en 2.0 moeten dezelfde hash geven, ongeacht het dtype van het blok
+        stuks=pd.to_numeric(chunk["stuks"]).astype(float).round(4),
+        euro=pd.to_numeric(chunk["euro"]).astype(float).round(4)
+    )
+    values = values.astype(str)
+    base = values[HASH_COLUMNS[0]].str.cat([values[c] for c in HASH_COLUMNS[1:]], sep="|")
+
+    # seen telt per sha1 digest (20 bytes) i.p.v. de volledige lijn: het
+    # geheugen blijft klein, ook voor miljoenen lijnen; row_hash zelf is
+    # ongewijzigd (sha1 van lijn + volgnummer), dus eerdere uploads matchen
+    hashes = []
+    for content in base:
+        content = f"{store_id}|{content}"
+        key = hashlib.sha1(content.encode()).digest()
+        n = seen[key]
+        seen[key] = n + 1
+        hashes.append(hashlib.sha1(f"{content}#{n}".encode()).hexdigest())
+
+    return chunk.assign(row_hash=hashes)
+
+
+# =====================
+# MANIFEST
+# =====================
+
+def file_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+class UploadManifest:
+
+    def __init__(self, store_id, digest, batch_size=BATCH_SIZE):
+        self.path = CACHE_DIR / "uploads" / store_id / f"{digest}.json"
+        self._lock = threading.Lock()
+
+        state = json.loads(self.path.read_text()) if self.path.exists() else {}
+
+        # andere batchgrootte = andere nummering → opnieuw beginnen
+        if state.get("batch_size") != batch_size:
+            state = {}
+
+        self.batch_size = batch_size
+        self.done = set(state.get("done", []))
+        self.inserted = state.get("inserted", 0)
+        self.complete = state.get("complete", False)
+
+    @property
+    def started(self):
+        return bool(self.done)
+
+    def mark(self, batch, inserted):
+        with self._lock:
+            self.done.add(batch)
+            self.inserted += inserted
+            self._save()
+
+    def finish(self):
+        with self._lock:
+            self.complete = True
+            self._save()
+
+    def _save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps({
+            "batch_size": self.batch_size,
+            "done": sorted(self.done),
+            "inserted": self.inserted,
+            "complete": self.complete,
+        }))
+        os.replace(tmp, self.path)
+
+
+# =====================
+# SCHRIJVEN
+# =====================
+
+def with_retry(fn, retries=RETRIES, backoff=BACKOFF):
+    for attempt in range(retries):
+        try:
+            return fn()
+        except MigrationMissing:
+            # herhalen helpt niet
+            raise
+        except Exception:
+            if attempt == retries - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt * (1 + random.random()))
+
+
+class MigrationMissing(RuntimeError):
+    pass
+
+
+def write_batch(client, store_id, rows):
+    # shrink_insert (sql/upload.sql): insert + afslag_dag in één transactie;
+    # zonder die functie geen upload (een losse upsert + aparte afslag update
+    # is niet atomisch: een herhaalde batch zou de afslag bedragen verliezen)
+    try:
+        return client.rpc("shrink_insert", {
+            "p_store_id": store_id,
+            "p_rows": rows,
+        }).execute().data
+    except Exception as e:
+        # PGRST202 = functie bestaat niet
+        if getattr(e, "code", None) == "PGRST202":
+            raise MigrationMissing(
+                "shrink_insert bestaat niet: voer eerst sql/upload.sql uit in Supabase"
+            ) from e
+        raise
+
+
+def run_upload(client, store_id, chunks, manifest, workers=WORKERS, write=write_batch):
+    """Schrijf (aantal gelezen rijen, blok) paren weg; yield de voortgang.
+
+    Batches uit het manifest worden overgeslagen. Bij een fout blijft het
+    manifest staan zodat dezelfde upload later hervat kan worden.
+    """
+    seen = Counter()
+    progress = {"rows_read": 0, "batches": 0, "skipped": 0, "inserted": 0, "duplicates": 0}
+    batch_no = 0
+
+    def job(batch, rows):
+        inserted = with_retry(lambda: write(client, store_id, rows))
+        manifest.mark(batch, inserted)
+        return len(rows), inserted
+
+    def collect(futures):
+        for future in futures:
+            n, inserted = future.result()
+            progress["batches"] += 1
+            progress["inserted"] += inserted
+            progress["duplicates"] += n - inserted
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = set()
+
+        try:
+            for n, chunk in chunks:
+                progress["rows_read"] += n
+
+                if chunk is not None:
+                    chunk = add_row_hashes(chunk, store_id, seen)
+                    rows = chunk.to_dict(orient="records")
+
+                    for i in range(0, len(rows), manifest.batch_size):
+                        if batch_no in manifest.done:
+                            progress["skipped"] += 1
+                        else:
+                            pending.add(pool.submit(job, batch_no, rows[i:i + manifest.batch_size]))
+                        batch_no += 1
+
+                        # begrensd aantal batches in het geheugen
+                        while len(pending) >= workers * 2:
+                            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                            collect(finished)
+
+                yield dict(progress)
+
+            while pending:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+                yield dict(progress)
+
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+    manifest.finish()
+    yield dict(progress)
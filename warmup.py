@@ -0,0 +1,147 @@
+import threading
+import time
+
+from datasets import LOADERS
+from loader import max_key
+
+# =====================
+# ACHTERGROND WARM-UP
+# =====================
+#
+# Eén thread per proces die de datasets van elke geconfigureerde store
+# vooraf laadt en daarna ververst:
+# - elke `probe_every` s een max(id) probe per tabel: nieuwe rijen → herladen
+# - een versie die de app gebumpt heeft (na een write) → herladen
+# - elke `interval` s alles (updates/upserts zie je niet aan max(id))
+# Laden gebeurt buiten elke lock; de nieuwe waarde en de versie bump gaan
+# samen in één registry.swap(), dus een gebruiker krijgt altijd ofwel de
+# oude ofwel de nieuwe dataset, nooit een koude fetch.
+
+INTERVAL = 15 * 60
+PROBE_EVERY = 30
+
+
+def _same(old, new):
+    # ongewijzigde data → geen bump, afgeleide resultaten blijven geldig
+    if hasattr(old, "frame"):
+        old, new = old.frame(), new.frame()
+    try:
+        return old.equals(new)
+    except Exception:
+        return False
+
+
+class Warmer:
+
+    def __init__(self, client, registry, versions, stores, interval=INTERVAL,
+                 probe_every=PROBE_EVERY, loaders=LOADERS):
+        self.client = client
+        self.registry = registry
+        self.versions = versions
+        self.stores = list(stores)
+        self.interval = interval
+        self.probe_every = probe_every
+        self.loaders = loaders
+
+        self._stop = threading.Event()
+        self._thread = None
+        self._signature = {}   # (store, tabel) -> max(id) bij de laatste load
+        self.refreshed = {}    # store -> tijdstip laatste refresh
+        self.errors = {}       # (store, dataset) -> laatste fout
+        self.swaps = 0
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="dataset-warmup", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    @property
+    def alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self):
+        for store in self.stores:
+            self.refresh(store)
+        next_full = time.monotonic() + self.interval
+
+        while not self._stop.wait(self.probe_every):
+            full = time.monotonic() >= next_full
+            for store in self.stores:
+                if self._stop.is_set():
+                    return
+                self.refresh(store, None if full else self.stale(store))
+            if full:
+                next_full = time.monotonic() + self.interval
+
+    def _probe(self, store, name):
+        try:
+            return max_key(self.client, name, store)
+        except Exception:
+            return None
+
+    def stale(self, store):
+        # datasets met nieuwe rijen of met een versie die de cache niet heeft
+        names = []
+        for name in self.loaders:
+            entry = self.registry.peek((store, name))
+            if entry is None or entry[0] != self.versions.get(store, name):
+                names.append(name)
+            elif self._probe(store, name) != self._signature.get((store, name)):
+                names.append(name)
+        return names
+
+    def refresh(self, store, names=None):
+        names = list(self.loaders) if names is None else names
+        if not names:
+            return []
+
+        loaded, before = {}, {}
+        for name in names:
+            before[name] = self.versions.get(store, name)
+            signature = self._probe(store, name)
+            try:
+                loaded[name] = self.loaders[name](self.client, store)
+            except Exception as e:
+                # bv. afslag_dag zolang sql/afslag.sql niet uitgerold is
+                self.errors[(store, name)] = repr(e)
+                continue
+            self.errors.pop((store, name), None)
+            self._signature[(store, name)] = signature
+
+        changed = []
+        for name, value in loaded.items():
+            entry = self.registry.peek((store, name))
+            if entry is not None and not _same(entry[1], value):
+                changed.append(name)
+
+        labels = {}
+
+        def commit():
+            # onder de registry lock: bump + nieuwe waarden in één stap.
+            # Heeft de app intussen zelf gebumpt (write tijdens het laden),
+            # dan is onze waarde al verouderd en blijft ze buiten de cache.
+            for name, value in loaded.items():
+                if self.versions.get(store, name) != before[name]:
+                    continue
+                if name in changed:
+                    self.versions.bump(store, name)
+                labels[name] = self.versions.get(store, name)
+                if hasattr(value, "version"):
+                    value.version = labels[name]
+
+        self.registry.swap(
+            {
+                (store, name): (lambda name=name: labels.get(name), value)
+                for name, value in loaded.items()
+            },
+            commit
+        )
+        self.swaps += 1
+        self.refreshed[store] = time.time()
+        return changed